@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+"""
+Headless benchmarks of sK1 hot paths.
+
+Usage (from source tree root):
+
+    python -m benchmarks [--output results.json] [--compare baseline.json]
+                         [--threshold 0.15] [--repeat 5] [--only PATTERN]
+                         [--scale small|large]
+
+Benchmarks generate synthetic SK2 documents, render them on offscreen
+Cairo surfaces with stubbed wal toolkit and report timings and peak
+memory as JSON. Compare mode flags cases slower than the baseline by
+more than the threshold and exits with non-zero status.
+"""
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import fnmatch
+import gc
+import json
+import optparse
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks import cases
+from benchmarks.harness import Environment
+
+DEFAULT_THRESHOLD = 0.15
+
+
+def get_peak_rss():
+    """
+    Returns peak resident set size of process in KB.
+    """
+    value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS
+    if sys.platform == 'darwin':
+        value /= 1024
+    return value
+
+
+def run_case(name, scale, repeat):
+    """
+    Runs single case in current process and returns result dict.
+    """
+    env = Environment()
+    case = cases.get_case(name)()
+    params = cases.SCALES[scale]
+    start = time.time()
+    case.setup(env, params)
+    setup_time = time.time() - start
+    timings = []
+    try:
+        for _i in range(repeat):
+            gc.collect()
+            start = time.time()
+            case.run()
+            timings.append(time.time() - start)
+    finally:
+        case.teardown()
+        env.destroy()
+    timings.sort()
+    return {
+        'min': timings[0],
+        'median': timings[len(timings) // 2],
+        'mean': sum(timings) / len(timings),
+        'repeat': repeat,
+        'setup': setup_time,
+        'peak_rss_kb': get_peak_rss(),
+    }
+
+
+def run_isolated(name, scale, repeat):
+    """
+    Runs case in child process, so peak memory is per case.
+    """
+    cmd = [sys.executable, '-m', 'benchmarks', '--case', name,
+           '--scale', scale, '--repeat', str(repeat)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    output = proc.communicate()[0]
+    if proc.returncode:
+        return {'error': 'exit status %d' % proc.returncode}
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns list of (case, baseline median, median, ratio)
+    for cases slower than baseline more than threshold.
+    """
+    regressions = []
+    base_results = baseline.get('results', {})
+    for name, result in sorted(results.items()):
+        base = base_results.get(name)
+        if not base or 'median' not in base or 'median' not in result:
+            continue
+        if not base['median']:
+            continue
+        ratio = result['median'] / base['median']
+        if ratio > 1.0 + threshold:
+            regressions.append((name, base['median'], result['median'],
+                                ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='python -m benchmarks [options]')
+    parser.add_option('--output', help='write JSON results to file')
+    parser.add_option('--compare', help='baseline JSON results file')
+    parser.add_option('--threshold', type='float', default=DEFAULT_THRESHOLD,
+                      help='allowed slowdown ratio (default %default)')
+    parser.add_option('--repeat', type='int', default=5)
+    parser.add_option('--scale', default='small',
+                      choices=sorted(cases.SCALES.keys()))
+    parser.add_option('--only', help='run cases matching glob pattern')
+    parser.add_option('--case', help=optparse.SUPPRESS_HELP)
+    opts = parser.parse_args(argv)[0]
+
+    if opts.case:
+        result = run_case(opts.case, opts.scale, opts.repeat)
+        sys.stdout.write(json.dumps(result) + '\n')
+        return 0
+
+    results = {}
+    for case in cases.CASES:
+        if opts.only and not fnmatch.fnmatch(case.name, opts.only):
+            continue
+        result = run_isolated(case.name, opts.scale, opts.repeat)
+        results[case.name] = result
+        if 'error' in result:
+            sys.stderr.write('%-36s %s\n' % (case.name, result['error']))
+        else:
+            sys.stderr.write('%-36s %10.4f s %10d KB\n' % (
+                case.name, result['median'], result['peak_rss_kb']))
+
+    report = {
+        'meta': {'scale': opts.scale, 'repeat': opts.repeat,
+                 'python': platform.python_version(),
+                 'platform': platform.platform(),
+                 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'results': results,
+    }
+    if opts.output:
+        with open(opts.output, 'wb') as fp:
+            json.dump(report, fp, indent=2, sort_keys=True)
+    else:
+        sys.stdout.write(json.dumps(report, indent=2, sort_keys=True) + '\n')
+
+    if opts.compare:
+        with open(opts.compare, 'rb') as fp:
+            baseline = json.load(fp)
+        regressions = compare(results, baseline, opts.threshold)
+        for name, base, value, ratio in regressions:
+            sys.stderr.write('REGRESSION %s: %.4f s -> %.4f s (x%.2f)\n' % (
+                name, base, value, ratio))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+from benchmarks import docgen
+
+SCALES = {
+    'small': {'curves': 10000, 'depth': 6, 'points': 200, 'chars': 5000,
+              'bitmap': (2000, 1500)},
+    'large': {'curves': 100000, 'depth': 8, 'points': 1000, 'chars': 50000,
+              'bitmap': (6000, 4000)},
+}
+
+
+class BenchCase:
+    """
+    Base benchmark case. setup() prepares document,
+    run() is timed, teardown() releases resources.
+    """
+    name = ''
+    env = None
+    presenter = None
+    params = None
+
+    def setup(self, env, params):
+        self.env = env
+        self.params = params
+        self.presenter = env.new_presenter()
+        self.populate()
+        docgen.finalize(self.presenter)
+
+    def populate(self):
+        pass
+
+    def run(self):
+        pass
+
+    def teardown(self):
+        self.presenter.close()
+
+
+class RenderCase(BenchCase):
+    """
+    Full repaint of document with cold tile cache.
+    """
+    warm = False
+
+    def run(self):
+        renderer = self.presenter.canvas.renderer
+        if not self.warm:
+            renderer.tile_cache.clear()
+        renderer.start()
+        renderer.paint_document()
+
+
+class RenderCurves(RenderCase):
+    name = 'render.curves'
+
+    def populate(self):
+        docgen.add_curves(self.presenter, self.params['curves'])
+
+
+class RenderCurvesWarm(RenderCurves):
+    name = 'render.curves.warm'
+    warm = True
+
+
+class RenderDeepGroups(RenderCase):
+    name = 'render.deep_groups'
+
+    def populate(self):
+        docgen.add_deep_groups(self.presenter, self.params['depth'])
+
+
+class RenderBitmap(RenderCase):
+    name = 'render.bitmap'
+
+    def populate(self):
+        docgen.add_bitmap(self.presenter, *self.params['bitmap'])
+
+
+class RenderLongText(RenderCase):
+    name = 'render.long_text'
+
+    def populate(self):
+        docgen.add_long_text(self.presenter, self.params['chars'])
+
+
+class PointsCase(BenchCase):
+    points = None
+
+    def populate(self):
+        docgen.add_curves(self.presenter, self.params['curves'])
+        rnd = docgen.get_random()
+        w, h = self.presenter.get_page_size()
+        self.points = [[rnd.uniform(-w / 2.0, w / 2.0),
+                        rnd.uniform(-h / 2.0, h / 2.0)]
+                       for _i in range(self.params['points'])]
+
+
+class SelectAtPoint(PointsCase):
+    name = 'selection.select_at_point'
+
+    def run(self):
+        selection = self.presenter.selection
+        for point in self.points:
+            selection._select_at_point(point)
+
+
+class SnapPoint(PointsCase):
+    name = 'snapping.snap_point'
+
+    def setup(self, env, params):
+        PointsCase.setup(self, env, params)
+        snap = self.presenter.snap
+        snap.snap_to_objects = snap.snap_to_page = True
+        snap.snap_to_guides = snap.snap_to_grid = True
+        canvas = self.presenter.canvas
+        self.points = [canvas.point_doc_to_win(point)
+                       for point in self.points]
+
+    def run(self):
+        snap = self.presenter.snap
+        snap.update()
+        for point in self.points:
+            snap.snap_point(point)
+
+
+class TransformUndo(BenchCase):
+    name = 'api.transform_selected+do_undo'
+
+    def populate(self):
+        docgen.add_curves(self.presenter, self.params['curves'])
+
+    def run(self):
+        self.presenter.selection.select_all()
+        api = self.presenter.api
+        api.transform_selected([1.0, 0.0, 0.0, 1.0, 10.0, 10.0])
+        api.do_undo()
+
+
+class PDFPrinting(BenchCase):
+    name = 'printing.pdf'
+    filepath = ''
+
+    def populate(self):
+        docgen.add_curves(self.presenter, self.params['curves'] // 10)
+        self.filepath = os.path.join(self.env.cfgdir, 'bench.pdf')
+
+    def run(self):
+        from sk1.printing.pdf_printer import PDF_Printer
+        from sk1.printing.printout import Printout
+        printer = PDF_Printer()
+        printer.set_filepath(self.filepath)
+        printer.printing(Printout(self.presenter))
+
+
+CASES = [RenderCurves, RenderCurvesWarm, RenderDeepGroups, RenderBitmap,
+         RenderLongText, SelectAtPoint, SnapPoint, TransformUndo,
+         PDFPrinting]
+
+
+def get_case(name):
+    for case in CASES:
+        if case.name == name:
+            return case
+    raise KeyError(name)
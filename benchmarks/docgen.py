@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import base64
+import cairo
+import math
+import random
+from copy import deepcopy
+from cStringIO import StringIO
+
+from uc2 import sk2const, uc2const
+from uc2.formats.sk2 import sk2_model
+
+SEED = 1234
+
+
+def get_random(seed=SEED):
+    return random.Random(seed)
+
+
+def make_paths(rnd, bbox, nodes=8):
+    """
+    Returns closed bezier path inscribed into bbox.
+    """
+    x0, y0, x1, y1 = bbox
+    cx, cy = (x0 + x1) / 2.0, (y0 + y1) / 2.0
+    rx, ry = (x1 - x0) / 2.0, (y1 - y0) / 2.0
+    points = []
+    for i in range(nodes):
+        angle = 2.0 * math.pi * i / nodes
+        k = rnd.uniform(0.5, 1.0)
+        points.append((cx + k * rx * math.cos(angle),
+                       cy + k * ry * math.sin(angle)))
+    start = list(points[0])
+    segments = []
+    for i in range(1, nodes + 1):
+        p0 = points[i - 1]
+        p1 = points[i % nodes]
+        c0 = [p0[0] + (p1[0] - p0[0]) / 3.0, p0[1] + (p1[1] - p0[1]) / 3.0]
+        c1 = [p1[0] - (p1[0] - p0[0]) / 3.0, p1[1] - (p1[1] - p0[1]) / 3.0]
+        segments.append([c0, c1, list(p1), 0])
+    return [[start, segments, 1]]
+
+
+def get_style(presenter, rnd):
+    style = deepcopy(presenter.model.get_def_style())
+    color = [rnd.random(), rnd.random(), rnd.random()]
+    style[0] = [sk2const.FILL_EVENODD, sk2const.FILL_SOLID,
+                [uc2const.COLOR_RGB, color, 1.0, '']]
+    return style
+
+
+def get_layer(presenter):
+    return presenter.active_layer
+
+
+def _random_bbox(presenter, rnd, size):
+    w, h = presenter.get_page_size()
+    x = rnd.uniform(-w / 2.0, w / 2.0 - size)
+    y = rnd.uniform(-h / 2.0, h / 2.0 - size)
+    return [x, y, x + size, y + size]
+
+
+def make_curve(presenter, parent, rnd, size=20.0):
+    paths = make_paths(rnd, _random_bbox(presenter, rnd, size))
+    obj = sk2_model.Curve(presenter.model.config, parent, paths)
+    obj.style = get_style(presenter, rnd)
+    obj.update()
+    return obj
+
+
+def add_curves(presenter, num, seed=SEED):
+    rnd = get_random(seed)
+    layer = get_layer(presenter)
+    for _i in range(num):
+        layer.childs.append(make_curve(presenter, layer, rnd))
+    return layer.childs
+
+
+def add_deep_groups(presenter, depth=8, breadth=3, seed=SEED):
+    """
+    Adds nested groups, breadth ** depth curves in total.
+    """
+    rnd = get_random(seed)
+    layer = get_layer(presenter)
+    cfg = presenter.model.config
+
+    def make_level(parent, level):
+        if not level:
+            return [make_curve(presenter, parent, rnd)
+                    for _i in range(breadth)]
+        group = sk2_model.Group(cfg, parent, [])
+        for _i in range(breadth):
+            group.childs += make_level(group, level - 1)
+        group.update()
+        return [group, ]
+
+    layer.childs += make_level(layer, depth)
+    return layer.childs
+
+
+def add_bitmap(presenter, width=4000, height=3000, seed=SEED):
+    rnd = get_random(seed)
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+    ctx = cairo.Context(surface)
+    for _i in range(200):
+        ctx.set_source_rgb(rnd.random(), rnd.random(), rnd.random())
+        ctx.rectangle(rnd.uniform(0, width), rnd.uniform(0, height),
+                      rnd.uniform(10, width / 4), rnd.uniform(10, height / 4))
+        ctx.fill()
+    fileptr = StringIO()
+    surface.write_to_png(fileptr)
+    layer = get_layer(presenter)
+    obj = sk2_model.Pixmap(presenter.model.config, layer)
+    obj.handler.load_from_b64str(presenter.cms,
+                                 base64.b64encode(fileptr.getvalue()))
+    obj.update()
+    layer.childs.append(obj)
+    return obj
+
+
+def add_long_text(presenter, num_chars=20000, seed=SEED):
+    rnd = get_random(seed)
+    words = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur',
+             'adipisicing', 'elit', 'sed', 'do', 'eiusmod', 'tempor']
+    text = []
+    size = 0
+    while size < num_chars:
+        word = rnd.choice(words)
+        text.append(word)
+        size += len(word) + 1
+    layer = get_layer(presenter)
+    w, h = presenter.get_page_size()
+    obj = sk2_model.Text(presenter.model.config, layer,
+                         [-w / 2.0 + 10.0, h / 2.0 - 10.0],
+                         ' '.join(text), width=w - 20.0,
+                         style=presenter.model.get_text_style())
+    obj.update()
+    layer.childs.append(obj)
+    return obj
+
+
+def finalize(presenter):
+    """
+    Notifies presenter that document is changed behind API.
+    """
+    eventloop = presenter.eventloop
+    eventloop.emit(eventloop.DOC_MODIFIED)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks import walstub
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+
+
+class Permissive(object):
+    """
+    Stand-in for application parts which are not benchmarked
+    (main window, status bar, inspector etc.)
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Permissive()
+
+    def __call__(self, *args, **kwargs):
+        return Permissive()
+
+    def __nonzero__(self):
+        return False
+
+    def __iter__(self):
+        return iter([])
+
+
+class BenchTimer(Permissive):
+    def is_running(self):
+        return False
+
+
+class BenchDC(Permissive):
+    """
+    Offscreen replacement of canvas widget.
+    """
+    width = 1200
+    height = 800
+    timer = None
+    surface = None
+
+    def __init__(self, width=1200, height=800):
+        self.width = width
+        self.height = height
+        self.timer = BenchTimer()
+
+    def get_size(self):
+        return self.width, self.height
+
+    def put_surface(self, surface, x=0, y=0, use_mask=True):
+        self.surface = surface
+
+    def draw_surface(self, surface, x=0, y=0, use_mask=True):
+        self.surface = surface
+
+
+class BenchApp(Permissive):
+    appdata = None
+    current_doc = None
+    doc_counter = 0
+    mw = None
+
+    def __init__(self, cfgdir, width=1200, height=800):
+        from sk1.app_conf import AppData
+        self.appdata = AppData(self, cfgdir)
+        self.mw = Permissive()
+        self.mw.mdi = Permissive()
+        self.mw.mdi.canvas = BenchDC(width, height)
+
+    def get_new_docname(self):
+        self.doc_counter += 1
+        return 'Benchmark %d' % self.doc_counter
+
+
+class Environment(object):
+    """
+    Initializes sK1 config in temporary directory
+    and creates headless presenters.
+    """
+    cfgdir = ''
+    app = None
+
+    def __init__(self, width=1200, height=800):
+        walstub.install()
+        if SRC_DIR not in sys.path:
+            sys.path.insert(0, SRC_DIR)
+        import sk1
+        self.cfgdir = tempfile.mkdtemp(prefix='sk1-bench-')
+        sk1.init_config(self.cfgdir)
+        sk1.config.app = self.app = BenchApp(self.cfgdir, width, height)
+        # cases measure complete repaints
+        sk1.config.canvas_progressive = False
+
+    def destroy(self):
+        shutil.rmtree(self.cfgdir, ignore_errors=True)
+
+    def new_presenter(self):
+        from sk1.document.presenter import SK1Presenter
+        presenter = SK1Presenter(self.app, silent=True)
+        self.app.current_doc = presenter
+        presenter.canvas._fit_to_page()
+        return presenter
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+import types
+from collections import defaultdict
+
+IS_FLAGS = ['IS_MSW', 'IS_MAC', 'IS_WINXP', 'IS_WX2', 'IS_WX3', 'IS_GTK3',
+            'IS_UNITY', 'IS_UNITY_16']
+
+
+class StubMeta(type):
+    """
+    Stub classes are subclassable, callable and provide
+    any attribute, so module level wal usage is satisfied.
+    """
+
+    def __getattr__(cls, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return get_stub(name)
+
+    def __getitem__(cls, key):
+        return get_stub(str(key))
+
+    def __iter__(cls):
+        return iter([])
+
+    def __nonzero__(cls):
+        return False
+
+
+class Stub(object):
+    __metaclass__ = StubMeta
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Stub
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+    def __nonzero__(self):
+        return False
+
+    def __iter__(self):
+        return iter([])
+
+
+STUBS = {}
+
+
+def get_stub(name):
+    # each name gets own class to allow multiple inheritance
+    if name not in STUBS:
+        STUBS[name] = StubMeta(name, (Stub,), {})
+    return STUBS[name]
+
+
+class WalModule(types.ModuleType):
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return get_stub(name)
+
+
+def install():
+    """
+    Installs stub 'wal' module. Must be called before sk1 imports.
+    """
+    if 'wal' in sys.modules:
+        return sys.modules['wal']
+    wal = WalModule('wal')
+    for name in IS_FLAGS:
+        setattr(wal, name, False)
+    wal.IS_GTK = True
+    wal.SPIN = {}
+    wal.UI_COLORS = defaultdict(lambda: (0, 0, 0))
+    wal.untr = lambda text: text
+    wal.new_id = lambda: 0
+    sys.modules['wal'] = wal
+    return wal
@@ -16,8 +16,8 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import os
+import socket
 import sys
-import time
 
 import uc2
 from uc2.utils import fsutils
@@ -25,6 +25,10 @@ from uc2.utils import fsutils
 _ = uc2._
 config = None
 
+SERVER_SOCKET = 'sk1.socket'
+SERVER_ACK = 'OK'
+SERVER_TIMEOUT = 5.0
+
 
 def get_sys_path(path):
     return path.decode('utf-8').encode(sys.getfilesystemencoding())
@@ -71,28 +75,47 @@ def init_config(cfgdir='~'):
     config.resource_dir = resource_dir
 
 
+def send_to_server(path, items):
+    """
+    Passes file names to running application instance via unix socket.
+    Request is a list of lines terminated by empty line, server
+    replies SERVER_ACK when names are queued for opening.
+    Returns True if request is acknowledged.
+    """
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return False
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(SERVER_TIMEOUT)
+    try:
+        client.connect(path)
+        client.sendall(''.join(['%s\n' % item for item in items]) + '\n')
+        reply = client.makefile('rb').readline()
+        return reply.strip() == SERVER_ACK
+    except socket.error:
+        return False
+    finally:
+        client.close()
+
+
 def check_server(cfgdir):
     cfg_dir = os.path.join(cfgdir, '.config', 'sk1-wx')
-    lock = os.path.join(cfg_dir, 'lock')
-    if config.app_server and os.path.exists(lock):
-        socket = os.path.join(cfg_dir, 'socket')
-        with open(socket, 'wb') as fp:
-            for item in sys.argv[1:]:
-                fp.write('%s\n' % item)
-        time.sleep(2)
-        if os.path.exists(socket):
-            os.remove(socket)
-        else:
+    if config.app_server:
+        items = [os.path.abspath(item) for item in sys.argv[1:]]
+        if send_to_server(os.path.join(cfg_dir, SERVER_SOCKET), items):
             sys.exit(0)
 
 
 def sk1_run(cfgdir='~'):
     """sK1 application launch routine"""
 
+    from sk1.app_profiler import STARTUP, check_startup_option
+    check_startup_option()
+
     cfgdir = get_utf8_path(os.path.expanduser(cfgdir))
     _pkgdir = get_utf8_path(__path__[0])
 
     init_config(cfgdir)
+    STARTUP.mark('config')
     check_server(get_sys_path(cfgdir))
     os.environ["NO_AT_BRIDGE"] = "1"
     os.environ["GTK_CSD"] = "0"
@@ -103,6 +126,7 @@ def sk1_run(cfgdir='~'):
         os.environ["LIBOVERLAY_SCROLLBAR"] = "0"
 
     from sk1.application import SK1Application
+    STARTUP.mark('imports')
 
     app = SK1Application(_pkgdir, cfgdir)
     app.run()
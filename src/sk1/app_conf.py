@@ -101,6 +101,8 @@ class AppConfig(UCConfig):
     make_export_backup = False
     active_plugins = None
     make_font_cache_on_start = False
+    undo_memory_limit = 256  # in MB, 0 - unlimited
+    shaping_workers = 0  # processes for boolean ops, 0 - number of CPUs
 
     ui_style = appconst.GUI_CLASSIC
     tab_style = 0
@@ -120,8 +122,10 @@ class AppConfig(UCConfig):
     mw_min_width = 1000
     mw_min_height = 650
 
-    history_dlg_size = (500, 350)
-    history_dlg_minsize = (500, 350)
+    history_dlg_size = (680, 350)
+    history_dlg_minsize = (680, 350)
+    template_dlg_size = (500, 350)
+    template_dlg_minsize = (500, 350)
 
     prefs_dlg_size = (700, 440)
     prefs_dlg_minsize = (700, 440)
@@ -137,6 +141,9 @@ class AppConfig(UCConfig):
     print_preview_dlg_size = (850, 650)
     print_preview_dlg_minsize = (850, 650)
     print_preview_dlg_maximized = False
+    print_color_cache_size = 4096  # in colors
+    print_cups_streaming = True
+    print_stream_chunk = 16  # in pages
 
     prnprops_dlg_size = (400, 500)
     prnprops_dlg_minsize = (400, 500)
@@ -181,6 +188,9 @@ class AppConfig(UCConfig):
     collection_dir = '~'
     print_dir = '~'
     log_dir = '~'
+    background_io = True  # read files and save SK2 in worker threads
+    thumbnail_size = 160  # in px
+    thumbnail_cache_size = 32  # in MB
 
     # ============== MOUSE OPTIONS ================
     mouse_scroll_sensitivity = 3.0
@@ -232,6 +242,25 @@ class AppConfig(UCConfig):
     rotation_step = 5.0  # in degrees
     stroke_sensitive_size = 5.0  # in pixels
 
+    analytic_hit_test = True
+    hit_cache_size = 10000  # in objects
+
+    canvas_tile_cache = True
+    canvas_tile_size = 256  # in pixels
+    canvas_tile_cache_size = 256  # in tiles
+    canvas_culling = True
+    canvas_progressive = True
+    canvas_render_budget = 30  # in ms per repaint
+    canvas_render_delay = 10  # in ms between repaints
+    canvas_render_worker = False
+    live_drag_preview = True
+
+    canvas_profiler = False
+    canvas_profiler_hud = False
+    canvas_profiler_frames = 300  # in frames
+    canvas_profiler_file = ''  # *.json or *.csv, written on document close
+    event_stats = False  # collect signal dispatch statistics
+
     # ============== SNAPPING OPTIONS ================
     snap_distance = 10.0  # in pixels
     snap_order = [appconst.SNAP_TO_GUIDES,
@@ -263,6 +292,8 @@ class AppConfig(UCConfig):
     curve_stroke_width = 0.7
     curve_trace_color = (1.0, 0.0, 0.0)
     curve_point_sensitivity_size = 12.0
+    # max deviation (px) of freehand nodes dropped while drawing, 0 - off
+    curve_simplify_tolerance = 0.5
 
     curve_start_point_size = 5.0
     curve_start_point_fill = (1.0, 1.0, 1.0)
@@ -403,12 +434,13 @@ class WinConfig(AppConfig):
     toolbar_size = (24, 24)
     toolbar_icon_size = (22, 22)
     tabs_use_bold = False
+    shaping_workers = 1
 
     prefs_dlg_size = (700, 450)
     prefs_dlg_minsize = (700, 450)
 
-    history_dlg_size = (630, 350)
-    history_dlg_minsize = (630, 350)
+    history_dlg_size = (810, 350)
+    history_dlg_minsize = (810, 350)
 
     fill_dlg_size = (485, 410)
     fill_dlg_minsize = (485, 410)
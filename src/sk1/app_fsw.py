@@ -15,50 +15,160 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import logging
 import os
+import socket
+import threading
+from Queue import Queue, Empty
 
 import wal
-from sk1 import config, events
+from sk1 import config, events, SERVER_SOCKET, SERVER_ACK, SERVER_TIMEOUT
+from uc2.utils import fsutils
+
+LOG = logging.getLogger(__name__)
+
+QUEUE_DELAY = 100
+
+
+class AppServer(threading.Thread):
+    """
+    Unix socket server of single application instance. Each
+    connection passes file names (one per line, empty line ends
+    request), names are queued and acknowledged at once.
+    """
+    path = ''
+    server = None
+    queue = None
+
+    def __init__(self, path, queue):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.path = path
+        self.queue = queue
+
+    def bind(self):
+        """
+        Binds server socket. Returns False if another instance
+        is already serving.
+        """
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+                return False
+            except socket.error:
+                os.remove(self.path)
+            finally:
+                probe.close()
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(5)
+        return True
+
+    def stop(self):
+        server, self.server = self.server, None
+        if server is not None:
+            try:
+                server.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            server.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def run(self):
+        # stop() resets self.server from UI thread
+        server = self.server
+        while server is not None and self.server is server:
+            try:
+                conn = server.accept()[0]
+            except socket.error:
+                break
+            try:
+                self.process(conn)
+            except socket.error as e:
+                LOG.warn('Error processing server request %s', e)
+            finally:
+                conn.close()
+
+    def process(self, conn):
+        conn.settimeout(SERVER_TIMEOUT)
+        fp = conn.makefile('rb')
+        items = []
+        while True:
+            line = fp.readline()
+            if not line:
+                # incomplete request, e.g. probe of bind()
+                return
+            if not line.strip('\n'):
+                break
+            items.append(line.strip('\n'))
+        fp.close()
+        self.queue.put(items)
+        conn.sendall(SERVER_ACK + '\n')
 
 
 class AppFileWatcher(object):
+    """
+    Opens files passed by other application instances.
+    Requests are received by AppServer thread and processed
+    in UI thread on timer.
+    """
     app = None
     mw = None
+    server = None
+    queue = None
 
     def __init__(self, app, mw):
         self.app = app
         self.mw = mw
-        self.timer = wal.CanvasTimer(mw, 1000)
-        self.mw.bind_timer(self.on_timer)
-        self.socket = os.path.join(self.app.appdata.app_config_dir, 'socket')
-        self.lock = os.path.join(self.app.appdata.app_config_dir, 'lock')
+        self.queue = Queue()
+        self.timer = wal.CanvasTimer(mw, delay=QUEUE_DELAY,
+                                     on_timer=self.on_timer)
+        self.socket = os.path.join(self.app.appdata.app_config_dir,
+                                   SERVER_SOCKET)
         events.connect(events.CONFIG_MODIFIED, self.check_config)
         if config.app_server:
-            self.timer.start()
-            with open(self.lock, 'wb') as fp:
-                fp.write('\n')
+            self.start()
 
     def destroy(self):
-        if os.path.exists(self.lock):
-            os.remove(self.lock)
+        self.stop()
+
+    def start(self):
+        if not hasattr(socket, 'AF_UNIX') or self.server is not None:
+            return
+        server = AppServer(self.socket, self.queue)
+        try:
+            if not server.bind():
+                LOG.info('Application server is already running')
+                return
+        except socket.error as e:
+            LOG.warn('Cannot start application server %s', e)
+            return
+        self.server = server
+        self.server.start()
+        self.timer.start()
+
+    def stop(self):
         if self.timer.is_running():
             self.timer.stop()
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
 
     def check_config(self, *args):
-        if config.app_server and not self.timer.is_running():
-            self.timer.start()
-        elif not config.app_server and self.timer.is_running():
-            self.timer.stop()
+        if config.app_server:
+            self.start()
+        else:
+            self.stop()
 
     def on_timer(self, *args):
-        if os.path.exists(self.socket):
+        while True:
+            try:
+                items = self.queue.get_nowait()
+            except Empty:
+                break
             self.mw.raise_window()
-            with open(self.socket, 'rb') as fp:
-                lines = fp.readlines()
-            os.remove(self.socket)
-            [self.app.open(item.strip('\n'))
-             for item in lines
-             if os.path.exists(item.strip('\n'))]
-        if not os.path.exists(self.lock):
-            with open(self.lock, 'wb') as fp:
-                fp.write('\n')
+            for item in items:
+                if os.path.exists(item):
+                    self.app.open(fsutils.get_utf8_path(item))
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import os
+import sys
+import threading
+from copy import copy, deepcopy
+
+import wal
+from uc2 import events, uc2const
+
+LOG = logging.getLogger(__name__)
+
+IO_POLL_DELAY = 100
+
+# savers which serialize model only, i.e. don't lay out text
+# and don't render by pango/cairo, so can run in I/O thread
+MODEL_SAVERS = (uc2const.SK2,)
+
+
+def read_file(path):
+    with open(path, 'rb') as fileptr:
+        return fileptr.read()
+
+
+def is_model_saver(doc_file):
+    ext = os.path.splitext(doc_file)[1][1:].lower()
+    return any([ext in uc2const.FORMAT_EXTENSION[item]
+                for item in MODEL_SAVERS])
+
+
+def copy_model(obj, parent=None):
+    """
+    Returns structural copy of model object tree. Data attributes
+    are deep copied, references to shared objects (config, caches
+    and so on) are kept. Raises exception if data attribute cannot
+    be copied, i.e. model cannot be detached.
+    """
+    new_obj = copy(obj)
+    for key, value in obj.__dict__.items():
+        if key == 'childs':
+            new_obj.childs = [copy_model(item, new_obj) for item in value]
+        elif key == 'parent':
+            new_obj.parent = parent
+        elif isinstance(value, (list, dict)):
+            try:
+                new_obj.__dict__[key] = deepcopy(value)
+            except Exception as e:
+                LOG.warn('Cannot copy <%s> of %s: %s', key,
+                         obj.__class__.__name__, e)
+                raise
+    return new_obj
+
+
+def get_snapshot(doc_presenter):
+    """
+    Returns shallow copy of document presenter with copied model,
+    so saver can run in background while model is edited.
+    """
+    snapshot = copy(doc_presenter)
+    snapshot.model = copy_model(doc_presenter.model)
+    methods = copy(doc_presenter.methods)
+    for key, value in methods.__dict__.items():
+        if value is doc_presenter:
+            methods.__dict__[key] = snapshot
+        elif value is doc_presenter.model:
+            methods.__dict__[key] = snapshot.model
+    snapshot.methods = methods
+    return snapshot
+
+
+class IOJob(threading.Thread):
+    """
+    Runs file reading or model saver in worker thread. Loaders and
+    rendering savers use pango which is not thread-safe, so they are
+    never run by job. Progress reported by FILTER_INFO from job thread
+    is stored in job and read by UI thread. on_done(job) and
+    on_progress(job) are called in UI thread by IOManager, cancelled
+    job is dropped silently (its result is closed if it can be).
+    """
+    func = None
+    args = None
+    result = None
+    error = None
+    msg = ''
+    progress = 0.0
+    cancelled = False
+    on_done = None
+    on_progress = None
+
+    def __init__(self, func, args, on_done=None, on_progress=None):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.func = func
+        self.args = args
+        self.on_done = on_done
+        self.on_progress = on_progress
+
+    def run(self):
+        try:
+            self.result = self.func(*self.args)
+        except Exception:
+            self.error = sys.exc_info()
+            LOG.error('Error in background job', exc_info=True)
+
+    def listener(self, msg, value, *args):
+        if threading.current_thread() is self:
+            self.msg = msg
+            self.progress = value
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class IOManager:
+    """
+    Starts background I/O jobs and polls them on timer, so
+    job callbacks are executed in UI thread.
+    """
+    app = None
+    jobs = None
+    timer = None
+
+    def __init__(self, app):
+        self.app = app
+        self.jobs = []
+        self.timer = wal.CanvasTimer(app.mw, delay=IO_POLL_DELAY,
+                                     on_timer=self.on_timer)
+
+    def destroy(self):
+        self.timer.stop()
+        for job in self.jobs:
+            job.cancel()
+            events.disconnect(events.FILTER_INFO, job.listener)
+        self.jobs = []
+
+    def start(self, job):
+        events.connect(events.FILTER_INFO, job.listener)
+        self.jobs.append(job)
+        job.start()
+        if not self.timer.is_running():
+            self.timer.start()
+
+    def wait(self, job):
+        """
+        Blocks till job is finished and calls its callback.
+        """
+        if job in self.jobs:
+            job.join()
+            self.on_timer()
+
+    def on_timer(self, *args):
+        for job in [] + self.jobs:
+            if job.is_alive():
+                if not job.cancelled and job.on_progress is not None:
+                    job.on_progress(job)
+                continue
+            self.jobs.remove(job)
+            events.disconnect(events.FILTER_INFO, job.listener)
+            if job.cancelled:
+                # e.g. document of already closed tab
+                close = getattr(job.result, 'close', None)
+                if close is not None:
+                    close()
+            elif job.on_done is not None:
+                try:
+                    job.on_done(job)
+                except Exception:
+                    LOG.error('Error in background job callback',
+                              exc_info=True)
+        if not self.jobs:
+            self.timer.stop()
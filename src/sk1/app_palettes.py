@@ -15,6 +15,7 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import logging
 import os
 
 from sk1 import config, events
@@ -28,12 +29,61 @@ from uc2.utils import generate_id, fsutils
 STD_CMYK_PALETTE = 'sK1 CMYK palette'
 STD_RGB_PALETTE = 'sK1 RGB palette'
 
+LOG = logging.getLogger(__name__)
+
+
+class PaletteStub:
+    """
+    Placeholder of not loaded yet palette file.
+    """
+    filepath = ''
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+
+
+class LazyPalettes(dict):
+    """
+    Palette dictionary which parses palette files on first access.
+    Palette names are known from config, so palette lists are
+    available without loading.
+    """
+    loader = None
+
+    def __init__(self, loader):
+        dict.__init__(self)
+        self.loader = loader
+
+    def __getitem__(self, name):
+        value = dict.__getitem__(self, name)
+        if isinstance(value, PaletteStub):
+            value = self.loader(name, value.filepath)
+            if name in self:
+                dict.__setitem__(self, name, value)
+        return value
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def values(self):
+        return [self[name] for name in self.keys()]
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
 
 class AppPaletteManager(PaletteManager):
     palette_in_use = None
 
     def __init__(self, app):
         PaletteManager.__init__(self, app)
+        self.palettes = LazyPalettes(self.load_palette)
         self.init_builtin_palettes()
         self.load_palettes()
         self.set_palette(config.palette)
@@ -60,17 +110,28 @@ class AppPaletteManager(PaletteManager):
 
     def load_palettes(self):
         paldir = self.app.appdata.app_palette_dir
-        loader = get_loader_by_id(uc2const.SKP)
         for item in config.palette_files.keys():
             filepath = os.path.join(paldir, config.palette_files[item])
-            try:
-                self.palettes[item] = loader(self.app.appdata, filepath, False,
-                                             False, True)
-            except Exception:
-                if fsutils.isfile(filepath):
-                    os.remove(fsutils.get_sys_path(filepath))
+            if fsutils.isfile(filepath):
+                self.palettes[item] = PaletteStub(filepath)
+            else:
                 del config.palette_files[item]
 
+    def load_palette(self, name, filepath):
+        loader = get_loader_by_id(uc2const.SKP)
+        try:
+            return loader(self.app.appdata, filepath, False, False, True)
+        except Exception as e:
+            LOG.error('Cannot load palette <%s> %s', name, e)
+            if fsutils.isfile(filepath):
+                os.remove(fsutils.get_sys_path(filepath))
+            if name in config.palette_files:
+                del config.palette_files[name]
+            del self.palettes[name]
+            if config.palette == name:
+                config.palette = STD_CMYK_PALETTE
+            return self.palettes[STD_CMYK_PALETTE]
+
     def update(self, *args):
         if args[0] == 'palette':
             self.set_palette(config.palette)
@@ -34,21 +34,135 @@ def check_package(path, name):
     return fsutils.exists(py_file) or fsutils.exists(pyc_file)
 
 
-def scan_plugins(app):
-    ret = {}
+def get_plugin_signature(path, name):
+    """
+    Returns plugin package modification signature.
+    """
+    full_path = os.path.join(path, name)
+    for filename in ('__init__.py', '__init__.pyc'):
+        filepath = os.path.join(full_path, filename)
+        if os.path.isfile(filepath):
+            return '%s:%d' % (filename, int(os.path.getmtime(filepath)))
+    return ''
+
+
+def list_plugin_packages():
+    """
+    Returns list of (module name, signature) for installed plugins.
+    """
+    packages = []
     for path in config.plugin_dirs:
         path = get_sys_path(path)
-        plgs = [item for item in os.listdir(path) if check_package(path, item)]
-        if plgs:
-            bn = os.path.basename(path)
-            for item in plgs:
-                try:
-                    pkg = __import__(bn + '.' + item)
-                    plg_mod = getattr(pkg, item)
-                    pobj = plg_mod.get_plugin(app)
-                    ret[pobj.pid] = pobj
-                except Exception as e:
-                    LOG.error('Error while importing <%s> plugin %s', item, e)
+        if not os.path.isdir(path):
+            continue
+        bn = os.path.basename(path)
+        for item in sorted(os.listdir(path)):
+            if check_package(path, item):
+                signature = get_plugin_signature(path, item)
+                packages.append((bn + '.' + item, signature))
+    return packages
+
+
+def import_plugin(app, module_name):
+    item = module_name.split('.', 1)[1]
+    pkg = __import__(module_name)
+    plg_mod = getattr(pkg, item)
+    return plg_mod.get_plugin(app)
+
+
+def read_manifest(filepath):
+    """
+    Reads plugin manifest: {module name: [signature, [pid,...]]}
+    """
+    manifest = {}
+    filepath = get_sys_path(filepath)
+    if not os.path.isfile(filepath):
+        return manifest
+    try:
+        with open(filepath) as fp:
+            for line in fp.readlines():
+                items = line.split()
+                if len(items) > 1:
+                    manifest[items[0]] = [items[1], items[2:]]
+    except Exception as e:
+        LOG.warn('Cannot read plugin manifest %s', e)
+        return {}
+    return manifest
+
+
+def write_manifest(filepath, manifest):
+    try:
+        with open(get_sys_path(filepath), 'wb') as fp:
+            for module_name in sorted(manifest.keys()):
+                signature, pids = manifest[module_name]
+                fp.write('%s %s %s\n' % (module_name, signature,
+                                         ' '.join(pids)))
+    except Exception as e:
+        LOG.warn('Cannot write plugin manifest %s', e)
+
+
+class PluginRegistry(dict):
+    """
+    Plugin dictionary {pid: plugin} loading plugins on first access.
+    Plugin ids are resolved via manifest written at scan time, so
+    plugin modules are imported only when plugin is requested.
+    """
+    app = None
+    modules = None
+
+    def __init__(self, app, modules):
+        dict.__init__(self)
+        self.app = app
+        self.modules = modules
+
+    def __missing__(self, pid):
+        module_name = self.modules.get(pid)
+        if module_name is None:
+            raise KeyError(pid)
+        pobj = import_plugin(self.app, module_name)
+        if not pobj.pid == pid:
+            LOG.warn('Plugin manifest is outdated for <%s>', module_name)
+        self[pobj.pid] = pobj
+        if not dict.__contains__(self, pid):
+            raise KeyError(pid)
+        return dict.__getitem__(self, pid)
+
+    def __contains__(self, pid):
+        return dict.__contains__(self, pid) or pid in self.modules
+
+    def get_pids(self):
+        return self.modules.keys()
+
+
+def scan_plugins(app):
+    """
+    Returns plugin registry. Plugin modules are imported only if
+    they are absent in manifest or modified since last scan.
+    """
+    manifest_path = os.path.join(app.appdata.app_config_dir,
+                                 'plugins.manifest')
+    manifest = read_manifest(manifest_path)
+    new_manifest = {}
+    modules = {}
+    ret = PluginRegistry(app, modules)
+    for module_name, signature in list_plugin_packages():
+        entry = manifest.get(module_name)
+        if entry and entry[0] == signature and entry[1]:
+            pids = entry[1]
+        else:
+            try:
+                pobj = import_plugin(app, module_name)
+                ret[pobj.pid] = pobj
+                pids = [pobj.pid, ]
+            except Exception as e:
+                LOG.error('Error while importing <%s> plugin %s',
+                          module_name, e)
+                continue
+        new_manifest[module_name] = [signature, pids]
+        for pid in pids:
+            modules[pid] = module_name
+    if not new_manifest == manifest:
+        write_manifest(manifest_path, new_manifest)
     return ret
 
 
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sys
+import time
+
+PROFILE_STARTUP_OPT = '--profile-startup'
+
+
+class StartupProfiler:
+    """
+    Collects per-phase timing of application start.
+    Phase is closed by the next mark() call.
+    """
+    enabled = False
+    start = 0.0
+    last = 0.0
+    phases = None
+    reported = False
+
+    def __init__(self):
+        self.phases = []
+        self.start = self.last = time.time()
+
+    def enable(self):
+        self.enabled = True
+
+    def mark(self, phase):
+        now = time.time()
+        if self.enabled:
+            self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self, stream=None):
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        stream = stream or sys.__stdout__
+        total = time.time() - self.start
+        stream.write('Startup profile:\n')
+        for phase, value in self.phases:
+            percent = 100.0 * value / total if total else 0.0
+            stream.write('  %-24s %8.1f ms %5.1f%%\n' %
+                         (phase, value * 1000.0, percent))
+        stream.write('  %-24s %8.1f ms\n' % ('total', total * 1000.0))
+        stream.flush()
+
+
+STARTUP = StartupProfiler()
+
+
+def check_startup_option():
+    """
+    Enables startup profiling if option is in command line
+    and removes option from arguments.
+    """
+    if PROFILE_STARTUP_OPT in sys.argv:
+        sys.argv.remove(PROFILE_STARTUP_OPT)
+        STARTUP.enable()
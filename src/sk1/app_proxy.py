@@ -210,10 +210,10 @@ class AppProxy:
         dialogs.filelog_viewer_dlg(self.mw)
 
     def save(self):
-        self.app.save()
+        self.app.save(background=True)
 
     def save_as(self):
-        self.app.save_as()
+        self.app.save_as(background=True)
 
     def save_selected(self):
         self.app.save_selected()
@@ -594,13 +594,13 @@ class AppProxy:
     def select_container(self, objs):
         selection = self.app.current_doc.selection
         if len(objs) == 1 and objs[0].is_primitive and \
-                not objs[0] in selection.objs and not objs[0].is_pixmap:
+                not selection.is_selected(objs[0]) and not objs[0].is_pixmap:
             self.app.current_doc.api.pack_container(objs[0])
             return False
 
         if not len(objs):
             txt = _("There is no selected object.")
-        elif objs[0] in selection.objs:
+        elif selection.is_selected(objs[0]):
             txt = _("Object from current selection cannot be container.")
         else:
             txt = _("Selected object cannot be container.")
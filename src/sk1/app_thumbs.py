@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from cStringIO import StringIO
+
+import wal
+from sk1 import config
+from sk1.app_worker import WorkerProcess
+from sk1.thumbworker import render_thumbnail
+
+LOG = logging.getLogger(__name__)
+
+THUMB_CACHE_VERSION = 1
+THUMB_EXT = '.png'
+THUMB_POLL_DELAY = 100  # in ms
+BITMAP_CACHE_SIZE = 32  # in bitmaps
+
+
+class ThumbnailManager:
+    """
+    Persistent cache of document page previews. Thumbnails are
+    stored as PNG files in config directory and keyed by file path,
+    modification time and size, so changed file gets new thumbnail.
+    Cache is limited by total files size, least recently used
+    thumbnails are evicted first.
+
+    Missing thumbnails are rendered one by one in helper process
+    (sk1.thumbworker) started on first request, callbacks are called
+    in UI thread as callback(path, bitmap).
+    """
+    app = None
+    cache_dir = ''
+    index = None
+    total = 0
+    bitmaps = None
+    pending = None
+    active = None
+    failed = None
+    worker = None
+    timer = None
+
+    def __init__(self, app):
+        self.app = app
+        self.cache_dir = os.path.join(app.appdata.app_config_dir,
+                                      'thumb_cache')
+        self.bitmaps = OrderedDict()
+        self.pending = []
+        self.failed = set()
+        self.timer = wal.CanvasTimer(app.mw, delay=THUMB_POLL_DELAY,
+                                     on_timer=self.on_timer)
+
+    def destroy(self):
+        self.timer.stop()
+        if self.worker is not None:
+            self.worker.terminate()
+        items = self.__dict__.keys()
+        for item in items:
+            self.__dict__[item] = None
+
+    def get_worker(self):
+        """
+        Returns rendering process, it is (re)started on demand.
+        """
+        if self.worker is None or not self.worker.is_alive():
+            appdata = self.app.appdata
+            cfgdir = os.path.dirname(os.path.dirname(appdata.app_config_dir))
+            try:
+                self.worker = WorkerProcess('sk1.thumbworker',
+                                            [self.app.path, cfgdir])
+            except Exception as e:
+                LOG.warn('Cannot start thumbnail process %s', e)
+                self.worker = None
+        return self.worker
+
+    def load_index(self):
+        """
+        Reads cache directory, files are ordered by access time
+        which is updated on each cache hit.
+        """
+        self.index = OrderedDict()
+        self.total = 0
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError as e:
+                LOG.warn('Cannot create thumbnail cache %s', e)
+            return
+        items = []
+        for name in os.listdir(self.cache_dir):
+            filepath = os.path.join(self.cache_dir, name)
+            if not name.endswith(THUMB_EXT):
+                if name.endswith('.tmp'):
+                    os.remove(filepath)
+                continue
+            stat = os.stat(filepath)
+            items.append((stat.st_mtime, name[:-len(THUMB_EXT)],
+                          stat.st_size))
+        items.sort()
+        for _mtime, key, size in items:
+            self.index[key] = size
+            self.total += size
+
+    def get_key(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        data = repr((THUMB_CACHE_VERSION, path, stat.st_mtime,
+                     stat.st_size, config.thumbnail_size))
+        return hashlib.md5(data).hexdigest()
+
+    def get_filepath(self, key):
+        return os.path.join(self.cache_dir, key + THUMB_EXT)
+
+    def _touch(self, key):
+        self.index[key] = self.index.pop(key)
+        try:
+            os.utime(self.get_filepath(key), None)
+        except OSError:
+            pass
+
+    def _add(self, key, size):
+        self.index[key] = size
+        self.total += size
+        limit = config.thumbnail_cache_size * 1024 * 1024
+        while self.total > limit and len(self.index) > 1:
+            old_key, old_size = self.index.popitem(last=False)
+            self.total -= old_size
+            self.bitmaps.pop(old_key, None)
+            try:
+                os.remove(self.get_filepath(old_key))
+            except OSError:
+                pass
+
+    def _get_bitmap(self, key):
+        bmp = self.bitmaps.pop(key, None)
+        if bmp is None:
+            try:
+                with open(self.get_filepath(key), 'rb') as fileptr:
+                    bmp = wal.stream_to_bitmap(StringIO(fileptr.read()))
+            except Exception as e:
+                LOG.warn('Cannot read thumbnail %s', e)
+                self.total -= self.index.pop(key, 0)
+                return None
+        self.bitmaps[key] = bmp
+        if len(self.bitmaps) > BITMAP_CACHE_SIZE:
+            self.bitmaps.popitem(last=False)
+        return bmp
+
+    def get_thumbnail(self, path, callback=None):
+        """
+        Returns thumbnail bitmap of document first page or None.
+        Missing thumbnail is queued for rendering if callback is
+        provided. New request replaces queued ones of the callback.
+        """
+        if self.index is None:
+            self.load_index()
+        key = self.get_key(path)
+        if key is None or key in self.failed:
+            return None
+        if key in self.index:
+            self._touch(key)
+            bmp = self._get_bitmap(key)
+            if bmp is not None:
+                return bmp
+        if callback is not None:
+            self.cancel(callback)
+            self.pending.append((key, path, callback))
+            self.process()
+        return None
+
+    def cancel(self, callback):
+        """
+        Drops queued requests of the callback.
+        """
+        self.pending = [item for item in self.pending
+                        if not item[2] == callback]
+
+    def process(self):
+        if self.active is not None or not self.pending:
+            return
+        key, path = self.pending[0][:2]
+        worker = self.get_worker()
+        if worker is None:
+            self.finish(key, None)
+            return
+        args = (path, self.get_filepath(key), config.thumbnail_size)
+        self.active = (key, worker.apply_async(render_thumbnail, args))
+        if not self.timer.is_running():
+            self.timer.start()
+
+    def on_timer(self):
+        if self.active is None:
+            self.timer.stop()
+            return
+        key, task = self.active
+        if not task.ready():
+            return
+        try:
+            self.finish(key, task.get())
+        except Exception as e:
+            LOG.warn('Cannot render thumbnail %s', e)
+            self.finish(key, None)
+
+    def finish(self, key, size):
+        self.active = None
+        if size is None:
+            self.failed.add(key)
+        else:
+            self._add(key, size)
+        requests = [item for item in self.pending if item[0] == key]
+        self.pending = [item for item in self.pending if not item[0] == key]
+        bmp = None if size is None else self._get_bitmap(key)
+        for _key, path, callback in requests:
+            callback(path, bmp)
+        self.process()
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import cPickle
+import logging
+import os
+import subprocess
+import sys
+import threading
+import traceback
+
+import sk1
+
+LOG = logging.getLogger(__name__)
+
+
+class WorkerTask:
+    """
+    Result of request processed by worker process. Mimics
+    multiprocessing AsyncResult.
+    """
+    result = None
+    error = None
+    event = None
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def set(self, error, result):
+        self.error = error
+        self.result = result
+        self.event.set()
+
+    def ready(self):
+        return self.event.is_set()
+
+    def get(self):
+        self.event.wait()
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        return self.result
+
+
+class WorkerProcess:
+    """
+    Helper process started as fresh interpreter running
+    'python -m module args', i.e. it doesn't inherit GUI state
+    as forked process does. Requests (func, args) are pickled to
+    process stdin, so func should be module level function of
+    module which doesn't import wal. Results are read by thread
+    which does pipe I/O only. Process exits when pipe is closed.
+    """
+    proc = None
+    tasks = None
+    lock = None
+    reader = None
+    count = 0
+
+    def __init__(self, module, args=()):
+        env = dict(os.environ)
+        path = os.path.dirname(os.path.dirname(sk1.__file__))
+        env['PYTHONPATH'] = os.pathsep.join(
+            [path] + [item for item in [env.get('PYTHONPATH')] if item])
+        cmd = [sys.executable, '-m', module] + list(args)
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, env=env)
+        self.tasks = {}
+        self.lock = threading.Lock()
+        self.reader = threading.Thread(target=self.read_results)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def terminate(self):
+        """
+        Kills process, pending tasks fail.
+        """
+        if self.proc.poll() is None:
+            self.proc.terminate()
+        self.proc.stdin.close()
+
+    def is_alive(self):
+        return self.proc.poll() is None
+
+    def get_load(self):
+        with self.lock:
+            return len(self.tasks)
+
+    def apply_async(self, func, args=()):
+        task = WorkerTask()
+        with self.lock:
+            self.count += 1
+            task_id = self.count
+            self.tasks[task_id] = task
+        try:
+            cPickle.dump((task_id, func, args), self.proc.stdin,
+                         cPickle.HIGHEST_PROTOCOL)
+            self.proc.stdin.flush()
+        except (IOError, ValueError) as e:
+            with self.lock:
+                self.tasks.pop(task_id, None)
+            task.set('Worker process is not available: %s' % e, None)
+        return task
+
+    def read_results(self):
+        while True:
+            try:
+                task_id, error, result = cPickle.load(self.proc.stdout)
+            except Exception:
+                break
+            with self.lock:
+                task = self.tasks.pop(task_id, None)
+            if task is not None:
+                task.set(error, result)
+        self.proc.wait()
+        with self.lock:
+            tasks, self.tasks = self.tasks, {}
+        for task in tasks.values():
+            task.set('Worker process is terminated', None)
+
+
+class WorkerPool:
+    """
+    Set of worker processes of the same module. Requests are passed
+    to the least loaded process, dead processes are restarted.
+    """
+    module = ''
+    args = ()
+    workers = None
+
+    def __init__(self, module, size, args=()):
+        self.module = module
+        self.args = args
+        self.workers = [WorkerProcess(module, args) for _i in range(size)]
+
+    def terminate(self):
+        for worker in self.workers:
+            worker.terminate()
+        self.workers = []
+
+    def apply_async(self, func, args=()):
+        for index, worker in enumerate(self.workers):
+            if not worker.is_alive():
+                self.workers[index] = WorkerProcess(self.module, self.args)
+        worker = min(self.workers, key=lambda item: item.get_load())
+        return worker.apply_async(func, args)
+
+
+def serve():
+    """
+    Request loop of worker process. Original stdout is reserved
+    for results, so output of processing code goes to stderr.
+    """
+    fileptr_in = sys.stdin
+    fileptr_out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    if sys.platform == 'win32':
+        import msvcrt
+        msvcrt.setmode(fileptr_in.fileno(), os.O_BINARY)
+        msvcrt.setmode(fileptr_out.fileno(), os.O_BINARY)
+    while True:
+        try:
+            task_id, func, args = cPickle.load(fileptr_in)
+        except EOFError:
+            break
+        except Exception:
+            # broken request stream cannot be resynchronized
+            traceback.print_exc()
+            break
+        error = result = None
+        try:
+            result = func(*args)
+        except Exception:
+            error = traceback.format_exc()
+        cPickle.dump((task_id, error, result), fileptr_out,
+                     cPickle.HIGHEST_PROTOCOL)
+        fileptr_out.flush()
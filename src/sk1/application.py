@@ -29,15 +29,18 @@ from sk1.app_cms import AppColorManager
 from sk1.app_conf import AppData
 from sk1.app_fsw import AppFileWatcher
 from sk1.app_history import AppHistoryManager
+from sk1.app_io import IOManager
 from sk1.app_insp import AppInspector
 from sk1.app_palettes import AppPaletteManager
+from sk1.app_profiler import STARTUP
 from sk1.app_proxy import AppProxy
 from sk1.app_stdout import StreamLogger
+from sk1.app_thumbs import ThumbnailManager
 from sk1.clipboard import AppClipboard
 from sk1.document.presenter import SK1Presenter
 from sk1.parts.artprovider import create_artprovider
 from sk1.parts.mw import AppMainWindow
-from sk1.pwidgets import font_cache_update
+from sk1.pwidgets import font_cache_prebuild
 from uc2 import uc2const, libimg, msgconst
 from uc2.application import UCApplication
 from uc2.formats import get_saver_by_id, get_loader
@@ -87,6 +90,7 @@ class SK1Application(wal.Application, UCApplication):
         config_logging(get_sys_path(self.log_filepath), log_level)
         sys.stderr = StreamLogger()
         LOG.info('Logging started')
+        STARTUP.mark('logging')
 
         self.update_wal()
         plg_dir = os.path.join(self.path, 'share', 'pd_plugins')
@@ -95,34 +99,45 @@ class SK1Application(wal.Application, UCApplication):
         sys.path.insert(1, get_sys_path(self.appdata.app_config_dir))
         sys.path.insert(1, get_sys_path(os.path.join(self.path, 'share')))
         config.app = self
+        events.enable_stats(config.event_stats)
         LOG.info('Config is updated')
+        STARTUP.mark('wal config')
 
         self.history = AppHistoryManager(self)
 
         self.artprovider = create_artprovider()
         self.cursors = modes.get_cursors()
+        STARTUP.mark('art provider')
 
         self.proxy = AppProxy(self)
         self.insp = AppInspector(self)
         self.plugins = app_plugins.scan_plugins(self)
+        STARTUP.mark('plugins')
         self.actions = app_actions.create_actions(self)
+        STARTUP.mark('actions')
 
         self.default_cms = AppColorManager(self)
+        STARTUP.mark('color management')
         self.palettes = AppPaletteManager(self)
+        STARTUP.mark('palettes')
         self.clipboard = AppClipboard(self)
 
         self.mw = AppMainWindow(self)
         self.mw.set_global_shortcuts(self.actions)
+        STARTUP.mark('main window')
 
         self.proxy.update()
         self.insp.update()
         LOG.info('Application is initialized')
         uc2.events.connect(uc2.events.MESSAGES, self.uc2_event_logging)
         events.connect(events.APP_STATUS, self.sk1_event_logging)
+        self.thumbs = ThumbnailManager(self)
         self.fsw = AppFileWatcher(self, self.mw)
+        self.io = IOManager(self)
 
         if wal.IS_WX2:
             events.emit(events.NO_DOCS)
+        STARTUP.mark('app init')
 
     def load_plugins(self):
         if config.active_plugins:
@@ -133,9 +148,9 @@ class SK1Application(wal.Application, UCApplication):
                     LOG.warn('Cannot load plugin <%s> %s', item, e)
 
     def call_after(self, *args):
-        if config.make_font_cache_on_start:
-            font_cache_update()
+        STARTUP.mark('main loop start')
         if self.docs:
+            self.prepare_font_cache()
             return
         docs = self._get_docs()
         if config.new_doc_on_start and not docs:
@@ -148,8 +163,19 @@ class SK1Application(wal.Application, UCApplication):
             if not wal.IS_WX2:
                 events.emit(events.NO_DOCS)
         self.update_actions()
+        STARTUP.mark('active plugins')
         for item in docs:
             self.open(item)
+        STARTUP.mark('documents')
+        self.prepare_font_cache()
+
+    def prepare_font_cache(self):
+        # Font caches are generated on first font control creation,
+        # prebuilding is postponed till the window and docs are shown.
+        if config.make_font_cache_on_start:
+            font_cache_prebuild()
+            STARTUP.mark('font cache')
+        STARTUP.report()
 
     def _get_docs(self):
         docs = []
@@ -187,6 +213,8 @@ class SK1Application(wal.Application, UCApplication):
             self.update_config()
             self.mw.destroy()
             self.fsw.destroy()
+            self.thumbs.destroy()
+            self.io.destroy()
             wal.Application.exit(self)
             LOG.info('Application terminated')
             return True
@@ -214,9 +242,8 @@ class SK1Application(wal.Application, UCApplication):
         events.emit(events.APP_STATUS, _('New document created'))
 
     def new_from_template(self):
-        msg = _('Select Template')
-        doc_file = dialogs.get_open_file_name(self.mw, config.template_dir, msg)
-        if fsutils.isfile(doc_file):
+        doc_file = dialogs.template_chooser_dlg(self.mw)
+        if doc_file and fsutils.isfile(doc_file):
             try:
                 doc = SK1Presenter(self, doc_file, template=True)
             except Exception as e:
@@ -235,59 +262,96 @@ class SK1Application(wal.Application, UCApplication):
         doc_file = doc_file or \
                    dialogs.get_open_file_name(self.mw, config.open_dir)
         if doc_file and fsutils.isfile(doc_file):
+            background = config.background_io
             try:
-                doc = SK1Presenter(self, doc_file, silent)
-
-            except RuntimeError:
-                msg = _('Cannot open file:')
-                msg = "%s\n'%s'" % (msg, doc_file) + '\n'
-                msg += _('The file contains newer SK2 format.\n')
-                msg += _('Try updating sK1 application from '
-                         'https://sk1project.net')
-                dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
-                LOG.error('Cannot open file <%s>: newer SK2 format.', doc_file)
-                return
-            except Exception as e:
-                msg = _('Cannot open file:')
-                msg = "%s\n'%s'" % (msg, doc_file) + '\n'
-                msg += _('The file may be corrupted or not supported format')
-                msg += '\n'
-                msg += _('Details see in application logs.')
-                dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
-                LOG.error('Cannot open file <%s> %s', doc_file, e, exc_info=True)
+                doc = SK1Presenter(self, doc_file, silent,
+                                   background=background)
+            except Exception:
+                self._open_error(doc_file, sys.exc_info())
                 return
             self.docs.append(doc)
+            self.set_current_doc(doc)
+            if background:
+                doc.load(doc_file, self._on_doc_loaded)
+                events.emit(events.APP_STATUS, _('Opening document...'))
+                return
             config.open_dir = str(os.path.dirname(doc_file))
             self.history.add_entry(doc_file)
-            self.set_current_doc(doc)
             events.emit(events.APP_STATUS, _('Document opened'))
 
-    def save(self, doc=None):
+    def _on_doc_loaded(self, doc, job):
+        doc_file = job.args[0]
+        if job.error is not None:
+            self.close(doc)
+            self._open_error(doc_file, job.error)
+            return
+        config.open_dir = str(os.path.dirname(doc_file))
+        self.history.add_entry(doc_file)
+        if doc == self.current_doc:
+            self.set_current_doc(doc)
+        events.emit(events.APP_STATUS, _('Document opened'))
+
+    def _open_error(self, doc_file, exc_info):
+        msg = _('Cannot open file:')
+        msg = "%s\n'%s'" % (msg, doc_file) + '\n'
+        if isinstance(exc_info[1], RuntimeError):
+            msg += _('The file contains newer SK2 format.\n')
+            msg += _('Try updating sK1 application from '
+                     'https://sk1project.net')
+            dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
+            LOG.error('Cannot open file <%s>: newer SK2 format.', doc_file)
+            return
+        msg += _('The file may be corrupted or not supported format')
+        msg += '\n'
+        msg += _('Details see in application logs.')
+        dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
+        LOG.error('Cannot open file <%s> %s', doc_file, exc_info[1],
+                  exc_info=exc_info)
+
+    def save(self, doc=None, background=False):
+        """
+        Saves document. Background saving returns just after saver
+        is started, errors are reported when it is finished.
+        """
         doc = doc or self.current_doc
+        doc.wait_job()
         if not doc.doc_file:
-            return self.save_as()
+            return self.save_as(background)
         ext = os.path.splitext(self.current_doc.doc_file)[1]
         if not ext == "." + uc2const.FORMAT_EXTENSION[uc2const.SK2][0]:
-            return self.save_as()
+            return self.save_as(background)
         if not fsutils.exists(os.path.dirname(self.current_doc.doc_file)):
-            return self.save_as()
+            return self.save_as(background)
 
+        doc_file = self.current_doc.doc_file
         try:
-            self.make_backup(self.current_doc.doc_file)
+            self.make_backup(doc_file)
+            if background and config.background_io:
+                doc.save(lambda job: self._on_doc_saved(doc, doc_file, job))
+                return True
             doc.save()
-            self.history.add_entry(self.current_doc.doc_file, appconst.SAVED)
-            events.emit(events.DOC_SAVED, doc)
-        except Exception as e:
-            msg = _('Cannot save file:')
-            msg = "%s\n'%s'" % (msg, self.current_doc.doc_file) + '\n'
-            msg += _('Please check file write permissions')
-            dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
-            LOG.error('Cannot save file <%s> %s', self.current_doc.doc_file, e)
+        except Exception:
+            self._save_error(doc_file, sys.exc_info())
             return False
-        events.emit(events.APP_STATUS, _('Document saved'))
+        self._on_doc_saved(doc, doc_file)
         return True
 
-    def save_as(self):
+    def _on_doc_saved(self, doc, doc_file, job=None):
+        if job is not None and job.error is not None:
+            self._save_error(doc_file, job.error)
+            return
+        self.history.add_entry(doc_file, appconst.SAVED)
+        events.emit(events.DOC_SAVED, doc)
+        events.emit(events.APP_STATUS, _('Document saved'))
+
+    def _save_error(self, doc_file, exc_info):
+        msg = _('Cannot save file:')
+        msg = "%s\n'%s'" % (msg, doc_file) + '\n'
+        msg += _('Please check file write permissions')
+        dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
+        LOG.error('Cannot save file <%s> %s', doc_file, exc_info[1])
+
+    def save_as(self, background=False):
         doc_file = self.current_doc.doc_file
         doc_file = doc_file or self.current_doc.doc_name
         if os.path.splitext(doc_file)[1] != "." + \
@@ -299,28 +363,42 @@ class SK1Application(wal.Application, UCApplication):
                                     os.path.basename(doc_file))
         doc_file = dialogs.get_save_file_name(self.mw, doc_file, path_only=True)
         if doc_file:
-            old_file = self.current_doc.doc_file
-            old_name = self.current_doc.doc_name
-            self.current_doc.set_doc_file(doc_file)
+            doc = self.current_doc
+            old_file = doc.doc_file
+            old_name = doc.doc_name
+            doc.set_doc_file(doc_file)
+
+            def on_done(job=None):
+                if job is not None and job.error is not None:
+                    if doc.doc_file == doc_file:
+                        doc.set_doc_file(old_file, old_name)
+                    self._save_as_error(doc, doc_file, job.error)
+                    return
+                config.save_dir = str(os.path.dirname(doc_file))
+                self._on_doc_saved(doc, doc_file)
+
             try:
                 self.make_backup(doc_file)
-                self.current_doc.save()
-            except Exception as e:
-                self.current_doc.set_doc_file(old_file, old_name)
-                first = _('Cannot save document:')
-                msg = "%s\n'%s'." % (first, self.current_doc.doc_name) + '\n'
-                msg += _('Please check file name and write permissions')
-                dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
-                LOG.error('Cannot save file <%s> %s', doc_file, e)
+                if background and config.background_io:
+                    doc.save(on_done)
+                    return True
+                doc.save()
+            except Exception:
+                doc.set_doc_file(old_file, old_name)
+                self._save_as_error(doc, doc_file, sys.exc_info())
                 return False
-            config.save_dir = str(os.path.dirname(doc_file))
-            self.history.add_entry(doc_file, appconst.SAVED)
-            events.emit(events.DOC_SAVED, self.current_doc)
-            events.emit(events.APP_STATUS, _('Document saved'))
+            on_done()
             return True
         else:
             return False
 
+    def _save_as_error(self, doc, doc_file, exc_info):
+        first = _('Cannot save document:')
+        msg = "%s\n'%s'." % (first, doc.doc_name) + '\n'
+        msg += _('Please check file name and write permissions')
+        dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
+        LOG.error('Cannot save file <%s> %s', doc_file, exc_info[1])
+
     def save_selected(self):
         doc_file = self.current_doc.doc_file
         doc_file = doc_file or self.current_doc.doc_name
@@ -335,17 +413,30 @@ class SK1Application(wal.Application, UCApplication):
         doc_file = dialogs.get_save_file_name(self.mw, doc_file, msg,
                                               path_only=True)
         if doc_file:
+            def on_done(job=None):
+                if job is not None and job.error is not None:
+                    self._save_selected_error(doc_file, job.error)
+                else:
+                    self.history.add_entry(doc_file, appconst.SAVED)
+
             try:
                 self.make_backup(doc_file)
+                if config.background_io:
+                    self.current_doc.save_selected(doc_file, on_done)
+                    return
                 self.current_doc.save_selected(doc_file)
-                self.history.add_entry(doc_file, appconst.SAVED)
-            except Exception as e:
-                first = _('Cannot save document:')
-                msg = "%s\n'%s'." % (first, doc_file) + '\n'
-                msg += _('Please check requested file format '
-                         'and write permissions')
-                dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
-                LOG.error('Cannot save file <%s> %s', doc_file, e)
+            except Exception:
+                self._save_selected_error(doc_file, sys.exc_info())
+                return
+            on_done()
+
+    def _save_selected_error(self, doc_file, exc_info):
+        first = _('Cannot save document:')
+        msg = "%s\n'%s'." % (first, doc_file) + '\n'
+        msg += _('Please check requested file format '
+                 'and write permissions')
+        dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
+        LOG.error('Cannot save file <%s> %s', doc_file, exc_info[1])
 
     def save_all(self):
         for doc in self.docs:
@@ -411,8 +502,14 @@ class SK1Application(wal.Application, UCApplication):
             doc_file = dialogs.get_open_file_name(self.mw,
                                                   config.import_dir, msg)
         if doc_file and fsutils.isfile(doc_file):
-            try:
-                ret = self.current_doc.import_file(doc_file)
+            doc = self.current_doc
+
+            def on_done(ret, job=None):
+                if job is not None and job.error is not None:
+                    self._import_error(doc_file, job.error)
+                    return
+                if doc not in self.docs:
+                    return
                 if not ret:
                     msg = _('Cannot import graphics from file:')
                     msg = "%s\n'%s'" % (msg, doc_file) + '\n'
@@ -420,23 +517,32 @@ class SK1Application(wal.Application, UCApplication):
                              'contains unsupported objects.')
                     dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
                     LOG.warn('Cannot import graphics from file <%s>', doc_file)
-                elif point and self.current_doc.selection.bbox:
-                    x0, y0 = self.current_doc.canvas.win_to_doc(point)
-                    x1 = self.current_doc.selection.bbox[0]
-                    y1 = self.current_doc.selection.bbox[-1]
+                elif point and doc.selection.bbox:
+                    x0, y0 = doc.canvas.win_to_doc(point)
+                    x1 = doc.selection.bbox[0]
+                    y1 = doc.selection.bbox[-1]
                     dx = x0 - x1
                     dy = y0 - y1
-                    self.current_doc.api.move_selected(dx, dy)
+                    doc.api.move_selected(dx, dy)
 
                 config.import_dir = str(os.path.dirname(doc_file))
-            except Exception as e:
-                msg = _('Cannot import file:')
-                msg = "%s\n'%s'" % (msg, doc_file) + '\n'
-                msg += _('The file may be corrupted or not supported format')
-                msg += '\n'
-                msg += _('Details see in application logs.')
-                dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
-                LOG.warn('Cannot import file <%s>', doc_file, e)
+
+            try:
+                if config.background_io:
+                    doc.import_file(doc_file, on_done)
+                    return
+                on_done(doc.import_file(doc_file))
+            except Exception:
+                self._import_error(doc_file, sys.exc_info())
+
+    def _import_error(self, doc_file, exc_info):
+        msg = _('Cannot import file:')
+        msg = "%s\n'%s'" % (msg, doc_file) + '\n'
+        msg += _('The file may be corrupted or not supported format')
+        msg += '\n'
+        msg += _('Details see in application logs.')
+        dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
+        LOG.warn('Cannot import file <%s> %s', doc_file, exc_info[1])
 
     def export_as(self):
         doc_file = self.current_doc.doc_file
@@ -449,19 +555,33 @@ class SK1Application(wal.Application, UCApplication):
                                               _('Export document As...'),
                                               file_types=ftype, path_only=True)
         if doc_file:
+            doc = self.current_doc
+
+            def on_done(job=None):
+                if job is not None and job.error is not None:
+                    self._export_error(doc, doc_file, job.error)
+                    return
+                config.export_dir = str(os.path.dirname(doc_file))
+                msg = _('Document is successfully exported')
+                events.emit(events.APP_STATUS, msg)
+
             try:
                 self.make_backup(doc_file, True)
-                self.current_doc.export_as(doc_file)
-            except Exception as e:
-                first = _('Cannot save document:')
-                msg = "%s\n'%s'." % (first, self.current_doc.doc_name) + '\n'
-                msg += _('Please check file name and write permissions')
-                dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
-                LOG.warn('Cannot save file <%s>', doc_file, e)
+                if config.background_io:
+                    doc.export_as(doc_file, on_done)
+                    return
+                doc.export_as(doc_file)
+            except Exception:
+                self._export_error(doc, doc_file, sys.exc_info())
                 return
-            config.export_dir = str(os.path.dirname(doc_file))
-            msg = _('Document is successfully exported')
-            events.emit(events.APP_STATUS, msg)
+            on_done()
+
+    def _export_error(self, doc, doc_file, exc_info):
+        first = _('Cannot save document:')
+        msg = "%s\n'%s'." % (first, doc.doc_name) + '\n'
+        msg += _('Please check file name and write permissions')
+        dialogs.error_dialog(self.mw, self.appdata.app_name, msg)
+        LOG.warn('Cannot save file <%s> %s', doc_file, exc_info[1])
 
     def extract_bitmap(self):
         doc_file = 'image'
@@ -15,10 +15,72 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import copy
+
 from sk1 import events
 
+CACHE_PREFIX = 'cache_'
+
+
+def copy_helpers(obj):
+    """
+    Replaces helper objects owned by object (pixmap handler
+    and similar ones) by their copies.
+    """
+    for key, value in obj.__dict__.items():
+        if key in ('parent', 'childs', 'config'):
+            continue
+        if hasattr(value, 'copy') and hasattr(value, 'parent'):
+            helper = value.copy()
+            if helper.parent is not None:
+                helper.parent = obj
+            obj.__dict__[key] = helper
+
+
+def freeze_object(obj):
+    """
+    Returns detached shallow copy of model object. Model state is
+    replaced on change (undo relies on the same contract), so frozen
+    object keeps state of copying moment sharing data with source.
+    Helper objects are copied as they can be changed in place.
+    Render caches are dropped, they are rebuilt after pasting.
+    """
+    frozen = copy.copy(obj)
+    for key in frozen.__dict__.keys():
+        if key.startswith(CACHE_PREFIX):
+            del frozen.__dict__[key]
+    copy_helpers(frozen)
+    frozen.parent = None
+    if obj.childs:
+        frozen.childs = [freeze_object(child) for child in obj.childs]
+    return frozen
+
+
+def materialize_object(frozen, parent=None):
+    """
+    Creates pasteable object from frozen one. Containers and
+    helper objects are recreated, bulk data (paths, bitmaps)
+    is shared between all pasted copies.
+    """
+    obj = copy.copy(frozen)
+    for key, value in obj.__dict__.items():
+        if key in ('parent', 'childs', 'config'):
+            continue
+        if isinstance(value, list):
+            obj.__dict__[key] = list(value)
+        elif isinstance(value, dict):
+            obj.__dict__[key] = value.copy()
+    copy_helpers(obj)
+    obj.parent = parent
+    obj.childs = [materialize_object(child, obj) for child in frozen.childs]
+    return obj
+
 
 class AppClipboard:
+    """
+    Copy-on-write clipboard. Copying freezes object references
+    only, objects are materialized on pasting.
+    """
     contents = None
 
     def __init__(self, app):
@@ -26,8 +88,8 @@ class AppClipboard:
         self.contents = []
 
     def set(self, objs):
-        self.contents = [obj.copy() for obj in objs]
+        self.contents = [freeze_object(obj) for obj in objs]
         events.emit(events.CLIPBOARD)
 
     def get(self):
-        return [obj.copy() for obj in self.contents]
+        return [materialize_object(obj) for obj in self.contents]
@@ -21,6 +21,7 @@ from progressdlg import ProgressDialog
 from aboutdlg import about_dialog
 from pagedlg import goto_page_dlg, delete_page_dlg, insert_page_dlg
 from filelogviewer import filelog_viewer_dlg
+from templatedlg import template_chooser_dlg
 from paletteinfo import palette_info_dlg
 from palcoldlg import palette_collection_dlg
 from filldlg import fill_dlg
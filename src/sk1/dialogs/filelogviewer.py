@@ -18,6 +18,7 @@
 import wal
 
 from sk1 import _, config, appconst
+from sk1.pwidgets import ThumbnailViewer
 from uc2.utils import fsutils
 
 
@@ -29,6 +30,7 @@ class LogViewerDialog(wal.OkCancelDialog):
     cancel_btn = None
     clear_btn = None
     lc = None
+    preview = None
     data = []
     ret = ''
 
@@ -45,9 +47,14 @@ class LogViewerDialog(wal.OkCancelDialog):
 
     def build(self):
         self.panel.pack(wal.PLine(self.panel), fill=True)
-        self.lc = wal.ReportList(self.panel, on_select=self.update_dlg,
+        hpanel = wal.HPanel(self.panel)
+        self.lc = wal.ReportList(hpanel, on_select=self.update_dlg,
                                  on_activate=self.on_ok, border=False)
-        self.panel.pack(self.lc, expand=True, fill=True)
+        hpanel.pack(self.lc, expand=True, fill=True)
+        hpanel.pack(wal.VLine(hpanel), fill=True)
+        self.preview = ThumbnailViewer(hpanel, self.app)
+        hpanel.pack(self.preview)
+        self.panel.pack(hpanel, expand=True, fill=True)
         self.panel.pack(wal.PLine(self.panel), fill=True)
 
     def set_dialog_buttons(self):
@@ -59,8 +66,10 @@ class LogViewerDialog(wal.OkCancelDialog):
     def update_dlg(self, value):
         if value:
             self.ok_btn.set_enable(True)
+            self.preview.set_path(self.lc.get_selected()[2])
         else:
             self.ok_btn.set_enable(False)
+            self.preview.set_path()
         if self.data:
             self.clear_btn.set_enable(True)
         else:
@@ -103,6 +112,7 @@ class LogViewerDialog(wal.OkCancelDialog):
         ret = None
         if self.show_modal() == wal.BUTTON_OK:
             ret = self.get_result()
+        self.preview.stop()
         if wal.is_unity_16_04():
             w, h = self.get_size()
             h -= 28
@@ -15,15 +15,39 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import threading
 
 import wal
+from sk1 import _
+from sk1.app_io import IOJob
 from uc2 import events
 
 
 class ProgressDialog(wal.CustomProgressDialog):
-    def __init__(self, title, parent):
+    """
+    Modal progress of long operation. If cancel_callback is provided,
+    dialog gets Cancel button which calls it. Button is processed
+    while dialog is updated, so operation should check cancellation
+    between progress reports.
+    """
+    cancel_callback = None
+    stop_btn = None
+
+    def __init__(self, title, parent, cancel_callback=None):
+        self.cancel_callback = cancel_callback
         wal.CustomProgressDialog.__init__(self, parent, title)
 
+    def build(self):
+        wal.CustomProgressDialog.build(self)
+        if self.cancel_callback is not None:
+            self.stop_btn = wal.Button(self.panel, _('Cancel'),
+                                       onclick=self.cancel)
+            self.panel.pack(self.stop_btn, padding_all=5)
+
+    def cancel(self):
+        self.stop_btn.set_enable(False)
+        self.cancel_callback()
+
     def run(self, callback, args):
         events.connect(events.FILTER_INFO, self.listener)
         result = wal.CustomProgressDialog.run(self, callback, args)
@@ -31,4 +55,7 @@ class ProgressDialog(wal.CustomProgressDialog):
         return result
 
     def listener(self, *args):
+        # skip messages of background I/O jobs
+        if isinstance(threading.current_thread(), IOJob):
+            return
         self.update_data(int(round(args[1] * 100.0)), args[0])
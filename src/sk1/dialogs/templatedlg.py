@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+
+import wal
+
+from sk1 import _, config
+from sk1.dialogs.filedlgs import get_open_file_name
+from sk1.pwidgets import ThumbnailViewer
+from uc2 import uc2const
+from uc2.utils import fsutils
+
+
+def get_template_files(dir_path):
+    extensions = []
+    for item in uc2const.LOADER_FORMATS:
+        extensions += ['.' + ext for ext in uc2const.FORMAT_EXTENSION[item]]
+    try:
+        names = os.listdir(dir_path)
+    except OSError:
+        return []
+    ret = []
+    for name in sorted(names):
+        path = os.path.join(dir_path, name)
+        ext = os.path.splitext(name)[1].lower()
+        if ext in extensions and fsutils.isfile(path):
+            ret.append([name, path])
+    return ret
+
+
+class TemplateChooserDialog(wal.OkCancelDialog):
+    sizer = None
+    box = None
+    button_box = None
+    ok_btn = None
+    cancel_btn = None
+    browse_btn = None
+    lc = None
+    preview = None
+    ret = ''
+
+    def __init__(self, parent, title):
+        self.app = parent.app
+        size = config.template_dlg_size
+        wal.OkCancelDialog.__init__(self, parent, title, size, resizable=True,
+                                    action_button=wal.BUTTON_OPEN, margin=0,
+                                    add_line=False,
+                                    button_box_padding=5)
+        self.set_minsize(config.template_dlg_minsize)
+        self.ok_btn.set_enable(False)
+        self.update_list()
+
+    def build(self):
+        self.panel.pack(wal.PLine(self.panel), fill=True)
+        hpanel = wal.HPanel(self.panel)
+        self.lc = wal.ReportList(hpanel, on_select=self.update_dlg,
+                                 on_activate=self.on_ok, border=False)
+        hpanel.pack(self.lc, expand=True, fill=True)
+        hpanel.pack(wal.VLine(hpanel), fill=True)
+        self.preview = ThumbnailViewer(hpanel, self.app)
+        hpanel.pack(self.preview)
+        self.panel.pack(hpanel, expand=True, fill=True)
+        self.panel.pack(wal.PLine(self.panel), fill=True)
+
+    def set_dialog_buttons(self):
+        wal.OkCancelDialog.set_dialog_buttons(self)
+        self.browse_btn = wal.Button(self.left_button_box, _('Browse...'),
+                                     onclick=self.browse)
+        self.left_button_box.pack(self.browse_btn)
+
+    def update_dlg(self, value):
+        if value:
+            self.ok_btn.set_enable(True)
+            self.preview.set_path(self.lc.get_selected()[1])
+        else:
+            self.ok_btn.set_enable(False)
+            self.preview.set_path()
+
+    def update_list(self):
+        header = [_('File name'), _('Path')]
+        dir_path = fsutils.expanduser(config.template_dir)
+        self.lc.update([header] + get_template_files(dir_path))
+        self.lc.set_column_width(0, wal.LIST_AUTOSIZE)
+        self.lc.set_column_width(1, wal.LIST_AUTOSIZE)
+        self.update_dlg(False)
+
+    def browse(self):
+        path = get_open_file_name(self, config.template_dir,
+                                  _('Select Template'))
+        if fsutils.isfile(path):
+            self.ret = path
+            self.end_modal(wal.BUTTON_OK)
+
+    def on_ok(self, *args):
+        self.ret = self.lc.get_selected()[1]
+        self.end_modal(wal.BUTTON_OK)
+
+    def get_result(self):
+        return self.ret
+
+    def show(self):
+        ret = None
+        if self.show_modal() == wal.BUTTON_OK:
+            ret = self.get_result()
+        self.preview.stop()
+        if wal.is_unity_16_04():
+            w, h = self.get_size()
+            h -= 28
+            if h < config.template_dlg_minsize[1]:
+                h = config.template_dlg_minsize[1]
+            config.template_dlg_size = (w, h)
+        else:
+            config.template_dlg_size = self.get_size()
+        self.destroy()
+        return ret
+
+
+def template_chooser_dlg(parent):
+    dlg = TemplateChooserDialog(parent, _('Select Template'))
+    return dlg.show()
@@ -16,6 +16,7 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import math
+import sys
 from copy import deepcopy
 
 from uc2 import libgeom, uc2const, libimg, sk2const
@@ -23,6 +24,66 @@ from uc2.formats.sk2 import sk2_model
 
 from sk1 import events, config, modes
 
+PRIMITIVE_TYPES = (int, long, float, bool, str, unicode, type(None))
+
+
+MODEL_SKIPPED_FIELDS = ('parent', 'config')
+
+
+def get_data_size(data, memo=None):
+    """
+    Estimates memory footprint of undo journal data in bytes.
+    Model objects are walked through their fields (paths, bitmap
+    strings, style lists, childs), except references to parent and
+    config, and render caches which are rebuilt on demand. Memo keeps
+    ids of counted items, so data shared between actions is counted
+    once. Callables and helper objects are not counted.
+    """
+    memo = set() if memo is None else memo
+    if id(data) in memo:
+        return 0
+    if isinstance(data, PRIMITIVE_TYPES):
+        memo.add(id(data))
+        return sys.getsizeof(data)
+    if isinstance(data, (list, tuple)):
+        memo.add(id(data))
+        size = sys.getsizeof(data)
+        for item in data:
+            size += get_data_size(item, memo)
+        return size
+    if isinstance(data, dict):
+        memo.add(id(data))
+        size = sys.getsizeof(data)
+        for key, value in data.items():
+            size += get_data_size(key, memo) + get_data_size(value, memo)
+        return size
+    if isinstance(data, sk2_model.DocumentObject):
+        memo.add(id(data))
+        size = sys.getsizeof(data) + sys.getsizeof(data.__dict__)
+        for key, value in data.__dict__.items():
+            if key in MODEL_SKIPPED_FIELDS or key.startswith('cache_'):
+                continue
+            size += get_data_size(value, memo)
+        return size
+    return 0
+
+
+def get_splice(before, after, equal=None):
+    """
+    Returns common prefix length and common suffix length
+    of two sequences.
+    """
+    equal = equal or (lambda a, b: a is b)
+    start = 0
+    size = min(len(before), len(after))
+    while start < size and equal(before[start], after[start]):
+        start += 1
+    suffix = 0
+    while suffix < size - start and \
+            equal(before[-suffix - 1], after[-suffix - 1]):
+        suffix += 1
+    return start, suffix
+
 
 class AbstractAPI:
     presenter = None
@@ -41,27 +102,115 @@ class AbstractAPI:
     def __init__(self):
         pass
 
+    def get_journal_size(self):
+        """
+        Returns estimated memory size (in bytes) of undo/redo journal.
+        """
+        return sum([item[3] for item in self.undo + self.redo])
+
+    def _get_transaction_size(self, transaction):
+        data = []
+        for action_list in transaction[:2]:
+            for action in action_list:
+                if action:
+                    data.append(action[1:])
+        # one walk, so data shared by undo and redo is counted once
+        return get_data_size(data)
+
+    def _check_journal_budget(self):
+        limit = config.undo_memory_limit * 1024 * 1024
+        if not limit:
+            return
+        size = self.get_journal_size()
+        while len(self.undo) > 1 and size > limit:
+            tr = self.undo.pop(0)
+            size -= tr[3]
+            # saved state cannot be reached by undo anymore
+            self.undo_marked = True
+
+    def _compact_transaction(self, transaction):
+        """
+        Replaces paired layer snapshots and paths of transaction
+        by structural diffs (splices).
+        """
+        undo_list, redo_list = transaction[:2]
+        for undo_action in undo_list:
+            if not undo_action:
+                continue
+            for redo_action in redo_list:
+                if not redo_action or not undo_action[0] == redo_action[0]:
+                    continue
+                if undo_action[0] == self._set_layers_snapshot:
+                    deltas = self._get_layers_delta(undo_action[1],
+                                                    redo_action[1])
+                    if deltas is not None:
+                        undo_action[:] = [self._splice_layers, deltas[0]]
+                        redo_action[:] = [self._splice_layers, deltas[1]]
+                    break
+                elif undo_action[0] == self._set_paths and \
+                        undo_action[1] is redo_action[1]:
+                    obj = undo_action[1]
+                    old_paths, new_paths = undo_action[2], redo_action[2]
+                    start, suffix = get_splice(old_paths, new_paths,
+                                               lambda a, b: a == b)
+                    undo_action[:] = [self._splice_paths, obj, start, suffix,
+                                      old_paths[start:len(old_paths) - suffix]]
+                    redo_action[:] = [self._splice_paths, obj, start, suffix,
+                                      new_paths[start:len(new_paths) - suffix]]
+                    break
+
+    def _get_layers_delta(self, before, after):
+        before_layers = [item[0] for item in before]
+        after_layers = [item[0] for item in after]
+        if not before_layers == after_layers:
+            return None
+        undo_delta = []
+        redo_delta = []
+        for (layer, old_childs), (_layer, new_childs) in zip(before, after):
+            start, suffix = get_splice(old_childs, new_childs)
+            if start == len(old_childs) == len(new_childs):
+                continue
+            undo_delta.append(
+                (layer, start, suffix,
+                 old_childs[start:len(old_childs) - suffix]))
+            redo_delta.append(
+                (layer, start, suffix,
+                 new_childs[start:len(new_childs) - suffix]))
+        return undo_delta, redo_delta
+
+    def _splice_layers(self, delta):
+        for layer, start, suffix, childs in delta:
+            end = len(layer.childs) - suffix
+            layer.childs = layer.childs[:start] + childs + layer.childs[end:]
+        self._set_structure_modified()
+
+    def _splice_paths(self, obj, start, suffix, paths):
+        end = len(obj.paths) - suffix
+        self._set_paths(obj, obj.paths[:start] + paths + obj.paths[end:])
+
     def do_undo(self):
-        transaction_list = self.undo[-1][0]
-        for transaction in transaction_list:
-            self._do_action(transaction)
-        tr = self.undo[-1]
-        self.undo.remove(tr)
-        self.redo.append(tr)
-        self.eventloop.emit(self.eventloop.DOC_MODIFIED)
+        with events.batch():
+            transaction_list = self.undo[-1][0]
+            for transaction in transaction_list:
+                self._do_action(transaction)
+            tr = self.undo[-1]
+            self.undo.remove(tr)
+            self.redo.append(tr)
+            self.eventloop.emit(self.eventloop.DOC_MODIFIED)
         if self.undo and self.undo[-1][2]:
             self.presenter.reflect_saving()
         if not self.undo and not self.undo_marked:
             self.presenter.reflect_saving()
 
     def do_redo(self):
-        action_list = self.redo[-1][1]
-        for action in action_list:
-            self._do_action(action)
-        tr = self.redo[-1]
-        self.redo.remove(tr)
-        self.undo.append(tr)
-        self.eventloop.emit(self.eventloop.DOC_MODIFIED)
+        with events.batch():
+            action_list = self.redo[-1][1]
+            for action in action_list:
+                self._do_action(action)
+            tr = self.redo[-1]
+            self.redo.remove(tr)
+            self.undo.append(tr)
+            self.eventloop.emit(self.eventloop.DOC_MODIFIED)
         if not self.undo or self.undo[-1][2]:
             self.presenter.reflect_saving()
 
@@ -81,7 +230,10 @@ class AbstractAPI:
 
     def add_undo(self, transaction):
         self.redo = self._clear_history_stack(self.redo)
+        self._compact_transaction(transaction)
+        transaction.append(self._get_transaction_size(transaction))
         self.undo.append(transaction)
+        self._check_journal_budget()
         self.eventloop.emit(self.eventloop.DOC_MODIFIED)
 
     def save_mark(self):
@@ -141,13 +293,21 @@ class AbstractAPI:
     def _selection_update(self):
         self.selection.update()
 
+    def _set_objs_modified(self, objs):
+        self.selection.index.set_modified(objs)
+
+    def _set_structure_modified(self):
+        self.selection.index.set_structure_modified()
+
     def _delete_object(self, obj):
         self.methods.delete_object(obj)
-        if obj in self.selection.objs:
+        self._set_structure_modified()
+        if self.selection.is_selected(obj):
             self.selection.remove([obj])
 
     def _insert_object(self, obj, parent, index):
         self.methods.insert_object(obj, parent, index)
+        self._set_structure_modified()
 
     def _get_pages_snapshot(self):
         return [] + self.presenter.get_pages()
@@ -171,6 +331,7 @@ class AbstractAPI:
     def _set_layers_snapshot(self, layers_snapshot):
         for layer, childs in layers_snapshot:
             layer.childs = childs
+        self._set_structure_modified()
 
     def _set_active_layer(self, layer):
         self.presenter.active_layer = layer
@@ -179,12 +340,14 @@ class AbstractAPI:
         for item in objs_list:
             obj = item[0]
             self.methods.delete_object(obj)
-            if obj in self.selection.objs:
+            if self.selection.is_selected(obj):
                 self.selection.remove([obj])
+        self._set_structure_modified()
 
     def _insert_objects(self, objs_list):
         for obj, parent, index in objs_list:
             self.methods.insert_object(obj, parent, index)
+        self._set_structure_modified()
 
     def _normalize_rect(self, rect):
         x0, y0, x1, y1 = rect
@@ -209,22 +372,29 @@ class AbstractAPI:
     def _set_obj_style(self, obj, style):
         obj.style = style
         obj.update()
+        self._set_objs_modified([obj, ])
 
     def _get_objs_styles(self, objs):
+        # equal styles are stored once and copied on restoring
         result = []
+        shared = {}
         for obj in objs:
-            style = deepcopy(obj.style)
-            fill_trafo = deepcopy(obj.fill_trafo)
-            stroke_trafo = deepcopy(obj.stroke_trafo)
-            result.append([obj, style, fill_trafo, stroke_trafo])
+            items = []
+            for item in (obj.style, obj.fill_trafo, obj.stroke_trafo):
+                key = repr(item)
+                if key not in shared:
+                    shared[key] = deepcopy(item)
+                items.append(shared[key])
+            result.append([obj] + items)
         return result
 
     def _set_objs_styles(self, objs_styles):
         for obj, style, fill_trafo, stroke_trafo in objs_styles:
-            obj.style = style
-            obj.fill_trafo = fill_trafo
-            obj.stroke_trafo = stroke_trafo
+            obj.style = deepcopy(style)
+            obj.fill_trafo = deepcopy(fill_trafo)
+            obj.stroke_trafo = deepcopy(stroke_trafo)
             obj.clear_color_cache()
+        self._set_objs_modified([item[0] for item in objs_styles])
 
     def _fill_objs(self, objs, color):
         for obj in objs:
@@ -250,6 +420,7 @@ class AbstractAPI:
                     style[0] = []
             obj.style = style
             obj.fill_trafo = []
+        self._set_objs_modified(objs)
 
     def _set_objs_fill_style(self, objs, fill_style):
         for obj in objs:
@@ -258,23 +429,28 @@ class AbstractAPI:
                 style[0] = deepcopy(fill_style)
                 obj.style = style
                 obj.clear_color_cache()
+        self._set_objs_modified(objs)
 
     def _set_paths_and_trafo(self, obj, paths, trafo):
         obj.paths = paths
         obj.trafo = trafo
         obj.update()
+        self._set_objs_modified([obj, ])
 
     def _set_paths(self, obj, paths):
         obj.paths = paths
         obj.update()
+        self._set_objs_modified([obj, ])
 
     def _set_text_trafos(self, obj, trafos):
         obj.trafos = trafos
         obj.update()
+        self._set_objs_modified([obj, ])
 
     def _set_text_markup(self, obj, markup):
         obj.markup = markup
         obj.update()
+        self._set_objs_modified([obj, ])
 
     def _apply_trafo(self, objs, trafo):
         before = []
@@ -283,6 +459,7 @@ class AbstractAPI:
             before.append(obj.get_trafo_snapshot())
             obj.apply_trafo(trafo)
             after.append(obj.get_trafo_snapshot())
+        self._set_objs_modified([item[0] for item in before])
         self.selection.update_bbox()
         return before, after
 
@@ -293,12 +470,14 @@ class AbstractAPI:
             before.append(obj.get_trafo_snapshot())
             obj.apply_trafo(trafo)
             after.append(obj.get_trafo_snapshot())
+        self._set_objs_modified([item[0] for item in before])
         self.selection.update_bbox()
         return before, after
 
     def _set_bitmap_trafo(self, obj, trafo):
         obj.trafo = trafo
         obj.update()
+        self._set_objs_modified([obj, ])
 
     def _clear_trafo(self, objs):
         normal_trafo = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
@@ -314,6 +493,7 @@ class AbstractAPI:
             obj.stroke_trafo = []
             obj.update()
             after.append(obj.get_trafo_snapshot())
+        self._set_objs_modified([item[0] for item in before])
         self.selection.update_bbox()
         return before, after
 
@@ -327,6 +507,7 @@ class AbstractAPI:
             obj.trafo = [] + normal_trafo
             obj.update()
             after.append((obj, obj.paths, obj.trafo))
+        self._set_objs_modified(objs)
         self.selection.update_bbox()
         return before, after
 
@@ -334,6 +515,7 @@ class AbstractAPI:
         for snapshot in snapshots:
             obj = snapshot[0]
             obj.set_trafo_snapshot(snapshot)
+        self._set_objs_modified([item[0] for item in snapshots])
         self.selection.update_bbox()
 
     def _set_paths_trafo_snapshots(self, snapshots):
@@ -364,6 +546,7 @@ class AbstractAPI:
                     obj.stroke_trafo = []
             obj.style = style
             obj.update_stroke()
+        self._set_objs_modified(objs)
 
     def _set_objs_stroke_style(self, objs, stroke_style):
         for obj in objs:
@@ -372,6 +555,7 @@ class AbstractAPI:
                 style[1] = deepcopy(stroke_style)
                 obj.style = style
                 obj.update_stroke()
+        self._set_objs_modified(objs)
 
     def _set_parent(self, objs, parent):
         for obj in objs:
@@ -404,6 +588,7 @@ class AbstractAPI:
         text_obj.trafos = trafos
         text_obj.markup = markup
         text_obj.update()
+        self._set_objs_modified([text_obj, ])
 
     def _set_tpgroup_data(self, tpgroup, text_obj, data):
         index = tpgroup.childs.index(text_obj)
@@ -411,6 +596,7 @@ class AbstractAPI:
         path = tpgroup.childs[0]
         tpgroup.set_text_on_path(path, text_obj, data)
         tpgroup.do_update()
+        self._set_objs_modified([tpgroup, ])
 
 
 class PresenterAPI(AbstractAPI):
@@ -954,21 +1140,23 @@ class PresenterAPI(AbstractAPI):
         self.selection.update()
 
     def delete_selected(self):
-        if self.selection.objs:
-            before = self._get_layers_snapshot()
-            sel_before = [] + self.selection.objs
-            for obj in self.selection.objs:
-                self.methods.delete_object(obj)
-            after = self._get_layers_snapshot()
-            sel_after = []
-            transaction = [
-                [[self._set_layers_snapshot, before],
-                 [self._set_selection, sel_before]],
-                [[self._set_layers_snapshot, after],
-                 [self._set_selection, sel_after]],
-                False]
-            self.add_undo(transaction)
-        self.selection.clear()
+        with events.batch():
+            if self.selection.objs:
+                before = self._get_layers_snapshot()
+                sel_before = [] + self.selection.objs
+                for obj in self.selection.objs:
+                    self.methods.delete_object(obj)
+                self._set_structure_modified()
+                after = self._get_layers_snapshot()
+                sel_after = []
+                transaction = [
+                    [[self._set_layers_snapshot, before],
+                     [self._set_selection, sel_before]],
+                    [[self._set_layers_snapshot, after],
+                     [self._set_selection, sel_after]],
+                    False]
+                self.add_undo(transaction)
+            self.selection.clear()
 
     def cut_selected(self):
         self.copy_selected()
@@ -979,24 +1167,26 @@ class PresenterAPI(AbstractAPI):
             self.app.clipboard.set(self.selection.objs)
 
     def paste_selected(self, objs=None):
-        if objs is None:
-            objs = self.app.clipboard.get()
-        sel_before = [] + self.selection.objs
-        before = self._get_layers_snapshot()
-        self.methods.append_objects(objs, self.presenter.active_layer)
-        after = self._get_layers_snapshot()
-        sel_after = [] + objs
-        transaction = [
-            [[self._set_layers_snapshot, before],
-             [self._set_selection, sel_before]],
-            [[self._set_layers_snapshot, after],
-             [self._set_selection, sel_after]],
-            False]
-        self.add_undo(transaction)
-        for obj in objs:
-            obj.do_update()
-        self.selection.set(objs)
-        self.selection.update()
+        with events.batch():
+            if objs is None:
+                objs = self.app.clipboard.get()
+            sel_before = [] + self.selection.objs
+            before = self._get_layers_snapshot()
+            self.methods.append_objects(objs, self.presenter.active_layer)
+            self._set_structure_modified()
+            after = self._get_layers_snapshot()
+            sel_after = [] + objs
+            transaction = [
+                [[self._set_layers_snapshot, before],
+                 [self._set_selection, sel_before]],
+                [[self._set_layers_snapshot, after],
+                 [self._set_selection, sel_after]],
+                False]
+            self.add_undo(transaction)
+            for obj in objs:
+                obj.do_update()
+            self.selection.set(objs)
+            self.selection.update()
 
     def raise_to_top(self):
         before = self._get_layers_snapshot()
@@ -1006,6 +1196,7 @@ class PresenterAPI(AbstractAPI):
         index = childs.index(obj)
         new_childs = childs[:index] + childs[index + 1:] + [obj, ]
         obj.parent.childs = new_childs
+        self._set_structure_modified()
         after = self._get_layers_snapshot()
         transaction = [
             [[self._set_layers_snapshot, before],
@@ -1027,6 +1218,7 @@ class PresenterAPI(AbstractAPI):
         new_childs += childs[index + 2:]
 
         obj.parent.childs = new_childs
+        self._set_structure_modified()
         after = self._get_layers_snapshot()
         transaction = [
             [[self._set_layers_snapshot, before],
@@ -1048,6 +1240,7 @@ class PresenterAPI(AbstractAPI):
         new_childs += childs[index + 1:]
 
         obj.parent.childs = new_childs
+        self._set_structure_modified()
         after = self._get_layers_snapshot()
         transaction = [
             [[self._set_layers_snapshot, before],
@@ -1066,6 +1259,7 @@ class PresenterAPI(AbstractAPI):
         index = childs.index(obj)
         new_childs = [obj, ] + childs[:index] + childs[index + 1:]
         obj.parent.childs = new_childs
+        self._set_structure_modified()
         after = self._get_layers_snapshot()
         transaction = [
             [[self._set_layers_snapshot, before],
@@ -1113,17 +1307,18 @@ class PresenterAPI(AbstractAPI):
             self.selection.update()
 
     def trasform_objs(self, obj_trafo_list):
-        before, after = self._apply_trafos(obj_trafo_list)
-        sel_before = [] + self.selection.objs
-        sel_after = [] + sel_before
-        transaction = [
-            [[self._set_snapshots, before],
-             [self._set_selection, sel_before]],
-            [[self._set_snapshots, after],
-             [self._set_selection, sel_after]],
-            False]
-        self.add_undo(transaction)
-        self.selection.update()
+        with events.batch():
+            before, after = self._apply_trafos(obj_trafo_list)
+            sel_before = [] + self.selection.objs
+            sel_after = [] + sel_before
+            transaction = [
+                [[self._set_snapshots, before],
+                 [self._set_selection, sel_before]],
+                [[self._set_snapshots, after],
+                 [self._set_selection, sel_after]],
+                False]
+            self.add_undo(transaction)
+            self.selection.update()
 
     def move_selected(self, x, y, copy=False):
         trafo = [1.0, 0.0, 0.0, 1.0, x, y]
@@ -1217,6 +1412,7 @@ class PresenterAPI(AbstractAPI):
             before = self._get_layers_snapshot()
             objs = [] + self.selection.objs
             sel_before = [] + self.selection.objs
+            replacements = {}
 
             for obj in objs:
                 if obj.is_primitive and not obj.is_curve:
@@ -1226,9 +1422,9 @@ class PresenterAPI(AbstractAPI):
                         index = parent.childs.index(obj)
                         curve.parent = parent
                         parent.childs[index] = curve
-                        sel_id = self.selection.objs.index(obj)
-                        self.selection.objs[sel_id] = curve
+                        replacements[id(obj)] = curve
 
+            self.selection.replace_objs(replacements)
             after = self._get_layers_snapshot()
             sel_after = [] + self.selection.objs
             transaction = [
@@ -1305,6 +1501,7 @@ class PresenterAPI(AbstractAPI):
 
     def set_temp_style(self, obj, style):
         obj.style = style
+        self._set_objs_modified([obj, ])
         self.eventloop.emit(self.eventloop.DOC_MODIFIED)
         self.selection.update()
 
@@ -1395,66 +1592,68 @@ class PresenterAPI(AbstractAPI):
     # --- GROUP
 
     def group_selected(self):
-        if self.selection.objs:
-            before = self._get_layers_snapshot()
-            objs = [] + self.selection.objs
-            sel_before = [] + self.selection.objs
+        with events.batch():
+            if self.selection.objs:
+                before = self._get_layers_snapshot()
+                objs = [] + self.selection.objs
+                sel_before = [] + self.selection.objs
 
-            parent = objs[-1].parent
-            group = sk2_model.Group(objs[-1].config, parent, objs)
-            for obj in objs:
-                obj.parent.childs.remove(obj)
-            parent.childs.append(group)
-            parent_list = []
-            for obj in objs:
-                parent_list.append([obj, obj.parent])
-            group.do_update()
+                parent = objs[-1].parent
+                group = sk2_model.Group(objs[-1].config, parent, objs)
+                for obj in objs:
+                    obj.parent.childs.remove(obj)
+                parent.childs.append(group)
+                parent_list = []
+                for obj in objs:
+                    parent_list.append([obj, obj.parent])
+                group.do_update()
 
-            after = self._get_layers_snapshot()
-            sel_after = [group]
-            self.selection.set([group])
-            transaction = [
-                [[self._set_layers_snapshot, before],
-                 [self._restore_parents, parent_list],
-                 [self._set_selection, sel_before]],
-                [[self._set_layers_snapshot, after],
-                 [self._set_parent, sel_after, group],
-                 [self._set_selection, sel_after]],
-                False]
-            self.add_undo(transaction)
-            self.selection.update()
+                after = self._get_layers_snapshot()
+                sel_after = [group]
+                self.selection.set([group])
+                transaction = [
+                    [[self._set_layers_snapshot, before],
+                     [self._restore_parents, parent_list],
+                     [self._set_selection, sel_before]],
+                    [[self._set_layers_snapshot, after],
+                     [self._set_parent, sel_after, group],
+                     [self._set_selection, sel_after]],
+                    False]
+                self.add_undo(transaction)
+                self.selection.update()
 
     def ungroup_selected(self):
-        if self.selection.objs:
-            group = self.selection.objs[0]
-            before = self._get_layers_snapshot()
-            objs = [] + group.childs
-            sel_before = [] + self.selection.objs
-            parent = group.parent
-            index = parent.childs.index(group)
+        with events.batch():
+            if self.selection.objs:
+                group = self.selection.objs[0]
+                before = self._get_layers_snapshot()
+                objs = [] + group.childs
+                sel_before = [] + self.selection.objs
+                parent = group.parent
+                index = parent.childs.index(group)
 
-            child_list = parent.childs[:index] + objs
-            child_list += parent.childs[index + 1:]
-            parent.childs = child_list
+                child_list = parent.childs[:index] + objs
+                child_list += parent.childs[index + 1:]
+                parent.childs = child_list
 
-            parent_list = []
-            for obj in objs:
-                obj.parent = parent
-                parent_list.append([obj, group])
+                parent_list = []
+                for obj in objs:
+                    obj.parent = parent
+                    parent_list.append([obj, group])
 
-            after = self._get_layers_snapshot()
-            sel_after = objs
-            self.selection.set(sel_after)
-            transaction = [
-                [[self._set_layers_snapshot, before],
-                 [self._set_parent, sel_after, group],
-                 [self._set_selection, sel_before]],
-                [[self._set_layers_snapshot, after],
-                 [self._restore_parents, parent_list],
-                 [self._set_selection, sel_after]],
-                False]
-            self.add_undo(transaction)
-            self.selection.update()
+                after = self._get_layers_snapshot()
+                sel_after = objs
+                self.selection.set(sel_after)
+                transaction = [
+                    [[self._set_layers_snapshot, before],
+                     [self._set_parent, sel_after, group],
+                     [self._set_selection, sel_before]],
+                    [[self._set_layers_snapshot, after],
+                     [self._restore_parents, parent_list],
+                     [self._set_selection, sel_after]],
+                    False]
+                self.add_undo(transaction)
+                self.selection.update()
 
     def _ungroup_tree(self, group, objs_list, parent_list):
         for obj in group.childs:
@@ -1465,43 +1664,44 @@ class PresenterAPI(AbstractAPI):
                 self._ungroup_tree(obj, objs_list, parent_list)
 
     def ungroup_all(self):
-        if self.selection.objs:
-            parent_list_before = []
-            parent_list_after = []
-            sel_after = []
+        with events.batch():
+            if self.selection.objs:
+                parent_list_before = []
+                parent_list_after = []
+                sel_after = []
 
-            sel_before = [] + self.selection.objs
-            before = self._get_layers_snapshot()
+                sel_before = [] + self.selection.objs
+                before = self._get_layers_snapshot()
 
-            for obj in self.selection.objs:
-                if obj.is_group:
-                    objs_list = []
-                    self._ungroup_tree(obj, objs_list, parent_list_before)
-                    index = obj.parent.childs.index(obj)
-                    parent = obj.parent
+                for obj in self.selection.objs:
+                    if obj.is_group:
+                        objs_list = []
+                        self._ungroup_tree(obj, objs_list, parent_list_before)
+                        index = obj.parent.childs.index(obj)
+                        parent = obj.parent
 
-                    child_list = parent.childs[:index] + objs_list
-                    child_list += parent.childs[index + 1:]
-                    parent.childs = child_list
+                        child_list = parent.childs[:index] + objs_list
+                        child_list += parent.childs[index + 1:]
+                        parent.childs = child_list
 
-                    for item in objs_list:
-                        item.parent = parent
-                        sel_after.append(item)
-                else:
-                    sel_after.append(obj)
+                        for item in objs_list:
+                            item.parent = parent
+                            sel_after.append(item)
+                    else:
+                        sel_after.append(obj)
 
-            after = self._get_layers_snapshot()
-            self.selection.set(sel_after)
-            transaction = [
-                [[self._set_layers_snapshot, before],
-                 [self._restore_parents, parent_list_before],
-                 [self._set_selection, sel_before]],
-                [[self._set_layers_snapshot, after],
-                 [self._restore_parents, parent_list_after],
-                 [self._set_selection, sel_after]],
-                False]
-            self.add_undo(transaction)
-            self.selection.update()
+                after = self._get_layers_snapshot()
+                self.selection.set(sel_after)
+                transaction = [
+                    [[self._set_layers_snapshot, before],
+                     [self._restore_parents, parent_list_before],
+                     [self._set_selection, sel_before]],
+                    [[self._set_layers_snapshot, after],
+                     [self._restore_parents, parent_list_after],
+                     [self._set_selection, sel_after]],
+                    False]
+                self.add_undo(transaction)
+                self.selection.update()
 
     # --- CONTAINER
 
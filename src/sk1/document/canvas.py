@@ -19,10 +19,14 @@ import cairo
 import inspect
 import logging
 
+import wal
 from sk1 import events, modes, config
 from sk1.appconst import PAGEFIT, ZOOM_IN, ZOOM_OUT
 from sk1.document import controllers
+from sk1.document.frameprof import FrameProfiler
+from sk1.document.hittest import HitTestEngine
 from sk1.document.renderer import PDRenderer
+from sk1.document.renderworker import RenderWorker
 from sk1.pwidgets import Painter
 from uc2 import libcairo, libgeom
 from uc2.libcairo import normalize_bbox
@@ -41,7 +45,10 @@ class AppCanvas(Painter):
     eventloop = None
     renderer = None
     timer = None
+    render_timer = None
+    render_worker = None
     hit_surface = None
+    profiler = None
 
     mode = None
     previous_mode = None
@@ -72,9 +79,13 @@ class AppCanvas(Painter):
         self.eventloop = self.presenter.eventloop
         self.app = presenter.app
         self.doc = self.presenter.model
+        self.profiler = FrameProfiler()
         self.renderer = PDRenderer(self)
         self.dc = self.app.mw.mdi.canvas
         self.timer = self.dc.timer
+        self.render_timer = wal.CanvasTimer(self.dc,
+                                            delay=config.canvas_render_delay,
+                                            on_timer=self.on_render_timer)
         Painter.__init__(self)
         self.hit_surface = HitSurface(self)
         self.zoom_stack = []
@@ -85,10 +96,21 @@ class AppCanvas(Painter):
         self.eventloop.connect(self.eventloop.PAGE_CHANGED, self.doc_modified)
         self.eventloop.connect(self.eventloop.SELECTION_CHANGED,
                                self.selection_redraw)
+        events.connect(events.CMS_CHANGED, self.cms_changed)
 
     def destroy(self):
+        events.disconnect(events.CMS_CHANGED, self.cms_changed)
         self.timer.stop()
+        self.render_timer.stop()
+        if self.render_worker is not None:
+            self.render_worker.stop()
         self.renderer.destroy()
+        if config.canvas_profiler and config.canvas_profiler_file:
+            try:
+                self.profiler.export(config.canvas_profiler_file)
+            except Exception as e:
+                LOG.warn('Cannot export frame profile %s', e)
+        self.profiler.destroy()
         self.hit_surface.destroy()
         items = self.ctrls.keys()
         for item in items:
@@ -421,9 +443,44 @@ class AppCanvas(Painter):
         self.force_redraw()
 
     def doc_modified(self):
+        if self.render_worker is not None:
+            self.render_worker.cancel()
+        self.renderer.tile_cache.set_modified()
         self.full_repaint = True
         self.force_redraw()
 
+    def cms_changed(self):
+        self.renderer.tile_cache.clear()
+        self.doc_modified()
+
+    def on_render_timer(self, *args):
+        """
+        Continues progressive rendering of document. View changes
+        arrived meanwhile are handled by the same repaint, so not
+        finished rendering of previous view is abandoned.
+        """
+        self.render_timer.stop()
+        if not self.renderer.pending:
+            return
+        worker = self.render_worker
+        if worker is not None and worker.is_busy() and \
+                not worker.has_results():
+            self.render_timer.start()
+            return
+        self.full_repaint = True
+        self.force_redraw()
+
+    def get_render_worker(self):
+        """
+        Returns background tile renderer if it is enabled.
+        """
+        if not config.canvas_render_worker:
+            return None
+        if self.render_worker is None:
+            self.render_worker = RenderWorker(self)
+            self.render_worker.start()
+        return self.render_worker
+
     def force_redraw(self):
         if self.presenter == self.app.current_doc:
             self.dc.force_redraw()
@@ -439,10 +496,14 @@ class AppCanvas(Painter):
     def paint(self):
         if self.matrix is None:
             self.zoom_fit_to_page()
-            self.set_mode(modes.SELECT_MODE)
+            # keep temporary mode, e.g. WAIT_MODE of loading document
+            if self.previous_mode is None:
+                self.set_mode(modes.SELECT_MODE)
         self._keep_center()
         self.app.mw.mdi.statusbar.zoom.update(self.zoom)
 
+        profiler = self.profiler
+        profiler.begin_frame()
         try:
             if self.soft_repaint and not self.full_repaint:
                 if self.selection_repaint:
@@ -450,7 +511,8 @@ class AppCanvas(Painter):
                             self.presenter.selection.objs:
                         pass
                     else:
-                        self.renderer.paint_selection()
+                        with profiler.phase('paint_selection'):
+                            self.renderer.paint_selection()
                 self.soft_repaint = False
             else:
                 self.renderer.paint_document()
@@ -459,32 +521,46 @@ class AppCanvas(Painter):
                             self.presenter.selection.objs:
                         pass
                     else:
-                        self.renderer.paint_selection()
-                self.eventloop.emit(self.eventloop.VIEW_CHANGED)
+                        with profiler.phase('paint_selection'):
+                            self.renderer.paint_selection()
+                with profiler.phase('view_changed'):
+                    self.eventloop.emit(self.eventloop.VIEW_CHANGED)
                 self.full_repaint = False
                 self.soft_repaint = False
             if self.controller is not None:
-                self.controller.repaint()
+                with profiler.phase('controller_repaint'):
+                    self.controller.repaint()
             if self.dragged_guide:
                 self.renderer.paint_guide_dragging(*self.dragged_guide)
                 if not self.mode == modes.GUIDE_MODE:
                     self.dragged_guide = ()
-            self.renderer.finalize()
+            profiler.count('selected', len(self.presenter.selection.objs))
+            if profiler.frame is not None and config.canvas_profiler_hud:
+                # HUD shows previous frame, current one is not finished
+                profiler.paint_hud(self.renderer.temp_surface)
+            with profiler.phase('finalize'):
+                self.renderer.finalize()
+            if self.renderer.pending and not self.render_timer.is_running():
+                self.render_timer.start()
         except Exception as e:
             LOG.error('Painting error %s', e, exc_info=True)
+        profiler.end_frame()
 
 
 class HitSurface:
     surface = None
     ctx = None
     canvas = None
+    engine = None
 
     def __init__(self, canvas):
         self.canvas = canvas
         self.surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 1, 1)
         self.ctx = cairo.Context(self.surface)
+        self.engine = HitTestEngine(canvas)
 
     def destroy(self):
+        self.engine.destroy()
         items = self.__dict__.keys()
         for item in items:
             self.__dict__[item] = None
@@ -502,6 +578,12 @@ class HitSurface:
         return trafo
 
     def is_point_into_object(self, win_point, obj, fill_anyway=False):
+        if config.analytic_hit_test:
+            try:
+                return self.engine.is_point_into_object(win_point, obj,
+                                                        fill_anyway)
+            except Exception as e:
+                LOG.warn('Analytic hit test failed %s', e)
         self.clear()
         self._draw_object(obj, self.get_context_trafo(win_point), fill_anyway)
         return not libcairo.check_surface_whiteness(self.surface)
@@ -550,6 +632,11 @@ class HitSurface:
                                 self.ctx.fill()
 
     def is_point_on_path(self, win_point, path):
+        if config.analytic_hit_test:
+            try:
+                return self.engine.is_point_on_path(win_point, path)
+            except Exception as e:
+                LOG.warn('Analytic hit test failed %s', e)
         self.clear()
         trafo = self.get_context_trafo(win_point)
         self.ctx.set_matrix(libcairo.get_matrix_from_trafo(trafo))
@@ -563,6 +650,12 @@ class HitSurface:
         return not libcairo.check_surface_whiteness(self.surface)
 
     def is_point_on_segment(self, win_point, start_point, end_point):
+        if config.analytic_hit_test:
+            try:
+                return self.engine.is_point_on_segment(win_point, start_point,
+                                                       end_point)
+            except Exception as e:
+                LOG.warn('Analytic hit test failed %s', e)
         self.clear()
         trafo = self.get_context_trafo(win_point)
         self.ctx.set_matrix(libcairo.get_matrix_from_trafo(trafo))
@@ -581,6 +674,14 @@ class HitSurface:
         return not libcairo.check_surface_whiteness(self.surface)
 
     def get_t_parameter(self, win_point, start, end, t=0.5, dt=0.5):
+        if config.analytic_hit_test:
+            try:
+                return self.engine.get_t_parameter(win_point, start, end)
+            except Exception as e:
+                LOG.warn('Analytic hit test failed %s', e)
+        return self._get_t_parameter(win_point, start, end, t, dt)
+
+    def _get_t_parameter(self, win_point, start, end, t=0.5, dt=0.5):
         dt /= 2.0
         new, new_end = libgeom.split_bezier_curve(start, end, t)
         ret1 = self.is_point_on_segment(win_point, start, new)
@@ -588,6 +689,6 @@ class HitSurface:
         if ret1 and ret2:
             return t
         elif ret1:
-            return self.get_t_parameter(win_point, start, end, t - dt, dt)
+            return self._get_t_parameter(win_point, start, end, t - dt, dt)
         elif ret2:
-            return self.get_t_parameter(win_point, start, end, t + dt, dt)
+            return self._get_t_parameter(win_point, start, end, t + dt, dt)
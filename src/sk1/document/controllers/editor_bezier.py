@@ -20,6 +20,7 @@ from copy import deepcopy
 from uc2 import libgeom, sk2const
 
 from sk1 import _, modes, config, events
+from sk1.document.spatial import GridIndex, GRID_DIVISION
 from generic import AbstractController
 
 
@@ -222,15 +223,23 @@ class BezierEditor(AbstractController):
             for item in self.selected_nodes:
                 item.selected = False
             self.selected_nodes = []
+        selected_ids = set([id(item) for item in self.selected_nodes])
+        removed = set()
         for item in points:
             if item.is_start() and item.path.is_closed():
                 continue
-            if item.selected and item in self.selected_nodes:
+            if item.selected and id(item) in selected_ids:
                 item.selected = False
-                self.selected_nodes.remove(item)
+                selected_ids.discard(id(item))
+                removed.add(id(item))
             else:
                 item.selected = True
+                selected_ids.add(id(item))
                 self.selected_nodes.append(item)
+        if removed:
+            self.selected_nodes = [item for item in self.selected_nodes
+                                   if id(item) not in removed or
+                                   id(item) in selected_ids]
         if len(self.selected_nodes) == 1:
             self.create_control_points()
         else:
@@ -286,18 +295,19 @@ class BezierEditor(AbstractController):
         self.apply_trafo_to_selected_points(trafo, undable)
 
     def apply_trafo_to_selected_points(self, trafo, undable=False):
+        selected_ids = set([id(item) for item in self.selected_nodes])
         for item in self.selected_nodes:
             item.path.apply_trafo_to_point(item, trafo)
             start = item.path.start_point
             if item.path.is_closed() and item.is_end() \
-                    and start not in self.selected_nodes:
+                    and id(start) not in selected_ids:
                 item.path.apply_trafo_to_point(start, trafo)
-        paths = self.get_paths()
         if undable:
+            paths = self.get_paths()
             self.api.set_new_paths(self.target, paths, self.orig_paths)
             self.orig_paths = paths
         else:
-            self.api.set_temp_paths(self.target, paths)
+            self.api.set_temp_paths(self.target, self.get_temp_paths())
 
     def move_control_point(self, win_point, undable=False):
         if not self.cpoint:
@@ -306,12 +316,14 @@ class BezierEditor(AbstractController):
         x0, y0 = self.cpoint.get_point()
         trafo = [1.0, 0.0, 0.0, 1.0, x1 - x0, y1 - y0]
         self.cpoint.apply_trafo(trafo)
-        paths = self.get_paths()
+        node = self.cpoint.point
+        node.path.set_point_modified(node)
         if undable:
+            paths = self.get_paths()
             self.api.set_new_paths(self.target, paths, self.orig_paths)
             self.orig_paths = paths
         else:
-            self.api.set_temp_paths(self.target, paths)
+            self.api.set_temp_paths(self.target, self.get_temp_paths())
 
     def get_paths(self):
         ret = []
@@ -319,9 +331,22 @@ class BezierEditor(AbstractController):
             ret.append(item.get_path())
         return ret
 
+    def get_temp_paths(self):
+        """
+        Returns incrementally updated paths for temporary changes.
+        Returned lists are reused by next call, so they should not
+        be stored in undo history.
+        """
+        ret = []
+        for item in self.paths:
+            ret.append(item.get_temp_path())
+        return ret
+
     def apply_changes(self):
         self.new_node = None
         self.new_node_flag = False
+        for item in self.paths:
+            item.reset_index()
         paths = self.get_paths()
         self.api.set_new_paths(self.target, paths, self.orig_paths)
         self.orig_paths = paths
@@ -699,11 +724,25 @@ class BezierEditor(AbstractController):
 
 
 class BezierPath:
+    """
+    Editable subpath. Node positions are indexed by identity map
+    and uniform grid, which are rebuilt lazily when nodes list is
+    changed. Temporary path keeps object space nodes and is updated
+    for modified nodes only.
+    """
     canvas = None
     start_point = None
     points = []
     closed = sk2const.CURVE_OPENED
     trafo = []
+    inv_trafo = None
+    index = None
+    index_src = None
+    index_start = None
+    index_len = 0
+    grid = None
+    temp_path = None
+    dirty = None
 
     def __init__(self, canvas, path=None, trafo=None):
         trafo = trafo or []
@@ -738,14 +777,100 @@ class BezierPath:
     def get_all_points(self):
         return [self.start_point, ] + self.points
 
+    def reset_index(self):
+        self.index = None
+        self.grid = None
+        self.temp_path = None
+
+    def get_index(self):
+        """
+        Returns {id(node): position} map, start point has 0 position
+        and points[i] - i + 1.
+        """
+        if self.index is None or self.index_src is not self.points or \
+                self.index_start is not self.start_point or \
+                not self.index_len == len(self.points):
+            self.reset_index()
+            self.index = {id(self.start_point): 0}
+            for pos, item in enumerate(self.points):
+                self.index[id(item)] = pos + 1
+            self.index_src = self.points
+            self.index_start = self.start_point
+            self.index_len = len(self.points)
+        return self.index
+
+    def get_grid(self):
+        self.get_index()
+        if self.grid is None:
+            points = self.get_all_points()
+            bases = [item.get_base_point() for item in points]
+            xs = [base[0] for base in bases]
+            ys = [base[1] for base in bases]
+            size = max(max(xs) - min(xs), max(ys) - min(ys))
+            self.grid = GridIndex(size / GRID_DIVISION or 1.0)
+            for item, base in zip(points, bases):
+                self.grid.insert(item, base + base)
+        return self.grid
+
+    def _update_grid(self, point):
+        if self.grid is not None:
+            base = point.get_base_point()
+            self.grid.insert(point, base + base)
+
+    def _sort_points(self, points, reverse=False):
+        index = self.get_index()
+        return sorted(points, key=lambda item: index[id(item)],
+                      reverse=reverse)
+
+    def _get_inv_trafo(self):
+        if self.inv_trafo is None:
+            self.inv_trafo = libgeom.invert_trafo(self.trafo)
+        return self.inv_trafo
+
     def get_path(self):
         ret = [[], [], self.closed]
-        inv_trafo = libgeom.invert_trafo(self.trafo)
+        inv_trafo = self._get_inv_trafo()
         ret[0] = libgeom.apply_trafo_to_point(self.start_point.point, inv_trafo)
         for item in self.points:
             ret[1].append(libgeom.apply_trafo_to_point(item.point, inv_trafo))
         return ret
 
+    def set_modified(self, *positions):
+        if self.temp_path is not None:
+            self.dirty.update(positions)
+
+    def set_point_modified(self, point):
+        """
+        Marks node and its neighbours as changed in temporary path.
+        """
+        pos = self.get_index().get(id(point))
+        if pos is None:
+            return
+        positions = [pos - 1, pos, pos + 1]
+        if self.is_closed():
+            positions += [1, len(self.points)]
+        self.set_modified(*[item for item in positions
+                            if 0 <= item <= len(self.points)])
+
+    def get_temp_path(self):
+        self.get_index()
+        if self.temp_path is None:
+            self.temp_path = self.get_path()
+        else:
+            inv_trafo = self._get_inv_trafo()
+            for pos in self.dirty:
+                if pos:
+                    point = self.points[pos - 1].point
+                    self.temp_path[1][pos - 1] = \
+                        libgeom.apply_trafo_to_point(point, inv_trafo)
+                else:
+                    point = self.start_point.point
+                    self.temp_path[0] = \
+                        libgeom.apply_trafo_to_point(point, inv_trafo)
+            self.temp_path[2] = self.closed
+        self.dirty = set()
+        return self.temp_path
+
     def get_segments(self):
         ret = []
         start = self.start_point
@@ -757,9 +882,10 @@ class BezierPath:
         return ret
 
     def pressed_point(self, win_point):
-        points = [self.start_point, ] + self.points
-        points.reverse()
-        for item in points:
+        point = self.canvas.win_to_doc(win_point)
+        tolerance = config.point_sensitivity_size / self.canvas.zoom
+        points = self.get_grid().query_point(point, tolerance)
+        for item in self._sort_points(points, True):
             if item.is_pressed(win_point):
                 return item
         return None
@@ -782,24 +908,24 @@ class BezierPath:
 
     def select_points_by_bbox(self, bbox):
         ret = []
-        if libgeom.is_point_in_bbox(self.start_point.point, bbox):
-            ret.append(self.start_point)
-        for item in self.points:
+        for item in self._sort_points(self.get_grid().query_rect(bbox)):
             if libgeom.is_point_in_bbox(item.point, bbox):
                 ret.append(item)
         return ret
 
     def apply_trafo_to_point(self, point, trafo):
-        if point in self.points + [self.start_point, ]:
-            point.apply_trafo(trafo)
-            if not point == self.points[-1] and not point == self.start_point:
-                index = self.points.index(point) + 1
-                self.points[index].apply_trafo_before(trafo)
-            elif point == self.start_point:
-                self.points[0].apply_trafo_before(trafo)
+        pos = self.get_index().get(id(point))
+        if pos is None:
+            return
+        point.apply_trafo(trafo)
+        self._update_grid(point)
+        self.set_modified(pos)
+        if pos < len(self.points):
+            self.points[pos].apply_trafo_before(trafo)
+            self.set_modified(pos + 1)
 
     def delete_point(self, point):
-        if point in self.points:
+        if self.get_index().get(id(point)):
             self.points.remove(point)
         elif point == self.start_point and self.points:
             self.start_point = self.points[0]
@@ -810,8 +936,9 @@ class BezierPath:
                 self.points += [self.start_point.get_copy(), ]
 
     def get_point_index(self, point):
-        if point in self.points:
-            return self.points.index(point)
+        pos = self.get_index().get(id(point))
+        if pos:
+            return pos - 1
         return None
 
     def insert_point(self, point, index):
@@ -907,20 +1034,20 @@ class BezierPoint:
     def get_point_before(self):
         if self.path.start_point == self:
             return None
-        index = self.path.points.index(self)
-        if not index:
+        pos = self.path.get_index()[id(self)]
+        if pos == 1:
             return self.path.start_point
         else:
-            return self.path.points[index - 1]
+            return self.path.points[pos - 2]
 
     def get_point_after(self):
         if self.path.start_point == self:
             return self.path.points[0]
-        index = self.path.points.index(self) + 1
-        if index == len(self.path.points):
+        pos = self.path.get_index()[id(self)]
+        if pos == len(self.path.points):
             return None
         else:
-            return self.path.points[index]
+            return self.path.points[pos]
 
     def is_curve(self):
         return len(self.point) > 2
@@ -186,10 +186,20 @@ class WaitController(AbstractController):
     mode = modes.WAIT_MODE
     move = False
     fleur_timer = None
+    callback = None  # cancels waited operation
 
     def __init__(self, canvas, presenter):
         AbstractController.__init__(self, canvas, presenter)
 
+    def stop_(self):
+        self.callback = None
+
+    def escape_pressed(self):
+        if self.callback is not None:
+            callback = self.callback
+            self.callback = None
+            callback()
+
     def mouse_down(self, event): pass
 
     def mouse_up(self, event): pass
@@ -17,11 +17,14 @@
 
 from creators import AbstractCreator
 from sk1 import modes, config
+from sk1.document.hittest import get_segment_distance
 from uc2 import sk2const
 from uc2.libgeom import apply_trafo_to_paths, is_point_in_rect2
 from uc2.libgeom import contra_point, bezier_base_point, midpoint
 from uc2.libgeom import round_angle_point
 
+MAX_TRAIL = 64
+
 
 class PolyLineCreator(AbstractCreator):
     mode = modes.LINE_MODE
@@ -32,6 +35,9 @@ class PolyLineCreator(AbstractCreator):
     points = []
     cursor = []
     obj = None
+    # nodes dropped by simplification after last kept node,
+    # None if last node can not be dropped
+    trail = None
 
     # Actual event point
     point = []
@@ -137,9 +143,7 @@ class PolyLineCreator(AbstractCreator):
 
     def repaint_draw(self):
         if self.path[0] or self.paths:
-            paths = self.canvas.paths_doc_to_win(self.paths)
-            cursor = self.cursor
-            self.canvas.renderer.paint_curve(paths, cursor)
+            self.canvas.renderer.paint_drawing(self.paths, self.cursor)
         return True
 
     def continuous_draw(self):
@@ -173,6 +177,7 @@ class PolyLineCreator(AbstractCreator):
         self.point = []
         self.doc_point = []
         self.obj = None
+        self.trail = None
         self.timer_callback = None
 
     def clear_data(self):
@@ -181,6 +186,7 @@ class PolyLineCreator(AbstractCreator):
         self.path = [[], [], sk2const.CURVE_OPENED]
         self.point = []
         self.doc_point = []
+        self.trail = None
 
     def init_flags(self):
         self.create = False
@@ -234,16 +240,43 @@ class PolyLineCreator(AbstractCreator):
                         self.release_curve(False)
                     self.on_timer()
                 elif not is_point_in_rect2(subpoint, last, w, h):
-                    self.points.append(doc_point)
-                    self.path[1] = self.points
+                    self.append_point(doc_point)
             else:
                 if not is_point_in_rect2(subpoint, start, w, h):
-                    self.points.append(doc_point)
-                    self.path[1] = self.points
+                    self.append_point(doc_point)
         else:
             self.path[0] = doc_point
             self.paths.append(self.path)
 
+    def append_point(self, doc_point):
+        """
+        Appends node to current path. Nodes captured by continuous
+        drawing are simplified on the fly: last node is replaced if
+        it and nodes dropped before it deviate from the new segment
+        less than curve_simplify_tolerance.
+        """
+        tolerance = config.curve_simplify_tolerance / self.canvas.zoom
+        if not self.create:
+            self.trail = None
+        elif tolerance and self.trail is not None and len(doc_point) == 2 \
+                and len(self.trail) < MAX_TRAIL:
+            anchor = self.path[0]
+            if len(self.points) > 1:
+                anchor = bezier_base_point(self.points[-2])
+            trail = self.trail + [self.points[-1]]
+            for point in trail:
+                if get_segment_distance(point, anchor,
+                                        doc_point) > tolerance:
+                    break
+            else:
+                self.trail = trail
+                self.points[-1] = doc_point
+                return
+        self.points.append(doc_point)
+        self.path[1] = self.points
+        if self.create and len(doc_point) == 2:
+            self.trail = []
+
     def release_curve(self, stop=True):
         if self.points:
             self.cursor = []
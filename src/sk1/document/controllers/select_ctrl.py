@@ -88,4 +88,6 @@ class PickController(AbstractController):
         obj = self.canvas.pick_at_point(self.end)
         if not self.callback(obj):
             self.callback = None
-            self.canvas.restore_mode()
+            # callback may leave pick mode itself
+            if self.canvas.mode == self.mode:
+                self.canvas.restore_mode()
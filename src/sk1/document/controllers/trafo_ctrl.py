@@ -43,18 +43,22 @@ class MoveController(AbstractController):
         dpoint = self.canvas.win_to_doc(self.start)
         sel = self.selection.pick_at_point(dpoint, True)
         self.old_selection = [] + self.selection.objs
-        if sel and sel[0] not in self.selection.objs:
+        if sel and not self.selection.is_selected(sel[0]):
             self.selection.clear()
             self.canvas.renderer.paint_selection()
             self.canvas.selection_repaint = False
             self.selection.set(sel)
         self.canvas.selection_repaint = False
+        self.canvas.renderer.stop_live_drag()
         self.canvas.renderer.cdc_paint_doc()
         self.timer.start()
 
     def repaint(self):
         if self.end:
-            self.canvas.renderer.cdc_draw_move_frame(self.trafo)
+            if config.live_drag_preview:
+                self.canvas.renderer.cdc_draw_live_drag(self.trafo, self.copy)
+            else:
+                self.canvas.renderer.cdc_draw_move_frame(self.trafo)
             self.end = []
 
     def _calc_trafo(self, point1, point2):
@@ -97,6 +101,7 @@ class MoveController(AbstractController):
     def mouse_up(self, event):
         if self.move:
             self.timer.stop()
+            self.canvas.renderer.stop_live_drag()
             new = event.get_point()
             if event.is_ctrl():
                 change = [new[0] - self.start[0], new[1] - self.start[1]]
@@ -270,6 +275,7 @@ class TransformController(AbstractController):
         self.canvas.selection_repaint = False
         if not self.canvas.resize_marker == 9:
             self.painter = self._draw_frame
+            self.canvas.renderer.stop_live_drag()
             self.canvas.renderer.cdc_paint_doc()
         else:
             self.offset_start = [] + self.selection.center_offset
@@ -283,6 +289,7 @@ class TransformController(AbstractController):
         self.move = False
         self.canvas.selection_repaint = True
         if not self.canvas.resize_marker == 9:
+            self.canvas.renderer.stop_live_drag()
             self.canvas.renderer.hide_move_frame()
             if self.moved:
                 self.trafo = self._calc_trafo(event)
@@ -966,7 +973,10 @@ class TransformController(AbstractController):
 
     def _draw_frame(self, *args):
         if self.end:
-            self.canvas.renderer.cdc_draw_move_frame(self.trafo)
+            if config.live_drag_preview:
+                self.canvas.renderer.cdc_draw_live_drag(self.trafo, self.copy)
+            else:
+                self.canvas.renderer.cdc_draw_move_frame(self.trafo)
             self.end = []
         return True
 
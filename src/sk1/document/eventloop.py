@@ -17,6 +17,8 @@
 
 import logging
 
+from sk1 import events
+
 LOG = logging.getLogger(__name__)
 
 
@@ -29,6 +31,9 @@ class EventLoop:
     SELECTION_CHANGED = []
     PAGE_CHANGED = []
 
+    CHANNEL_NAMES = ['VIEW_CHANGED', 'SELECT_AREA', 'DOC_MODIFIED',
+                     'SELECTION_CHANGED', 'PAGE_CHANGED']
+
     def __init__(self, presenter):
         self.presenter = presenter
         self.VIEW_CHANGED = []
@@ -66,15 +71,30 @@ class EventLoop:
                 msg = "Cannot disconnect from channel <%s> receiver: <%s> %s"
                 LOG.error(msg, channel, receiver, e)
 
+    def get_channel_name(self, channel):
+        for name in self.CHANNEL_NAMES:
+            if getattr(self, name) is channel:
+                return 'doc.' + name
+        return 'doc.UNKNOWN'
+
     def emit(self, channel, *args):
         """
         Sends signal to all receivers in channel.
+        Inside events.batch() scope signal is deferred and coalesced.
         """
-        for receiver in channel:
-            try:
-                if callable(receiver):
-                    receiver(*args)
-            except Exception as e:
-                msg = 'Error calling <%s> receiver with %s %s'
-                LOG.error(msg, receiver, args, e)
-                continue
+        if events.is_batching():
+            key = ('eventloop', id(self), id(channel))
+            events.enqueue(key, self._dispatch, channel, args)
+        else:
+            self._dispatch(channel, args)
+
+    def _dispatch(self, channel, args):
+        if self.presenter is None:
+            # document is closed while signal was deferred
+            return
+        name = self.get_channel_name(channel)
+        events.call_receivers(name, [] + channel, args)
+
+    @staticmethod
+    def batch():
+        return events.batch()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import cairo
+import csv
+import json
+import time
+from collections import deque
+
+from sk1 import config
+
+HUD_FONT_SIZE = 11
+HUD_PADDING = 4
+
+
+class NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class Phase:
+    profiler = None
+    name = ''
+    start = 0.0
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.add_time(self.name, time.time() - self.start)
+        return False
+
+
+class FrameProfiler:
+    """
+    Opt-in frame-time profiler of canvas painting. Each frame keeps
+    per-phase durations and object counters; last frames are stored
+    in ring buffer and can be exported as JSON or CSV.
+    """
+    frames = None
+    frame = None
+    start = 0.0
+
+    def __init__(self):
+        self.frames = deque(maxlen=config.canvas_profiler_frames)
+
+    def destroy(self):
+        items = self.__dict__.keys()
+        for item in items:
+            self.__dict__[item] = None
+
+    def is_enabled(self):
+        return config.canvas_profiler
+
+    def begin_frame(self):
+        if not config.canvas_profiler:
+            self.frame = None
+            return
+        if not self.frames.maxlen == config.canvas_profiler_frames:
+            self.frames = deque(self.frames,
+                                maxlen=config.canvas_profiler_frames)
+        self.start = time.time()
+        self.frame = {'time': self.start, 'total': 0.0,
+                      'phases': {}, 'counts': {}}
+
+    def end_frame(self):
+        if self.frame is None:
+            return
+        self.frame['total'] = time.time() - self.start
+        self.frames.append(self.frame)
+        self.frame = None
+
+    def phase(self, name):
+        """
+        Returns context manager timing named phase of current frame.
+        """
+        if self.frame is None:
+            return NULL_PHASE
+        return Phase(self, name)
+
+    def add_time(self, name, value):
+        if self.frame is not None:
+            phases = self.frame['phases']
+            phases[name] = phases.get(name, 0.0) + value
+
+    def count(self, name, value=1):
+        if self.frame is not None:
+            counts = self.frame['counts']
+            counts[name] = counts.get(name, 0) + value
+
+    # ----- Statistics
+
+    def get_fps(self):
+        """
+        Returns frame rate over the last second of painting.
+        """
+        if not self.frames:
+            return 0.0
+        last = self.frames[-1]['time']
+        frames = [frame for frame in self.frames
+                  if last - frame['time'] <= 1.0]
+        if len(frames) < 2:
+            total = frames[-1]['total']
+            return 1.0 / total if total else 0.0
+        return (len(frames) - 1) / (last - frames[0]['time'])
+
+    def get_slowest_phase(self, frame=None):
+        frame = frame or (self.frames[-1] if self.frames else None)
+        if not frame or not frame['phases']:
+            return '', 0.0
+        return max(frame['phases'].items(), key=lambda item: item[1])
+
+    def get_phase_names(self):
+        names = set()
+        for frame in self.frames:
+            names.update(frame['phases'].keys())
+        return sorted(names)
+
+    def get_count_names(self):
+        names = set()
+        for frame in self.frames:
+            names.update(frame['counts'].keys())
+        return sorted(names)
+
+    # ----- Export
+
+    def export_json(self, filepath):
+        with open(filepath, 'wb') as fp:
+            json.dump(list(self.frames), fp, indent=1, sort_keys=True)
+
+    def export_csv(self, filepath):
+        phases = self.get_phase_names()
+        counts = self.get_count_names()
+        with open(filepath, 'wb') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(['time', 'total'] + phases + counts)
+            for frame in self.frames:
+                row = [frame['time'], frame['total']]
+                row += [frame['phases'].get(name, 0.0) for name in phases]
+                row += [frame['counts'].get(name, 0) for name in counts]
+                writer.writerow(row)
+
+    def export(self, filepath):
+        """
+        Exports frames buffer. Format is chosen by file extension.
+        """
+        if filepath.lower().endswith('.csv'):
+            self.export_csv(filepath)
+        else:
+            self.export_json(filepath)
+
+    # ----- HUD
+
+    def paint_hud(self, surface):
+        if not self.frames or surface is None:
+            return
+        frame = self.frames[-1]
+        name, value = self.get_slowest_phase(frame)
+        lines = ['%.1f fps  %.1f ms' % (self.get_fps(),
+                                        frame['total'] * 1000.0)]
+        if name:
+            lines.append('%s: %.1f ms' % (name, value * 1000.0))
+        lines += ['%s: %d' % item for item in sorted(frame['counts'].items())]
+
+        ctx = cairo.Context(surface)
+        ctx.select_font_face('monospace')
+        ctx.set_font_size(HUD_FONT_SIZE)
+        line_height = HUD_FONT_SIZE + 2
+        width = max([ctx.text_extents(line)[4] for line in lines])
+        ctx.rectangle(0, 0, width + 2 * HUD_PADDING,
+                      len(lines) * line_height + 2 * HUD_PADDING)
+        ctx.set_source_rgba(0.0, 0.0, 0.0, 0.6)
+        ctx.fill()
+        ctx.set_source_rgb(1.0, 1.0, 1.0)
+        y = HUD_PADDING
+        for line in lines:
+            y += line_height
+            ctx.move_to(HUD_PADDING, y - 3)
+            ctx.show_text(line)
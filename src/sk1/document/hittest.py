@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import cairo
+import math
+
+from sk1 import config
+from uc2 import sk2const
+
+CHUNK_SIZE = 32
+MAX_SUBDIVISION = 1024
+SAMPLE_NUM = 64
+
+
+def flatten_bezier(p0, p1, p2, p3, tolerance):
+    """
+    Returns bezier curve points (without start point) flattened
+    with provided tolerance.
+    """
+    ddx = max(abs(p0[0] - 2.0 * p1[0] + p2[0]),
+              abs(p1[0] - 2.0 * p2[0] + p3[0]))
+    ddy = max(abs(p0[1] - 2.0 * p1[1] + p2[1]),
+              abs(p1[1] - 2.0 * p2[1] + p3[1]))
+    dd = math.sqrt(ddx * ddx + ddy * ddy)
+    num = int(math.ceil(math.sqrt(0.75 * dd / tolerance))) if dd else 1
+    num = min(max(num, 1), MAX_SUBDIVISION)
+    points = []
+    for i in range(1, num + 1):
+        points.append(get_bezier_point(p0, p1, p2, p3, float(i) / num))
+    return points
+
+
+def get_bezier_point(p0, p1, p2, p3, t):
+    mt = 1.0 - t
+    a = mt * mt * mt
+    b = 3.0 * mt * mt * t
+    c = 3.0 * mt * t * t
+    d = t * t * t
+    return (a * p0[0] + b * p1[0] + c * p2[0] + d * p3[0],
+            a * p0[1] + b * p1[1] + c * p2[1] + d * p3[1])
+
+
+def flatten_cpath(cpath, tolerance):
+    """
+    Converts cairo path into list of polylines [points, closed_flag].
+    """
+    polylines = []
+    points = []
+    closed = False
+    for item_type, coords in cpath:
+        if item_type == cairo.PATH_MOVE_TO:
+            if len(points) > 1 or closed:
+                polylines.append([points, closed])
+            points = [tuple(coords)]
+            closed = False
+        elif item_type == cairo.PATH_LINE_TO:
+            if not points:
+                points = [tuple(coords)]
+            else:
+                points.append(tuple(coords))
+        elif item_type == cairo.PATH_CURVE_TO:
+            p0 = points[-1] if points else tuple(coords[4:])
+            points += flatten_bezier(p0, coords[0:2], coords[2:4],
+                                     coords[4:6], tolerance)
+        elif item_type == cairo.PATH_CLOSE_PATH:
+            if points:
+                polylines.append([points, True])
+                points = [points[0]]
+            closed = False
+    if len(points) > 1:
+        polylines.append([points, closed])
+    return polylines
+
+
+def flatten_paths(paths, tolerance):
+    """
+    Converts sk2 paths into list of polylines [points, closed_flag].
+    """
+    polylines = []
+    for path in paths:
+        start = tuple(path[0])
+        points = [start]
+        for point in path[1]:
+            if len(point) == 2:
+                points.append(tuple(point))
+            else:
+                points += flatten_bezier(points[-1], point[0], point[1],
+                                         point[2], tolerance)
+        polylines.append([points, bool(path[2])])
+    return polylines
+
+
+def get_points_bbox(points):
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def split_polyline(points, closed):
+    """
+    Splits polyline into chunks with cached bboxes.
+    Closed polylines get closing segment.
+    """
+    if closed and not points[0] == points[-1]:
+        points = points + [points[0]]
+    chunks = []
+    for i in range(0, max(len(points) - 1, 1), CHUNK_SIZE):
+        chunk = points[i:i + CHUNK_SIZE + 1]
+        chunks.append((get_points_bbox(chunk), chunk))
+    return chunks
+
+
+def get_segment_distance(point, start, end):
+    px, py = point
+    x0, y0 = start
+    x1, y1 = end
+    dx = x1 - x0
+    dy = y1 - y0
+    length = dx * dx + dy * dy
+    t = 0.0
+    if length:
+        t = ((px - x0) * dx + (py - y0) * dy) / length
+        t = min(max(t, 0.0), 1.0)
+    x = x0 + t * dx - px
+    y = y0 + t * dy - py
+    return math.sqrt(x * x + y * y)
+
+
+def is_point_in_chunk_range(point, bbox, distance):
+    x, y = point
+    return bbox[0] - distance <= x <= bbox[2] + distance and \
+        bbox[1] - distance <= y <= bbox[3] + distance
+
+
+class HitShape:
+    """
+    Flattened object outline with per-chunk bboxes.
+    """
+    fill_chunks = None
+    stroke_chunks = None
+
+    def __init__(self, polylines, closed_only=False):
+        self.fill_chunks = []
+        self.stroke_chunks = []
+        for points, closed in polylines:
+            if not points:
+                continue
+            self.stroke_chunks += split_polyline(points, closed)
+            if closed or not closed_only:
+                self.fill_chunks += split_polyline(points, True)
+
+    def get_winding(self, point):
+        """
+        Returns winding number and crossing count of ray
+        from point to the right.
+        """
+        px, py = point
+        winding = crossings = 0
+        for bbox, chunk in self.fill_chunks:
+            if bbox[2] < px or py < bbox[1] or py > bbox[3]:
+                continue
+            for i in range(len(chunk) - 1):
+                x0, y0 = chunk[i]
+                x1, y1 = chunk[i + 1]
+                if y0 <= py < y1 or y1 <= py < y0:
+                    x = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+                    if x > px:
+                        crossings += 1
+                        winding += 1 if y1 > y0 else -1
+        return winding, crossings
+
+    def is_point_into(self, point, evenodd=True):
+        winding, crossings = self.get_winding(point)
+        if evenodd:
+            return bool(crossings % 2)
+        return bool(winding)
+
+    def is_point_on(self, point, distance):
+        for bbox, chunk in self.stroke_chunks:
+            if not is_point_in_chunk_range(point, bbox, distance):
+                continue
+            for i in range(len(chunk) - 1):
+                if get_segment_distance(point, chunk[i],
+                                        chunk[i + 1]) <= distance:
+                    return True
+        return False
+
+
+class HitTestEngine:
+    """
+    Geometric hit-test engine. Object outlines are flattened into
+    polylines and cached per object until object path is changed.
+    Filling is checked by winding number, stroke - by distance
+    from point to outline.
+    """
+    canvas = None
+    cache = None
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.cache = {}
+
+    def destroy(self):
+        items = self.__dict__.keys()
+        for item in items:
+            self.__dict__[item] = None
+
+    def clear(self):
+        self.cache = {}
+
+    def get_tolerance(self):
+        # flattening error less than quarter of pixel on current zoom level
+        level = math.floor(math.log(self.canvas.zoom, 2))
+        return 0.25 / math.pow(2.0, level), level
+
+    def _get_shape(self, obj, cpath, tag=0, closed_only=False):
+        tolerance, level = self.get_tolerance()
+        key = (id(obj), tag)
+        entry = self.cache.get(key)
+        if entry is None or entry[0] is not cpath or \
+                not entry[1] == (level, closed_only):
+            if len(self.cache) > config.hit_cache_size:
+                self.cache = {}
+            polylines = flatten_cpath(cpath, tolerance)
+            shape = HitShape(polylines, closed_only)
+            entry = (cpath, (level, closed_only), shape)
+            self.cache[key] = entry
+        return entry[2]
+
+    def get_pixel_radius(self):
+        return 0.5 / self.canvas.zoom
+
+    def is_point_into_object(self, win_point, obj, fill_anyway=False):
+        point = self.canvas.win_to_doc(win_point)
+        return self._check_object(point, obj, fill_anyway)
+
+    def _check_object(self, point, obj, fill_anyway=False):
+        if obj.childs:
+            for child in obj.childs:
+                if self._check_object(point, child):
+                    return True
+            return False
+
+        zoom = self.canvas.zoom
+        radius = self.get_pixel_radius()
+        if obj.is_text:
+            x0, y0, x1, y1 = obj.cache_bbox
+            return x0 - radius <= point[0] <= x1 + radius and \
+                y0 - radius <= point[1] <= y1 + radius
+
+        fill = obj.style[0]
+        closed_only = bool(fill and fill[0] & sk2const.FILL_CLOSED_ONLY)
+        evenodd = bool(fill[0] & sk2const.FILL_EVENODD) if fill else True
+        shape = self._get_shape(obj, obj.cache_cpath, 0, closed_only)
+        if obj.is_pixmap:
+            fill_anyway = True
+        if (not self.canvas.stroke_view and fill) or fill_anyway:
+            if shape.is_point_into(point, evenodd):
+                return True
+        stroke = obj.style[1]
+        if stroke:
+            width = max(stroke[1], config.stroke_sensitive_size / zoom)
+            if shape.is_point_on(point, width / 2.0 + radius):
+                return True
+            if obj.cache_arrows:
+                arrows = [item for pair in obj.cache_arrows for item in pair]
+                for index, item in enumerate(arrows):
+                    if item:
+                        arrow = self._get_shape(obj, item, index + 1)
+                        if self.canvas.stroke_view:
+                            if arrow.is_point_on(point, radius):
+                                return True
+                        elif arrow.is_point_into(point, False):
+                            return True
+        return False
+
+    def _get_sensitive_distance(self):
+        return config.stroke_sensitive_size / (2.0 * self.canvas.zoom) + \
+            self.get_pixel_radius()
+
+    def is_point_on_path(self, win_point, path):
+        point = self.canvas.win_to_doc(win_point)
+        tolerance = self.get_tolerance()[0]
+        shape = HitShape(flatten_paths([path, ], tolerance))
+        return shape.is_point_on(point, self._get_sensitive_distance())
+
+    def is_point_on_segment(self, win_point, start_point, end_point):
+        point = self.canvas.win_to_doc(win_point)
+        if len(start_point) > 2:
+            start_point = start_point[2]
+        path = [start_point, [end_point, ], False]
+        tolerance = self.get_tolerance()[0]
+        shape = HitShape(flatten_paths([path, ], tolerance))
+        return shape.is_point_on(point, self._get_sensitive_distance())
+
+    def get_t_parameter(self, win_point, start, end):
+        """
+        Returns bezier curve parameter of the nearest to point
+        curve position or None if point is not over the curve.
+        """
+        point = self.canvas.win_to_doc(win_point)
+        if len(start) > 2:
+            start = start[2]
+        p1, p2, p3 = end[:3]
+
+        def get_distance(t):
+            x, y = get_bezier_point(start, p1, p2, p3, t)
+            return math.hypot(x - point[0], y - point[1])
+
+        dt = 1.0 / SAMPLE_NUM
+        t = min([i * dt for i in range(SAMPLE_NUM + 1)], key=get_distance)
+        t0, t1 = max(t - dt, 0.0), min(t + dt, 1.0)
+        while t1 - t0 > 1e-6:
+            ta = t0 + (t1 - t0) / 3.0
+            tb = t1 - (t1 - t0) / 3.0
+            if get_distance(ta) < get_distance(tb):
+                t1 = tb
+            else:
+                t0 = ta
+        t = (t0 + t1) / 2.0
+        distance = self._get_sensitive_distance() + self.get_tolerance()[0]
+        if get_distance(t) <= distance:
+            return t
+        return None
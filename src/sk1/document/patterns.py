@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import cairo
+import math
+from collections import OrderedDict
+
+CACHE_SIZE = 32
+
+
+def make_checker():
+    """
+    Returns 2x2 A8 surface of one checkerboard period, squares
+    of same column and row parity are marked.
+    """
+    surface = cairo.ImageSurface(cairo.FORMAT_A8, 2, 2)
+    ctx = cairo.Context(surface)
+    ctx.rectangle(0.0, 0.0, 1.0, 1.0)
+    ctx.rectangle(1.0, 1.0, 1.0, 1.0)
+    ctx.set_source_rgba(0.0, 0.0, 0.0, 1.0)
+    ctx.fill()
+    return surface
+
+
+def make_lines(length, phase, step, major, color, vertical):
+    """
+    Returns one pixel thick ARGB strip of grid lines placed at
+    phase + i * step. Each fifth line starting from major index
+    is stroked twice as on direct grid painting.
+    """
+    if vertical:
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, length, 1)
+    else:
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, length)
+    ctx = cairo.Context(surface)
+    ctx.set_antialias(cairo.ANTIALIAS_NONE)
+    ctx.set_line_width(1.0)
+    ctx.set_source_rgba(*color)
+    positions = []
+    pos = phase
+    while pos < length + 1.0:
+        positions.append(pos)
+        pos = phase + len(positions) * step
+    majors = []
+    if major is not None:
+        majors = [pos for i, pos in enumerate(positions)
+                  if not (i - major) % 5]
+    for items in (positions, majors):
+        if not items:
+            continue
+        for pos in items:
+            if vertical:
+                ctx.move_to(pos, 0.0)
+                ctx.line_to(pos, 1.0)
+            else:
+                ctx.move_to(0.0, pos)
+                ctx.line_to(1.0, pos)
+        ctx.stroke()
+    return surface
+
+
+def make_pattern(surface):
+    pattern = cairo.SurfacePattern(surface)
+    pattern.set_extend(cairo.EXTEND_REPEAT)
+    pattern.set_filter(cairo.FILTER_NEAREST)
+    return pattern
+
+
+class PatternCache:
+    """
+    Cache of repeating patterns for page background and grid.
+    Grid is painted by two patterns of one pixel thick line strips,
+    checkerboard - by solid fill masked with one period pattern
+    scaled to document squares. So repaint costs a few pattern
+    fills regardless of viewport size and zoom.
+
+    Strips are rasterized with exact line positions instead of
+    tiling one grid period because zoomed period is fractional
+    in most cases and integer sized tile drifts from snapping grid.
+    Line strips are keyed by fractional origin phase, so canvas
+    scrolling reuses them shifted by integer offset.
+    """
+    items = None
+
+    def __init__(self):
+        self.items = OrderedDict()
+
+    def destroy(self):
+        items = self.__dict__.keys()
+        for item in items:
+            self.__dict__[item] = None
+
+    def clear(self):
+        self.items = OrderedDict()
+
+    def _get(self, key, factory, *args):
+        if key in self.items:
+            value = self.items.pop(key)
+        else:
+            value = factory(*args)
+        self.items[key] = value
+        while len(self.items) > CACHE_SIZE:
+            self.items.popitem(last=False)
+        return value
+
+    def get_grid_pattern(self, vertical, length, start, step, major, color):
+        """
+        Returns grid lines pattern and integer offset of it.
+        Pattern should be painted starting from max(offset, 0)
+        along lines strip.
+        """
+        # one pixel margin keeps line rasterized before phase
+        offset = math.floor(start) - 1.0
+        phase = round(start - offset, 3)
+        length = length + int(math.ceil(step)) + 2
+        if major is not None:
+            major = int(major) % 5
+        key = ('grid', vertical, length, phase, step, major, tuple(color))
+        pattern = self._get(key, self._make_grid_pattern, length,
+                            phase, step, major, color, vertical)
+        if vertical:
+            pattern.set_matrix(cairo.Matrix(1.0, 0.0, 0.0, 1.0, -offset, 0.0))
+        else:
+            pattern.set_matrix(cairo.Matrix(1.0, 0.0, 0.0, 1.0, 0.0, -offset))
+        return pattern, offset
+
+    def _make_grid_pattern(self, length, phase, step, major, color, vertical):
+        return make_pattern(make_lines(length, phase, step, major,
+                                       color, vertical))
+
+    def get_checker_pattern(self, origin, step):
+        """
+        Returns checkerboard mask pattern in document space. Squares
+        are [origin + i * step, origin + (i + 1) * step] along both
+        axes and marked when column and row have same parity.
+        Nearest filter samples pattern in pixel centers, so pixel
+        coverage matches per-square filling without antialiasing.
+        """
+        pattern = self._get(('checker',), self._make_checker_pattern)
+        pattern.set_matrix(cairo.Matrix(1.0 / step, 0.0, 0.0, 1.0 / step,
+                                        -origin[0] / step,
+                                        -origin[1] / step))
+        return pattern
+
+    def _make_checker_pattern(self):
+        return make_pattern(make_checker())
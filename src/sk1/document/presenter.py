@@ -17,9 +17,13 @@
 
 import logging
 import os
+import sys
 from copy import deepcopy
+from cStringIO import StringIO
 
 from sk1 import _, events, modes
+from sk1.app_io import IOJob, get_snapshot, is_model_saver, \
+    read_file
 from sk1.dialogs import ProgressDialog
 from sk1.document.api import PresenterAPI
 from sk1.document.eventloop import EventLoop
@@ -49,6 +53,8 @@ class SK1Presenter:
     active_layer = None
 
     saved = True
+    io_job = None
+    loading = False
 
     eventloop = None
     canvas = None
@@ -57,7 +63,8 @@ class SK1Presenter:
     snap = None
     text_obj_style = None
 
-    def __init__(self, app, doc_file='', silent=False, template=False):
+    def __init__(self, app, doc_file='', silent=False, template=False,
+                 background=False):
         self.app = app
 
         self.eventloop = EventLoop(self)
@@ -69,7 +76,13 @@ class SK1Presenter:
             if not loader:
                 raise IOError(_('Loader is not found for <%s>') % doc_file)
 
-        if loader and silent:
+        if loader and background:
+            # placeholder till load() is finished
+            self.doc_presenter = SK2_Presenter(app.appdata)
+            ext = uc2const.FORMAT_EXTENSION[uc2const.SK2][0]
+            self.doc_name = change_file_extension(os.path.basename(doc_file),
+                                                  ext)
+        elif loader and silent:
             self.doc_presenter = loader(app.appdata, doc_file)
         elif doc_file and not silent:
             pd = ProgressDialog(_('Opening file...'), self.app.mw)
@@ -114,6 +127,8 @@ class SK1Presenter:
     def set_title(self):
         title = self.doc_name
         title = title + '*' if not self.saved else title
+        if self.io_job is not None:
+            title += ' [%d%%]' % int(round(self.io_job.progress * 100.0))
         self.app.mdi.set_tab_title(self, title)
         if self == self.app.current_doc:
             self.app.mw.set_title(title)
@@ -126,21 +141,178 @@ class SK1Presenter:
             self.doc_name = os.path.basename(self.doc_file)
         self.set_title()
 
-    def save(self):
-        pd = ProgressDialog(_('Saving file...'), self.app.mw)
-        try:
-            saver = get_saver(self.doc_file)
-            if saver is None:
-                msg = _('Unknown file format is requested for saving <%s>')
-                raise IOError(msg % self.doc_file)
-            pd.run(saver, [self.doc_presenter, self.doc_file])
-        except Exception:
-            raise
-        finally:
-            pd.destroy()
-        self.reflect_saving()
-
-    def save_selected(self, doc_file):
+    def run_job(self, func, args, msg, callback=None):
+        """
+        Runs loader or saver under progress dialog. If callback
+        is provided, job is run in background with progress shown
+        in document tab and callback(job) is called on finish.
+        """
+        self.wait_job()
+        if callback is None:
+            pd = ProgressDialog(msg, self.app.mw)
+            try:
+                return pd.run(func, args)
+            finally:
+                pd.destroy()
+
+        def on_done(job):
+            self.io_job = None
+            self.set_title()
+            callback(job)
+
+        self.io_job = IOJob(func, args, on_done, self.on_job_progress)
+        self.app.io.start(self.io_job)
+        self.set_title()
+
+    def on_job_progress(self, job):
+        self.set_title()
+
+    def wait_job(self):
+        if self.io_job is not None:
+            self.app.io.wait(self.io_job)
+
+    def read_job(self, loader, doc_file, msg, callback):
+        """
+        Reads file in background, then document is built from read
+        data in UI thread (loaders lay out text by pango which is not
+        thread-safe). callback(job) is called with loaded document
+        presenter as job.result.
+        """
+        def on_done(job):
+            if job.error is None:
+                try:
+                    args = [self.app.appdata, None, StringIO(job.result)]
+                    job.result = self.run_job(loader, args, msg)
+                except Exception:
+                    job.error = sys.exc_info()
+                    job.result = None
+            if job.error is None and not job.result:
+                LOG.error('Cannot load <%s>', doc_file)
+                job.error = (IOError, IOError(_('Cannot load <%s>') %
+                                              doc_file), None)
+            if job.error is None:
+                job.result.doc_file = doc_file
+            callback(job)
+
+        self.run_job(read_file, [doc_file], '', on_done)
+
+    def load(self, doc_file, callback):
+        """
+        Loads document in background. Empty document is shown in
+        WAIT_MODE meanwhile, then its model is replaced by loaded
+        one and callback(doc, job) is called.
+        """
+        loader = get_loader(doc_file)
+        if not loader:
+            raise IOError(_('Loader is not found for <%s>') % doc_file)
+        self.loading = True
+
+        def on_done(job):
+            self.loading = False
+            self.canvas.restore_mode()
+            if job.error is None:
+                self.set_doc_presenter(job.result)
+                self.set_doc_file(job.result.doc_file, self.doc_name)
+            callback(self, job)
+
+        self.read_job(loader, doc_file, _('Opening file...'), on_done)
+        self.canvas.set_temp_mode(modes.WAIT_MODE, self.cancel_loading)
+
+    def cancel_loading(self):
+        if self.loading:
+            self.app.close(self)
+
+    def set_doc_presenter(self, doc_presenter):
+        """
+        Replaces document model by loaded one.
+        """
+        old_presenter = self.doc_presenter
+        self.doc_presenter = doc_presenter
+        self.methods = doc_presenter.methods
+        self.model = doc_presenter.model
+        self.cms = doc_presenter.cms
+        self.selection.objs = []
+        self.set_active_page()
+
+        self.api.methods = self.methods
+        self.api.model = self.model
+        self.api.sk2_cfg = doc_presenter.config
+        self.api.undo = self.api._clear_history_stack(self.api.undo)
+        self.api.redo = self.api._clear_history_stack(self.api.redo)
+        self.snap.doc = doc_presenter
+        self.snap.methods = self.methods
+        self.canvas.doc = self.model
+        self.canvas.matrix = None
+        self.saved = True
+        old_presenter.close()
+        self.selection.update()
+        self.eventloop.emit(self.eventloop.PAGE_CHANGED)
+        if self == self.app.current_doc:
+            events.emit(events.DOC_CHANGED, self)
+
+    def save(self, callback=None):
+        """
+        Saves document. With callback, saver works in background
+        on model snapshot and callback(job) is called on finish.
+        If saving cannot run in background, document is saved
+        in foreground and callback(None) is called.
+        """
+        saver = get_saver(self.doc_file)
+        if saver is None:
+            msg = _('Unknown file format is requested for saving <%s>')
+            raise IOError(msg % self.doc_file)
+        if callback is None:
+            self.run_job(saver, [self.doc_presenter, self.doc_file],
+                         _('Saving file...'))
+            self.reflect_saving()
+            return
+
+        mark = self.api.undo[-1] if self.api.undo else None
+
+        def on_done(job):
+            if job.error is None:
+                self.reflect_snapshot_saving(mark)
+            callback(job)
+
+        if not self.run_saver(saver, self.doc_file, _('Saving file...'),
+                              on_done):
+            self.reflect_saving()
+            callback(None)
+
+    def run_saver(self, saver, doc_file, msg, callback):
+        """
+        Runs saver in background on model snapshot if saver only
+        serializes model. Rendering savers (pango and cairo are not
+        thread-safe) and model which cannot be copied are processed
+        in foreground, False is returned then.
+        """
+        snapshot = None
+        if is_model_saver(doc_file):
+            try:
+                snapshot = get_snapshot(self.doc_presenter)
+            except Exception:
+                LOG.warn('Cannot make document snapshot, '
+                         'saving in foreground')
+        if snapshot is None:
+            self.run_job(saver, [self.doc_presenter, doc_file], msg)
+            return False
+        self.run_job(saver, [snapshot, doc_file], '', callback)
+        return True
+
+    def reflect_snapshot_saving(self, mark):
+        """
+        Marks saved state of snapshot taken when undo stack top
+        was mark. Document is saved if it is not modified since.
+        """
+        top = self.api.undo[-1] if self.api.undo else None
+        if top is mark:
+            self.reflect_saving()
+            return
+        for item in self.api.undo + self.api.redo:
+            item[2] = item is mark
+        self.api.undo_marked = mark is not None
+
+    def save_selected(self, doc_file, callback=None):
         doc = SK2_Presenter(self.app.appdata)
         origin = self.doc_presenter.model.doc_origin
         doc.methods.set_doc_origin(origin)
@@ -155,20 +327,32 @@ class SK1Presenter:
         layer = doc.methods.get_layer(page)
         layer.childs = objs
 
-        pd = ProgressDialog(_('Saving file...'), self.app.mw)
-        try:
-            saver = get_saver(doc_file)
-            if saver is None:
-                msg = _('Unknown file format is requested for saving <%s>')
-                raise IOError(msg % doc_file)
-            pd.run(saver, [doc, doc_file])
-        except Exception:
-            raise
-        finally:
-            pd.destroy()
+        saver = get_saver(doc_file)
+        if saver is None:
+            doc.close()
+            msg = _('Unknown file format is requested for saving <%s>')
+            raise IOError(msg % doc_file)
+        if callback is None or not is_model_saver(doc_file):
+            try:
+                self.run_job(saver, [doc, doc_file], _('Saving file...'))
+            finally:
+                doc.close()
+            if callback is not None:
+                callback(None)
+            return
+
+        def on_done(job):
             doc.close()
+            callback(job)
+
+        self.run_job(saver, [doc, doc_file], '', on_done)
 
     def close(self):
+        if self.io_job is not None:
+            if self.loading:
+                self.io_job.cancel()
+            else:
+                self.wait_job()
         # self.app.default_cms.unregistry_cm(self.cms)
         self.eventloop.destroy()
         self.api.destroy()
@@ -181,23 +365,32 @@ class SK1Presenter:
         for item in items:
             self.__dict__[item] = None
 
-    def import_file(self, doc_file):
-        retval = True
-
-        pd = ProgressDialog(_('Importing...'), self.app.mw)
-        try:
-            loader = get_loader(doc_file)
-            if not loader:
-                raise IOError(_('Loader is not found for <%s>') % doc_file)
-            doc_presenter = pd.run(loader, [self.app.appdata, doc_file])
+    def import_file(self, doc_file, callback=None):
+        """
+        Imports graphics from file. With callback, file is read in
+        background and callback(retval, job) is called on finish.
+        """
+        loader = get_loader(doc_file)
+        if not loader:
+            raise IOError(_('Loader is not found for <%s>') % doc_file)
+        args = [self.app.appdata, doc_file]
+        if callback is None:
+            doc_presenter = self.run_job(loader, args, _('Importing...'))
             if not doc_presenter:
                 LOG.error('Cannot load <%s>', doc_file)
                 raise IOError(_('Cannot load <%s>') % doc_file)
-        except Exception:
-            raise
-        finally:
-            pd.destroy()
+            return self.insert_doc(doc_presenter)
 
+        def on_done(job):
+            retval = False
+            if job.error is None:
+                retval = self.insert_doc(job.result)
+            callback(retval, job)
+
+        self.read_job(loader, doc_file, _('Importing...'), on_done)
+
+    def insert_doc(self, doc_presenter):
+        retval = True
         pages = doc_presenter.methods.get_pages()
         if len(pages) == 1:
             page = doc_presenter.methods.get_page()
@@ -221,18 +414,17 @@ class SK1Presenter:
         doc_presenter.close()
         return retval
 
-    def export_as(self, doc_file):
-        pd = ProgressDialog(_('Exporting...'), self.app.mw)
-        try:
-            saver = get_saver(doc_file)
-            if saver is None:
-                msg = _('Unknown file format is requested for export <%s>')
-                raise IOError(msg % doc_file)
-            pd.run(saver, [self.doc_presenter, doc_file])
-        except Exception:
-            raise
-        finally:
-            pd.destroy()
+    def export_as(self, doc_file, callback=None):
+        saver = get_saver(doc_file)
+        if saver is None:
+            msg = _('Unknown file format is requested for export <%s>')
+            raise IOError(msg % doc_file)
+        if callback is None:
+            self.run_job(saver, [self.doc_presenter, doc_file],
+                         _('Exporting...'))
+        elif not self.run_saver(saver, doc_file, _('Exporting...'),
+                                callback):
+            callback(None)
 
     def modified(self, *args):
         self.saved = False
@@ -20,6 +20,8 @@ import math
 from copy import deepcopy
 
 from sk1 import config
+from sk1.document.patterns import PatternCache
+from sk1.document.tilecache import TileCache, get_paint_bbox
 from uc2 import libcairo, libgeom
 from uc2 import uc2const, sk2const
 from uc2.formats.sk2.crenderer import CairoRenderer
@@ -41,6 +43,19 @@ class PDRenderer(CairoRenderer):
     doc_methods = None
     for_display = True
     temp_surface = None
+    back_surface = None
+    surface_trafo = None
+    pending = False
+    tile_cache = None
+    pattern_cache = None
+    cull_bbox = None
+    cull_stats = None
+    skip_ids = None
+    drag_surface = None
+    drag_objs = []
+    drag_frame = []
+    drawing_surface = None
+    drawing_paths = None
 
     frame = []
     snap = []
@@ -53,8 +68,13 @@ class PDRenderer(CairoRenderer):
         CairoRenderer.__init__(self, cms)
         self.canvas = canvas
         self.direct_matrix = cairo.Matrix(1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+        self.tile_cache = TileCache(canvas)
+        self.pattern_cache = PatternCache()
+        self.cull_stats = [0, 0]
 
     def destroy(self):
+        self.tile_cache.destroy()
+        self.pattern_cache.destroy()
         items = self.__dict__.keys()
         for item in items:
             self.__dict__[item] = None
@@ -121,23 +141,77 @@ class PDRenderer(CairoRenderer):
         self.presenter = self.canvas.presenter
         self.doc_methods = self.presenter.methods
         self.cms = self.presenter.cms
-        self.start()
-        self.paint_page()
-        self.render_doc()
-        self.render_grid()
-        self.render_guides()
-
-    def start(self):
+        profiler = self.canvas.profiler
+        self.cull_stats = [0, 0]
+        self.drawing_surface = None
+        progressive = config.canvas_tile_cache and \
+            config.canvas_progressive and \
+            (self.pending or not self.surface_trafo == self.canvas.trafo)
+        with profiler.phase('start'):
+            self.start(progressive)
+        if profiler.frame is not None:
+            # render_doc runs per tile, so objects are counted per frame
+            for layer in self.presenter.active_page.childs:
+                if layer.properties[0]:
+                    profiler.count('objects', len(layer.childs))
+        if config.canvas_tile_cache:
+            budget = worker = None
+            if progressive:
+                budget = config.canvas_render_budget / 1000.0
+                worker = self.canvas.get_render_worker()
+            with profiler.phase('tiles'):
+                self.pending = not self.tile_cache.paint(
+                    self, self.ctx, self.width, self.height, budget, worker)
+        else:
+            self.pending = False
+            with profiler.phase('paint_page'):
+                self.paint_page()
+            with profiler.phase('render_doc'):
+                self.render_doc()
+        with profiler.phase('render_grid'):
+            self.render_grid()
+        with profiler.phase('render_guides'):
+            self.render_guides()
+
+    def start(self, progressive=False):
+        """
+        Prepares document surface. Surfaces of current and previous
+        frames are swapped, so on progressive rendering previous
+        frame is kept as placeholder of not rendered yet area.
+        """
         self.set_point_data()
         w, h = self.canvas.dc.get_size()
-        if self.surface is None or self.width != w or self.height != h:
-            self.surface = cairo.ImageSurface(cairo.FORMAT_RGB24, w, h)
-            self.width, self.height = w, h
+        previous = self.surface
+        surface = self.back_surface
+        if surface is None or not surface.get_width() == w or \
+                not surface.get_height() == h:
+            surface = cairo.ImageSurface(cairo.FORMAT_RGB24, w, h)
+        self.surface, self.back_surface = surface, previous
+        self.width, self.height = w, h
         self.ctx = cairo.Context(self.surface)
         self.ctx.set_source_rgb(*self.doc_methods.get_desktop_bg())
         self.ctx.paint()
+        if progressive and previous is not None and self.surface_trafo:
+            self.paint_preview(previous, self.surface_trafo)
+        self.surface_trafo = [] + self.canvas.trafo
         self.ctx.set_matrix(self.canvas.matrix)
 
+    def paint_preview(self, surface, trafo):
+        """
+        Paints previous frame scaled and translated to current view.
+        """
+        m11, m12, m21, m22, dx, dy = self.canvas.trafo
+        sx = m11 / trafo[0]
+        sy = m22 / trafo[3]
+        self.ctx.save()
+        self.ctx.set_matrix(cairo.Matrix(sx, 0.0, 0.0, sy,
+                                         dx - sx * trafo[4],
+                                         dy - sy * trafo[5]))
+        self.ctx.set_source_surface(surface, 0, 0)
+        self.ctx.get_source().set_filter(cairo.FILTER_FAST)
+        self.ctx.paint()
+        self.ctx.restore()
+
     def finalize(self):
         self.canvas.dc.draw_surface(self.temp_surface, 0, 0, False)
 
@@ -178,21 +252,13 @@ class PDRenderer(CairoRenderer):
             self.ctx.fill()
 
             self.ctx.set_source_rgb(*page_fill[1][0])
-
-            ypos = ystart = -h / 2.0 - sy
-            j = 0
-            while ypos < h / 2.0:
-                ypos = ystart + j * dx
-                xpos = xstart = -w / 2.0 - sx
-                i = 0
-                if j % 2:
-                    xpos = xstart = -w / 2.0 + dx - sx
-                while xpos < w / 2.0:
-                    xpos = xstart + i * dx * 2.0
-                    self.ctx.rectangle(xpos, ypos, dx, dx)
-                    self.ctx.fill()
-                    i += 1
-                j += 1
+            matrix = self.ctx.get_matrix()
+            if matrix[1] or matrix[2]:
+                self._paint_checker_squares(w, h, sx, sy, dx)
+            else:
+                origin = (-w / 2.0 - sx, -h / 2.0 - sy)
+                pattern = self.pattern_cache.get_checker_pattern(origin, dx)
+                self.ctx.mask(pattern)
             self.ctx.restore()
 
         if border:
@@ -201,7 +267,39 @@ class PDRenderer(CairoRenderer):
             self.ctx.stroke()
         self.ctx.set_antialias(cairo.ANTIALIAS_DEFAULT)
 
-    def render_doc(self):
+    def _paint_checker_squares(self, w, h, sx, sy, dx):
+        ypos = ystart = -h / 2.0 - sy
+        j = 0
+        while ypos < h / 2.0:
+            ypos = ystart + j * dx
+            xpos = xstart = -w / 2.0 - sx
+            i = 0
+            if j % 2:
+                xpos = xstart = -w / 2.0 + dx - sx
+            while xpos < w / 2.0:
+                xpos = xstart + i * dx * 2.0
+                self.ctx.rectangle(xpos, ypos, dx, dx)
+                self.ctx.fill()
+                i += 1
+            j += 1
+
+    def get_visible_bbox(self):
+        """
+        Returns document rect of canvas viewport enlarged
+        by one pixel against antialiasing bleed.
+        """
+        x0, y0 = self.canvas.win_to_doc([0.0, 0.0])
+        x1, y1 = self.canvas.win_to_doc([self.width, self.height])
+        offset = 1.0 / self.canvas.zoom
+        return [min(x0, x1) - offset, min(y0, y1) - offset,
+                max(x0, x1) + offset, max(y0, y1) + offset]
+
+    def render_doc(self, bbox=None, layers=None):
+        """
+        Renders visible layers of active page. Objects outside
+        of bbox (viewport by default) are skipped. Layers can be
+        provided as snapshot list of (layer, childs) pairs.
+        """
         if self.canvas.draft_view:
             self.antialias_flag = False
         else:
@@ -212,18 +310,55 @@ class PDRenderer(CairoRenderer):
         else:
             self.contour_flag = False
 
-        page = self.presenter.active_page
-        for layer in page.childs:
-            if layer.properties[0]:
-                if self.canvas.stroke_view:
-                    self.stroke_style = deepcopy(layer.style)
-                    stroke = self.stroke_style[1]
-                    stroke[1] = 1.0 / self.canvas.zoom
-                if not layer.properties[3] and not self.canvas.draft_view:
-                    self.antialias_flag = False
-                self.render(self.ctx, layer.childs)
-                if not layer.properties[3] and not self.canvas.draft_view:
-                    self.antialias_flag = True
+        if config.canvas_culling:
+            self.cull_bbox = bbox or self.get_visible_bbox()
+        if layers is None:
+            page = self.presenter.active_page
+            layers = [(layer, layer.childs) for layer in page.childs]
+        try:
+            for layer, childs in layers:
+                if layer.properties[0]:
+                    if self.canvas.stroke_view:
+                        self.stroke_style = deepcopy(layer.style)
+                        stroke = self.stroke_style[1]
+                        stroke[1] = 1.0 / self.canvas.zoom
+                    if not layer.properties[3] and not self.canvas.draft_view:
+                        self.antialias_flag = False
+                    self.render(self.ctx, childs)
+                    if not layer.properties[3] and not self.canvas.draft_view:
+                        self.antialias_flag = True
+        finally:
+            self.cull_bbox = None
+
+    def render(self, ctx, objs=None):
+        """
+        Filters out objects lying outside of cull rect and skipped
+        ones. Groups are rendered recursively through this method,
+        so their children are filtered too.
+        """
+        bbox = self.cull_bbox
+        skip_ids = self.skip_ids
+        if (bbox is None and not skip_ids) or not objs:
+            return CairoRenderer.render(self, ctx, objs)
+        visible = []
+        culled = 0
+        for obj in objs:
+            if skip_ids and id(obj) in skip_ids:
+                continue
+            if bbox is not None:
+                obj_bbox = get_paint_bbox(obj)
+                if obj_bbox and not libgeom.is_bbox_overlap(obj_bbox, bbox):
+                    culled += 1
+                    continue
+            visible.append(obj)
+        if bbox is not None:
+            self.cull_stats[0] += len(visible)
+            self.cull_stats[1] += culled
+            profiler = self.canvas.profiler
+            profiler.count('drawn', len(visible))
+            profiler.count('culled', culled)
+        if visible:
+            CairoRenderer.render(self, ctx, visible)
 
     # ------GUIDES RENDERING
 
@@ -290,49 +425,39 @@ class PDRenderer(CairoRenderer):
 
         self.ctx.set_matrix(self.direct_matrix)
         self.ctx.set_antialias(cairo.ANTIALIAS_NONE)
-        self.ctx.set_source_rgba(*grid_layer.color)
-        self.ctx.set_line_width(1.0)
-        self.ctx.set_dash(())
 
         x, y, gdx, gdy = grid_layer.grid
         x0, y0, dx, dy, sx, sy = self.calc_grid(x, y, gdx, gdy)
+        color = grid_layer.color
+
+        major = None
+        if dx == gdx * self.canvas.zoom:
+            major = round((x0 - sx) / dx)
+        pattern, offset = self.pattern_cache.get_grid_pattern(
+            True, self.width, sx, dx, major, color)
+        self.ctx.set_source(pattern)
+        self.ctx.rectangle(max(offset, 0.0), 0, self.width, self.height)
+        self.ctx.fill()
 
-        i = pos = 0
-        nul_i = round((x0 - sx) / dx)
-        while pos < self.width:
-            pos = sx + i * dx
-            i += 1
-            self.ctx.move_to(pos, 0)
-            self.ctx.line_to(pos, self.height)
-            self.ctx.stroke()
-            if dx == gdx * self.canvas.zoom and not (i - nul_i - 1) % 5:
-                self.ctx.move_to(pos, 0)
-                self.ctx.line_to(pos, self.height)
-                self.ctx.stroke()
-
-        i = pos = 0
-        nul_i = round((y0 - sy) / dy)
-        while pos < self.height:
-            pos = sy + i * dy
-            i += 1
-            self.ctx.move_to(0, pos)
-            self.ctx.line_to(self.width, pos)
-            self.ctx.stroke()
-            if dy == gdy * self.canvas.zoom and not (i - nul_i - 1) % 5:
-                self.ctx.move_to(0, pos)
-                self.ctx.line_to(self.width, pos)
-                self.ctx.stroke()
+        major = None
+        if dy == gdy * self.canvas.zoom:
+            major = round((y0 - sy) / dy)
+        pattern, offset = self.pattern_cache.get_grid_pattern(
+            False, self.height, sy, dy, major, color)
+        self.ctx.set_source(pattern)
+        self.ctx.rectangle(0, max(offset, 0.0), self.width, self.height)
+        self.ctx.fill()
 
         self.ctx.set_antialias(cairo.ANTIALIAS_DEFAULT)
 
     # ------MARKER RENDERING
 
-    def start_soft_repaint(self):
+    def start_soft_repaint(self, surface=None):
         self.temp_surface = cairo.ImageSurface(cairo.FORMAT_RGB24,
                                                int(self.canvas.width),
                                                int(self.canvas.height))
         self.ctx = cairo.Context(self.temp_surface)
-        self.ctx.set_source_surface(self.surface)
+        self.ctx.set_source_surface(surface or self.surface)
         self.ctx.paint()
 
     def end_soft_repaint(self):
@@ -588,6 +713,112 @@ class PDRenderer(CairoRenderer):
         self._paint_selection()
         self.end_soft_repaint()
 
+    # ------LIVE DRAG RENDERING
+
+    def start_live_drag(self):
+        """
+        Renders canvas content except selected objects into background
+        surface. Each drag step composes it with transformed selection.
+        """
+        selection = self.presenter.selection
+        self.drag_objs = [] + selection.objs
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24,
+                                     self.width, self.height)
+        ctx = cairo.Context(surface)
+        ctx.set_source_rgb(*self.doc_methods.get_desktop_bg())
+        ctx.paint()
+        ctx.set_matrix(self.canvas.matrix)
+        main_ctx = self.ctx
+        self.ctx = ctx
+        self.skip_ids = set(selection.get_ids())
+        try:
+            self.paint_page()
+            self.render_doc()
+            self.render_grid()
+            self.render_guides()
+        finally:
+            self.ctx = main_ctx
+            self.skip_ids = None
+        self.drag_surface = surface
+        self.drag_frame = self._get_drag_bbox(sk2const.NORMAL_TRAFO)
+
+    def stop_live_drag(self):
+        self.drag_surface = None
+        self.drag_objs = []
+        self.drag_frame = []
+
+    def _get_drag_bbox(self, trafo):
+        bbox = []
+        for obj in self.drag_objs:
+            obj_bbox = get_paint_bbox(obj)
+            if obj_bbox:
+                bbox = libgeom.sum_bbox(bbox, obj_bbox) if bbox else obj_bbox
+        if not bbox:
+            return []
+        cpath = libcairo.convert_bbox_to_cpath(bbox)
+        libcairo.apply_trafo(cpath, trafo)
+        libcairo.apply_trafo(cpath, self.canvas.trafo)
+        x0, y0, x1, y1 = libcairo.get_cpath_bbox(cpath)
+        # margin for antialiasing and selection frame
+        return [int(math.floor(x0)) - 2, int(math.floor(y0)) - 2,
+                int(math.ceil(x1)) + 2, int(math.ceil(y1)) + 2]
+
+    def _render_drag_objs(self, ctx):
+        for obj in self.drag_objs:
+            layer = obj.parent
+            while layer is not None and not layer.is_layer:
+                layer = layer.parent
+            antialias = True
+            if layer is not None:
+                antialias = bool(layer.properties[3])
+                if self.canvas.stroke_view:
+                    self.stroke_style = deepcopy(layer.style)
+                    stroke = self.stroke_style[1]
+                    stroke[1] = 1.0 / self.canvas.zoom
+            self.antialias_flag = antialias and not self.canvas.draft_view
+            self.contour_flag = self.canvas.stroke_view
+            self.render(ctx, [obj, ])
+
+    def cdc_draw_live_drag(self, trafo, copy=False):
+        """
+        Draws selected objects transformed by trafo over cached
+        background. Only area of previous and current drag
+        position is updated.
+        """
+        if self.drag_surface is None:
+            self.start_live_drag()
+        bbox = self._get_drag_bbox(trafo)
+        if not bbox:
+            return
+        frame = libgeom.sum_bbox(bbox, self.drag_frame) \
+            if self.drag_frame else bbox
+        self.drag_frame = bbox
+        x0, y0 = max(frame[0], 0), max(frame[1], 0)
+        x1, y1 = min(frame[2], self.width), min(frame[3], self.height)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, x1 - x0, y1 - y0)
+        ctx = cairo.Context(surface)
+        # on copying source objects stay in place
+        background = self.surface if copy else self.drag_surface
+        ctx.set_source_surface(background, -x0, -y0)
+        ctx.paint()
+        m11, m12, m21, m22, dx, dy = self.canvas.trafo
+        ctx.set_matrix(cairo.Matrix(m11, m12, m21, m22, dx - x0, dy - y0))
+        ctx.transform(libcairo.get_matrix_from_trafo(trafo))
+        self._render_drag_objs(ctx)
+
+        sel_bbox = self.presenter.selection.bbox
+        if sel_bbox:
+            cpath = libcairo.convert_bbox_to_cpath(sel_bbox)
+            libcairo.apply_trafo(cpath, trafo)
+            libcairo.apply_trafo(cpath, self.canvas.trafo)
+            ctx.set_matrix(cairo.Matrix(1.0, 0.0, 0.0, 1.0, -x0, -y0))
+            self._cdc_draw_cpath(ctx, cpath)
+        self.canvas.dc.put_surface(surface, x0, y0, False)
+        self.cdc_reflect_snapping()
+
     # ------DRAWING MARKER RENDERING
 
     def draw_curve_point(self, point, data):
@@ -683,6 +914,106 @@ class PDRenderer(CairoRenderer):
 
         self.end_soft_repaint()
 
+    def _is_drawing_valid(self, paths):
+        if self.drawing_surface is None or \
+                len(paths) < len(self.drawing_paths):
+            return False
+        for path, item in zip(paths, self.drawing_paths):
+            src, start, count, last = item
+            if path is not src or path[0] is not start or \
+                    len(path[1]) - 1 < count:
+                return False
+            if count and path[1][count - 1] is not last:
+                return False
+        return True
+
+    def _draw_segments(self, start, points):
+        self.ctx.move_to(*libgeom.bezier_base_point(start))
+        for point in points:
+            if len(point) == 2:
+                self.ctx.line_to(*point)
+            else:
+                x0, y0 = point[0]
+                x1, y1 = point[1]
+                x2, y2 = point[2]
+                self.ctx.curve_to(x0, y0, x1, y1, x2, y2)
+
+    def _extend_drawing(self, paths):
+        self.ctx = cairo.Context(self.drawing_surface)
+        for index, path in enumerate(paths):
+            if index == len(self.drawing_paths):
+                self.drawing_paths.append([path, path[0], 0, None])
+            item = self.drawing_paths[index]
+            count = len(path[1]) - 1
+            if count <= item[2]:
+                continue
+            points = path[1][item[2]:count]
+            start = path[0] if not item[2] else path[1][item[2] - 1]
+            start = self.canvas.point_doc_to_win(start)
+            points = [self.canvas.point_doc_to_win(point)
+                      for point in points]
+            self._draw_segments(start, points)
+            self.ctx.set_source_rgb(*config.curve_stroke_color)
+            self.ctx.set_line_width(config.curve_stroke_width)
+            self.ctx.stroke()
+            if item[2]:
+                self.draw_curve_point(start, 'curve_point')
+            for point in points:
+                self.draw_curve_point(point, 'curve_point')
+            item[2] = count
+            item[3] = path[1][count - 1]
+
+    def paint_drawing(self, paths, cursor=None):
+        """
+        Paints curve being drawn in document coordinates. Segments
+        up to the last node are accumulated on drawing surface, so
+        each call strokes new segments only.
+        """
+        cursor = cursor or []
+        if not self._is_drawing_valid(paths):
+            self.drawing_surface = cairo.ImageSurface(
+                cairo.FORMAT_RGB24, int(self.canvas.width),
+                int(self.canvas.height))
+            ctx = cairo.Context(self.drawing_surface)
+            ctx.set_source_surface(self.surface)
+            ctx.paint()
+            self.drawing_paths = []
+        self._extend_drawing(paths)
+        self.start_soft_repaint(self.drawing_surface)
+        w = h = config.curve_point_sensitivity_size
+        end_point = None
+        for path in paths:
+            start = self.canvas.doc_to_win(path[0])
+            points = [self.canvas.point_doc_to_win(point)
+                      for point in path[1][-2:]]
+            end_point = start
+            if points:
+                end_point = libgeom.bezier_base_point(points[-1])
+            if points:
+                prev = start if len(points) == 1 else points[0]
+                self._draw_segments(prev, points[-1:])
+            if path[2]:
+                self.ctx.line_to(*start)
+            self.ctx.set_source_rgb(*config.curve_stroke_color)
+            self.ctx.set_line_width(config.curve_stroke_width)
+            self.ctx.stroke()
+
+            if cursor and libgeom.is_point_in_rect2(cursor, start, w, h):
+                self.draw_curve_point(start, 'active_point')
+            else:
+                self.draw_curve_point(start, 'start_point')
+            if len(points) > 1:
+                self.draw_curve_point(points[0], 'curve_point')
+            if points:
+                self.draw_curve_point(points[-1], 'last_point')
+        if cursor and end_point is not None:
+            self.ctx.set_source_rgb(*config.curve_trace_color)
+            self.ctx.set_line_width(config.curve_stroke_width)
+            self.ctx.move_to(*end_point)
+            self.ctx.line_to(*cursor)
+            self.ctx.stroke()
+        self.end_soft_repaint()
+
     def draw_text_frame(self, bbox, trafo):
         cpath = libcairo.convert_bbox_to_cpath(bbox)
         libcairo.apply_trafo(cpath, trafo)
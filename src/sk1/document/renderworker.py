@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import cairo
+import copy
+import logging
+import threading
+
+from sk1.clipboard import CACHE_PREFIX, copy_helpers
+from sk1.document.frameprof import FrameProfiler
+from sk1.document.renderer import PDRenderer
+from sk1.document.tilecache import render_tile
+
+LOG = logging.getLogger(__name__)
+
+
+def snapshot_object(obj):
+    """
+    Returns detached shallow copy of model object with copied
+    childs tree. Object state is replaced (not mutated) on change,
+    so the copy keeps state of snapshot moment while the main thread
+    goes on editing the document. Helper objects (pixmap handler
+    and similar ones) and cache containers can be changed in place,
+    so they are copied too.
+    """
+    snapshot = copy.copy(obj)
+    copy_helpers(snapshot)
+    for key, value in snapshot.__dict__.items():
+        if key.startswith(CACHE_PREFIX) and isinstance(value, (list, dict)):
+            snapshot.__dict__[key] = copy.copy(value)
+    if obj.childs:
+        snapshot.childs = [snapshot_object(child) for child in obj.childs]
+    return snapshot
+
+
+class ViewSnapshot:
+    """
+    Copy of canvas view state taken on job submission. Worker
+    renderer uses it instead of canvas which keeps changing
+    on the main thread.
+    """
+    presenter = None
+    trafo = None
+    matrix = None
+    zoom = 1.0
+    stroke_view = False
+    draft_view = False
+    profiler = None
+
+    def __init__(self, canvas, profiler):
+        self.presenter = canvas.presenter
+        self.trafo = [] + canvas.trafo
+        self.matrix = cairo.Matrix(*self.trafo)
+        self.zoom = canvas.zoom
+        self.stroke_view = canvas.stroke_view
+        self.draft_view = canvas.draft_view
+        self.profiler = profiler
+
+    def doc_to_win(self, point=None):
+        x, y = point or [0.0, 0.0]
+        m11, m12, m21, m22, dx, dy = self.trafo
+        return [m11 * x + dx, m22 * y + dy]
+
+    def point_doc_to_win(self, point=None):
+        point = point or [0.0, 0.0]
+        if len(point) == 2:
+            return self.doc_to_win(point)
+        return [self.doc_to_win(point[0]), self.doc_to_win(point[1]),
+                self.doc_to_win(point[2]), point[3]]
+
+    def win_to_doc(self, point=None):
+        x, y = point or [0.0, 0.0]
+        m11, m12, m21, m22, dx, dy = self.trafo
+        return [(float(x) - dx) / m11, (float(y) - dy) / m22]
+
+
+class TileJob:
+    generation = 0
+    signature = None
+    key = None
+    index = None
+    size = 0
+    bbox = None
+    view = None
+    layers = None
+
+    def __init__(self, generation, signature, key, index, size, bbox,
+                 view, layers):
+        self.generation = generation
+        self.signature = signature
+        self.key = key
+        self.index = index
+        self.size = size
+        self.bbox = bbox
+        self.view = view
+        self.layers = layers
+
+
+class RenderWorker(threading.Thread):
+    """
+    Background renderer of canvas tiles. Jobs carry snapshot of view
+    and of page layers, rendered surfaces are picked up by the main
+    thread which only blits them. Layers snapshot is taken once per
+    generation and page.
+
+    Generation counter is increased on document modification, so
+    results rendered from outdated document state are dropped.
+    New submission replaces queued jobs, i.e. jobs of abandoned
+    view are never rendered.
+    """
+    canvas = None
+    renderer = None
+    profiler = None
+    lock = None
+    event = None
+    jobs = None
+    active = None
+    results = None
+    failed = None
+    snapshot = None
+    generation = 0
+    stopped = False
+
+    def __init__(self, canvas):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.canvas = canvas
+        self.profiler = FrameProfiler()
+        self.renderer = PDRenderer(ViewSnapshot(canvas, self.profiler))
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.jobs = []
+        self.results = []
+        self.failed = set()
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+            self.jobs = []
+            self.results = []
+        self.event.set()
+
+    def cancel(self):
+        """
+        Drops queued jobs and results of current generation.
+        """
+        with self.lock:
+            self.generation += 1
+            self.jobs = []
+            self.results = []
+            self.failed = set()
+        self.snapshot = None
+
+    def get_layers(self):
+        """
+        Returns [(layer, childs), ...] snapshot of active page.
+        """
+        page = self.canvas.presenter.active_page
+        if self.snapshot is None or not self.snapshot[0] is page:
+            layers = []
+            for layer in page.childs:
+                layer = snapshot_object(layer)
+                layers.append((layer, layer.childs))
+            self.snapshot = (page, layers)
+        return self.snapshot[1]
+
+    def submit_tiles(self, signature, tiles, size):
+        """
+        Queues tiles [(key, (i, j), bbox), ...] replacing previously
+        queued ones. Returns number of tiles which will be rendered
+        and list of tiles failed in worker, those ones should be
+        rendered by caller.
+        """
+        view = ViewSnapshot(self.canvas, self.profiler)
+        layers = self.get_layers()
+        failed = []
+        with self.lock:
+            active_key = self.active.key if self.active else None
+            jobs = []
+            count = 0
+            for key, index, bbox in tiles:
+                if key in self.failed:
+                    failed.append((key, index, bbox))
+                    continue
+                count += 1
+                if not key == active_key:
+                    jobs.append(TileJob(self.generation, signature, key,
+                                        index, size, bbox, view, layers))
+            self.jobs = jobs
+        if jobs:
+            self.event.set()
+        return count, failed
+
+    def is_busy(self):
+        with self.lock:
+            return bool(self.jobs or self.active)
+
+    def has_results(self):
+        with self.lock:
+            return bool(self.results)
+
+    def get_results(self):
+        """
+        Returns [(job, surface), ...] of current generation.
+        """
+        with self.lock:
+            results = self.results
+            self.results = []
+            generation = self.generation
+        return [item for item in results if item[0].generation == generation]
+
+    def run(self):
+        while True:
+            self.event.wait()
+            with self.lock:
+                if self.stopped:
+                    break
+                if not self.jobs:
+                    self.event.clear()
+                    continue
+                job = self.active = self.jobs.pop(0)
+            surface = None
+            try:
+                surface = self.render(job)
+            except Exception as e:
+                LOG.warn('Cannot render tile %s: %s', job.key, e)
+            with self.lock:
+                self.active = None
+                if not job.generation == self.generation:
+                    continue
+                if surface is None:
+                    self.failed.add(job.key)
+                else:
+                    self.results.append((job, surface))
+        self.renderer.destroy()
+
+    def render(self, job):
+        renderer = self.renderer
+        presenter = job.view.presenter
+        renderer.canvas = job.view
+        renderer.presenter = presenter
+        renderer.doc_methods = presenter.methods
+        renderer.cms = presenter.cms
+        i, j = job.index
+        return render_tile(renderer, job.view.trafo, i, j, job.size,
+                           job.bbox, job.layers)
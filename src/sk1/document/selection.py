@@ -19,6 +19,7 @@ from uc2 import libgeom
 
 from sk1 import _, config
 from sk1 import events
+from sk1.document.spatial import SpatialIndex
 
 
 class Selection:
@@ -27,6 +28,12 @@ class Selection:
     frame = []
     markers = []
     center_offset = []
+    index = None
+    ids = None
+    ids_src = None
+    ids_len = 0
+    zorder = None
+    zorder_src = None
 
     def __init__(self, presenter):
         self.presenter = presenter
@@ -36,12 +43,70 @@ class Selection:
         self.frame = []
         self.markers = []
         self.center_offset = [0.0, 0.0]
+        self.index = SpatialIndex(presenter)
+        eventloop = presenter.eventloop
+        eventloop.connect(eventloop.DOC_MODIFIED, self.reset_zorder)
+        eventloop.connect(eventloop.PAGE_CHANGED, self.reset_zorder)
 
     def destroy(self):
+        self.index.destroy()
         items = self.__dict__.keys()
         for item in items:
             self.__dict__[item] = None
 
+    def get_ids(self):
+        """
+        Returns identity set of selected objects. The set is rebuilt
+        when selection list is replaced or resized.
+        """
+        if self.ids is None or self.ids_src is not self.objs or \
+                not self.ids_len == len(self.objs):
+            self.ids = set([id(obj) for obj in self.objs])
+            self.ids_src = self.objs
+            self.ids_len = len(self.objs)
+        return self.ids
+
+    def is_selected(self, obj):
+        return id(obj) in self.get_ids()
+
+    def replace_objs(self, replacements):
+        """
+        Replaces selected objects keeping selection order.
+        Replacements are provided as {id(old object): new object}.
+        """
+        self.objs = [replacements.get(id(obj), obj) for obj in self.objs]
+
+    def reset_zorder(self, *args):
+        self.zorder = None
+        self.zorder_src = None
+
+    def get_zorder(self):
+        """
+        Returns map of active layers children to their z-order
+        positions. The map is rebuilt after document modification
+        or if any layer children list is replaced or resized.
+        """
+        page = self.presenter.active_page
+        layers = self.presenter.methods.get_active_layers(page)
+        src = [(layer.childs, len(layer.childs)) for layer in layers]
+        if self.zorder is not None and len(src) == len(self.zorder_src):
+            for (childs, size), (old_childs, old_size) in \
+                    zip(src, self.zorder_src):
+                if childs is not old_childs or not size == old_size:
+                    self.zorder = None
+                    break
+        else:
+            self.zorder = None
+        if self.zorder is None:
+            self.zorder = {}
+            pos = 0
+            for childs, size in src:
+                for child in childs:
+                    self.zorder[id(child)] = pos
+                    pos += 1
+            self.zorder_src = src
+        return self.zorder
+
     def update(self):
         if not self.objs:
             self.center_offset = [0.0, 0.0]
@@ -111,7 +176,7 @@ class Selection:
         rule = libgeom.is_bbox_overlap if overlap_flag \
             else libgeom.is_bbox_in_rect
         for layer in layers:
-            for obj in layer.childs:
+            for obj in self.index.objs_in_rect(layer, rect):
                 if rule(rect, obj.cache_bbox):
                     result.append(obj)
         self.add(result, True) if add_flag else self.set(result)
@@ -141,11 +206,11 @@ class Selection:
         layers.reverse()
         win_point = doc.canvas.doc_to_win(point)
         hit_surface = doc.canvas.hit_surface
+        tolerance = 4.0 / doc.canvas.zoom
         for layer in layers:
             if result:
                 break
-            objs = [] + layer.childs
-            objs.reverse()
+            objs = self.index.objs_at_point(layer, point, tolerance)
             for obj in objs:
                 bbox = self._get_fixed_bbox(obj)
                 d = 0.0
@@ -190,10 +255,11 @@ class Selection:
 
     def invert_selection(self):
         result = []
+        ids = self.get_ids()
         layers = self.presenter.get_editable_layers()
         for layer in layers:
             for child in layer.childs:
-                if child not in self.objs:
+                if id(child) not in ids:
                     result.append(child)
         self.set(result)
 
@@ -202,7 +268,7 @@ class Selection:
         if not self.objs:
             return result
         ret = self._select_at_point(point)
-        if ret and ret[0] in self.objs:
+        if ret and self.is_selected(ret[0]):
             result = True
         return result
 
@@ -218,29 +284,38 @@ class Selection:
         return result
 
     def remove(self, objs):
-        for obj in objs:
-            if obj in self.objs:
-                self.objs.remove(obj)
+        ids = self.get_ids()
+        removed = set([id(obj) for obj in objs]) & ids
+        if removed:
+            self.objs = [obj for obj in self.objs if id(obj) not in removed]
         self.update()
 
     def _sort_objs_by_zorder(self):
-        sorted_objs = []
-        page = self.presenter.active_page
-        layers = self.presenter.methods.get_active_layers(page)
-        for layer in layers:
-            for child in layer.childs:
-                if child in self.objs:
-                    sorted_objs.append(child)
-        self.objs = sorted_objs
+        zorder = self.get_zorder()
+        objs = [obj for obj in self.objs if id(obj) in zorder]
+        objs.sort(key=lambda obj: zorder[id(obj)])
+        self.objs = objs
 
     def add(self, objs, xor=False):
         added = False
+        ids = set(self.get_ids())
+        appended = []
         for obj in objs:
-            if obj not in self.objs:
-                self.objs.append(obj)
+            obj_id = id(obj)
+            if obj_id not in ids:
+                ids.add(obj_id)
+                appended.append(obj)
                 added = True
             elif xor:
-                self.objs.remove(obj)
+                ids.discard(obj_id)
+        if appended or not len(ids) == len(self.objs):
+            result = []
+            for obj in self.objs + appended:
+                obj_id = id(obj)
+                if obj_id in ids:
+                    ids.discard(obj_id)
+                    result.append(obj)
+            self.objs = result
         if added:
             self._sort_objs_by_zorder()
         self.update()
@@ -16,6 +16,7 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import math
+from bisect import bisect_left
 
 from uc2 import libgeom, uc2const, sk2const
 
@@ -48,6 +49,7 @@ class SnapManager:
     page_grid = []
     objects_grid = []
     guides_grid = []
+    dirty = None
 
     def __init__(self, presenter):
 
@@ -65,8 +67,12 @@ class SnapManager:
                                 SNAP_TO_GUIDES: self.snap_point_to_guides,
                                 SNAP_TO_OBJECTS: self.snap_point_to_objects,
                                 SNAP_TO_PAGE: self.snap_point_to_page, }
+        self.guides_grid = [[], []]
+        self.objects_grid = [[], []]
+        self.page_grid = [[], []]
+        self.dirty = set([SNAP_TO_GUIDES, SNAP_TO_OBJECTS, SNAP_TO_PAGE])
         el = self.presenter.eventloop
-        el.connect(el.VIEW_CHANGED, self.update)
+        el.connect(el.VIEW_CHANGED, self.update_view)
         el.connect(el.DOC_MODIFIED, self.update)
         el.connect(el.PAGE_CHANGED, self.update)
 
@@ -76,41 +82,60 @@ class SnapManager:
             self.__dict__[item] = None
 
     def update(self, *args):
-        if self.snap_to_guides:
-            self.update_guides_grid()
+        """
+        Marks snap tables as outdated after document modification.
+        Tables are rebuilt lazily on first snapping request.
+        """
+        self.dirty = set([SNAP_TO_GUIDES, SNAP_TO_OBJECTS, SNAP_TO_PAGE])
+        self.update_view()
+
+    def update_view(self, *args):
         if self.snap_to_grid:
             self.update_grid()
-        if self.snap_to_objects:
-            self.update_objects_grid()
-        if self.snap_to_page:
-            self.update_page_grid()
+
+    def _check_table(self, kind):
+        if kind in self.dirty:
+            {SNAP_TO_GUIDES: self.update_guides_grid,
+             SNAP_TO_OBJECTS: self.update_objects_grid,
+             SNAP_TO_PAGE: self.update_page_grid, }[kind]()
+
+    def _make_table(self, xs, ys):
+        return [sorted(set(xs)), sorted(set(ys))]
 
     def update_grid(self):
         self._calc_grid()
 
     def update_guides_grid(self):
+        self.dirty.discard(SNAP_TO_GUIDES)
         self.guides_grid = [[], []]
         guide_layer = self.methods.get_guide_layer()
         if not self.methods.is_layer_visible(guide_layer):
             return
+        xs = []
+        ys = []
         for child in guide_layer.childs:
             if child.is_guide:
                 if child.orientation == uc2const.HORIZONTAL:
-                    self.guides_grid[1].append(child.position)
+                    ys.append(child.position)
                 else:
-                    self.guides_grid[0].append(child.position)
+                    xs.append(child.position)
+        self.guides_grid = self._make_table(xs, ys)
 
     def update_objects_grid(self):
-        self.objects_grid = [[], []]
+        self.dirty.discard(SNAP_TO_OBJECTS)
+        xs = []
+        ys = []
         layers = self.presenter.get_visible_layers()
         for layer in layers:
             for obj in layer.childs:
                 points = libgeom.bbox_middle_points(obj.cache_bbox)
                 for point in points:
-                    self.objects_grid[0].append(point[0])
-                    self.objects_grid[1].append(point[1])
+                    xs.append(point[0])
+                    ys.append(point[1])
+        self.objects_grid = self._make_table(xs, ys)
 
     def update_page_grid(self):
+        self.dirty.discard(SNAP_TO_PAGE)
         self._calc_page_grid()
 
     def _calc_grid(self):
@@ -157,6 +182,19 @@ class SnapManager:
         w, h = self.presenter.get_page_size()
         self.page_grid = [[-w / 2.0, 0.0, w / 2.0], [-h / 2.0, 0.0, h / 2.0]]
 
+    def _get_nearest(self, table, value, snap_dist):
+        """
+        Returns nearest to value item of sorted table
+        or None if it is farther than snap distance.
+        """
+        index = bisect_left(table, value)
+        nearest = None
+        for item in table[max(index - 1, 0):index + 1]:
+            if abs(item - value) < snap_dist:
+                if nearest is None or abs(item - value) < abs(nearest - value):
+                    nearest = item
+        return nearest
+
     def _snap_point_to_dict(self, point, doc_point, snap_dict):
         ret = False
         self.active_snap = [None, None]
@@ -167,22 +205,20 @@ class SnapManager:
         snap_dist = config.snap_distance / self.canvas.zoom
 
         if self.snap_x:
-            for item in snap_dict[0]:
-                if abs(item - doc_point[0]) < snap_dist:
-                    ret = True
-                    x = self.canvas.point_doc_to_win([item, doc_point[1]])[0]
-                    x_doc = item
-                    self.active_snap[0] = x_doc
-                    break
+            item = self._get_nearest(snap_dict[0], doc_point[0], snap_dist)
+            if item is not None:
+                ret = True
+                x = self.canvas.point_doc_to_win([item, doc_point[1]])[0]
+                x_doc = item
+                self.active_snap[0] = x_doc
 
         if self.snap_y:
-            for item in snap_dict[1]:
-                if abs(item - doc_point[1]) < snap_dist:
-                    ret = True
-                    y = self.canvas.point_doc_to_win([doc_point[0], item])[1]
-                    y_doc = item
-                    self.active_snap[1] = y_doc
-                    break
+            item = self._get_nearest(snap_dict[1], doc_point[1], snap_dist)
+            if item is not None:
+                ret = True
+                y = self.canvas.point_doc_to_win([doc_point[0], item])[1]
+                y_doc = item
+                self.active_snap[1] = y_doc
 
         return ret, [x, y], [x_doc, y_doc]
 
@@ -245,17 +281,21 @@ class SnapManager:
         return ret, [x, y], [x_doc, y_doc]
 
     def snap_point_to_guides(self, point, doc_point):
+        self._check_table(SNAP_TO_GUIDES)
         return self._snap_point_to_dict(point, doc_point, self.guides_grid)
 
     def snap_point_to_objects(self, point, doc_point):
+        self._check_table(SNAP_TO_OBJECTS)
         return self._snap_point_to_dict(point, doc_point, self.objects_grid)
 
     def snap_point_to_page(self, point, doc_point):
+        self._check_table(SNAP_TO_PAGE)
         return self._snap_point_to_dict(point, doc_point, self.page_grid)
 
     def is_over_guide(self, point):
         doc_point = self.canvas.point_win_to_doc(point)
         ret = False
+        self._check_table(SNAP_TO_GUIDES)
         snap_dict = self.guides_grid
         if not snap_dict:
             return False, None
@@ -264,19 +304,17 @@ class SnapManager:
         orient = 0
         snap_dist = config.snap_distance / (2.0 * self.canvas.zoom)
 
-        for item in snap_dict[0]:
-            if abs(item - doc_point[0]) < snap_dist:
-                ret = True
-                pos = item
-                orient = uc2const.VERTICAL
-                break
-
-        for item in snap_dict[1]:
-            if abs(item - doc_point[1]) < snap_dist:
-                ret = True
-                pos = item
-                orient = uc2const.HORIZONTAL
-                break
+        item = self._get_nearest(snap_dict[0], doc_point[0], snap_dist)
+        if item is not None:
+            ret = True
+            pos = item
+            orient = uc2const.VERTICAL
+
+        item = self._get_nearest(snap_dict[1], doc_point[1], snap_dist)
+        if item is not None:
+            ret = True
+            pos = item
+            orient = uc2const.HORIZONTAL
 
         if ret:
             self.active_guide = self.find_guide(pos, orient)
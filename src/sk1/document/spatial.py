@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+
+from sk1.document.tilecache import get_paint_bbox
+from uc2 import libgeom
+
+GRID_DIVISION = 64
+MAX_OBJ_CELLS = 256
+
+
+class GridIndex:
+    """
+    Uniform grid of document bboxes. Objects covering too many
+    cells are kept in separate list and returned by any query.
+    """
+    cell_size = 1.0
+    cells = None
+    entries = None
+    large = None
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.entries = {}
+        self.large = {}
+
+    def _get_cells(self, bbox):
+        size = self.cell_size
+        x0, y0, x1, y1 = bbox
+        i0, i1 = int(math.floor(x0 / size)), int(math.floor(x1 / size))
+        j0, j1 = int(math.floor(y0 / size)), int(math.floor(y1 / size))
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > MAX_OBJ_CELLS:
+            return None
+        return [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+
+    def insert(self, obj, bbox):
+        obj_id = id(obj)
+        if obj_id in self.entries:
+            self.remove(obj)
+        bbox = list(bbox)
+        cells = self._get_cells(bbox) if bbox else []
+        self.entries[obj_id] = (obj, bbox, cells)
+        if cells is None:
+            self.large[obj_id] = obj
+        else:
+            for cell in cells:
+                self.cells.setdefault(cell, {})[obj_id] = obj
+
+    def remove(self, obj):
+        obj_id = id(obj)
+        entry = self.entries.pop(obj_id, None)
+        if entry is None:
+            return
+        cells = entry[2]
+        if cells is None:
+            del self.large[obj_id]
+        else:
+            for cell in cells:
+                bucket = self.cells[cell]
+                del bucket[obj_id]
+                if not bucket:
+                    del self.cells[cell]
+
+    def get_bbox(self, obj):
+        entry = self.entries.get(id(obj))
+        return entry[1] if entry else None
+
+    def query_rect(self, rect):
+        result = dict(self.large)
+        cells = self._get_cells(rect)
+        if cells is None:
+            for obj_id, entry in self.entries.items():
+                if libgeom.is_bbox_overlap(entry[1], rect):
+                    result[obj_id] = entry[0]
+            return result.values()
+        for cell in cells:
+            bucket = self.cells.get(cell)
+            if bucket:
+                for obj_id, obj in bucket.items():
+                    if libgeom.is_bbox_overlap(self.entries[obj_id][1], rect):
+                        result[obj_id] = obj
+        return result.values()
+
+    def query_point(self, point, tolerance=0.0):
+        x, y = point
+        rect = [x - tolerance, y - tolerance, x + tolerance, y + tolerance]
+        return self.query_rect(rect)
+
+
+class LayerIndex:
+    """
+    Spatial index of layer children. Full reconciliation compares
+    stored bboxes with actual ones, synchronization after notified
+    changes rescans children identities only and recalculates
+    bboxes of new and modified objects.
+    """
+    layer = None
+    grid = None
+    positions = None
+    ids = None
+
+    def __init__(self, layer, cell_size):
+        self.layer = layer
+        self.grid = GridIndex(cell_size)
+        self.positions = {}
+        self.ids = []
+
+    def reconcile(self):
+        grid = self.grid
+        positions = {}
+        for pos, obj in enumerate(self.layer.childs):
+            positions[id(obj)] = pos
+            bbox = get_paint_bbox(obj)
+            if not bbox == grid.get_bbox(obj):
+                grid.insert(obj, bbox)
+        for obj_id, entry in grid.entries.items():
+            if obj_id not in positions:
+                grid.remove(entry[0])
+        self.positions = positions
+        self.ids = [id(obj) for obj in self.layer.childs]
+
+    def sync(self, modified):
+        """
+        Updates index after layer children change. Modified objects
+        are provided as {id(obj): obj} of layer children.
+        """
+        grid = self.grid
+        childs = self.layer.childs
+        ids = [id(obj) for obj in childs]
+        if not ids == self.ids:
+            entries = grid.entries
+            for obj in childs:
+                if id(obj) not in entries:
+                    modified[id(obj)] = obj
+            for obj_id in set(entries.keys()).difference(ids):
+                grid.remove(entries[obj_id][0])
+            self.positions = dict(zip(ids, range(len(ids))))
+            self.ids = ids
+        for obj_id, obj in modified.items():
+            if obj_id in self.positions:
+                grid.insert(obj, get_paint_bbox(obj))
+
+    def sort(self, objs, reverse=False):
+        positions = self.positions
+        return sorted(objs, key=lambda obj: positions[id(obj)],
+                      reverse=reverse)
+
+    def objs_at_point(self, point, tolerance=0.0):
+        """
+        Returns candidate objects in reverse z-order.
+        """
+        return self.sort(self.grid.query_point(point, tolerance), True)
+
+    def objs_in_rect(self, rect):
+        """
+        Returns candidate objects in z-order.
+        """
+        return self.sort(self.grid.query_rect(rect))
+
+
+class SpatialIndex:
+    """
+    Per-layer spatial index of document objects. PresenterAPI
+    notifies index about modified objects and changed layer
+    children, so only touched objects are updated on next query.
+    DOC_MODIFIED without preceding notification comes from not
+    instrumented mutation, in this case layers are fully
+    reconciled.
+    """
+    presenter = None
+    layers = None
+    dirty = None
+    stale = None
+    modified = None
+    notified = False
+
+    def __init__(self, presenter):
+        self.presenter = presenter
+        self.layers = {}
+        self.dirty = set()
+        self.stale = set()
+        self.modified = {}
+        eventloop = presenter.eventloop
+        eventloop.connect(eventloop.DOC_MODIFIED, self.on_doc_modified)
+        eventloop.connect(eventloop.PAGE_CHANGED, self.clear)
+
+    def destroy(self):
+        items = self.__dict__.keys()
+        for item in items:
+            self.__dict__[item] = None
+
+    def on_doc_modified(self, *args):
+        if not self.notified:
+            self.set_dirty()
+        self.notified = False
+
+    def set_dirty(self, *args):
+        self.dirty = set(self.layers.keys())
+        self.modified = {}
+
+    def set_modified(self, objs):
+        """
+        Marks objects (or their top level parents) for bbox update.
+        """
+        self.notified = True
+        for obj in objs:
+            while obj.parent is not None and not obj.parent.is_layer:
+                obj = obj.parent
+            layer_id = id(obj.parent)
+            if layer_id in self.layers and layer_id not in self.dirty:
+                self.modified.setdefault(layer_id, {})[id(obj)] = obj
+        self.stale = set(self.layers.keys())
+
+    def set_structure_modified(self):
+        """
+        Marks layer children lists as changed.
+        """
+        self.notified = True
+        self.stale = set(self.layers.keys())
+
+    def clear(self, *args):
+        self.layers = {}
+        self.dirty = set()
+        self.stale = set()
+        self.modified = {}
+
+    def get_layer_index(self, layer):
+        layer_id = id(layer)
+        index = self.layers.get(layer_id)
+        if index is None:
+            w, h = self.presenter.get_page_size()
+            index = LayerIndex(layer, max(w, h) / GRID_DIVISION or 1.0)
+            self.layers[layer_id] = index
+            self.dirty.add(layer_id)
+        if layer_id in self.dirty:
+            index.reconcile()
+            self.dirty.discard(layer_id)
+            self.stale.discard(layer_id)
+            self.modified.pop(layer_id, None)
+        elif layer_id in self.stale:
+            index.sync(self.modified.pop(layer_id, {}))
+            self.stale.discard(layer_id)
+        return index
+
+    def objs_at_point(self, layer, point, tolerance=0.0):
+        return self.get_layer_index(layer).objs_at_point(point, tolerance)
+
+    def objs_in_rect(self, layer, rect):
+        return self.get_layer_index(layer).objs_in_rect(rect)
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import cairo
+import math
+import time
+from collections import OrderedDict
+
+from sk1 import config
+from uc2 import libgeom
+
+
+def get_paint_bbox(obj):
+    """
+    Returns document bbox covered by painted object,
+    i.e. cache_bbox enlarged by stroke width and arrows.
+    """
+    bbox = obj.cache_bbox
+    if not bbox:
+        return []
+    style = obj.style
+    if style and style[1]:
+        d = style[1][1]
+        bbox = libgeom.enlarge_bbox(bbox, d, d)
+    if obj.is_curve and obj.cache_arrows:
+        for pair in obj.cache_arrows:
+            for item in pair:
+                if item:
+                    arrow_bbox = libgeom.get_cpath_bbox(item)
+                    bbox = libgeom.sum_bbox(bbox, arrow_bbox)
+    return bbox
+
+
+def get_tile_bbox(trafo, x, y, size):
+    """
+    Returns document bbox of tile placed at window point x,y.
+    """
+    m11, m12, m21, m22, dx, dy = trafo
+    x0, y0 = (x - dx) / m11, (y - dy) / m22
+    x1, y1 = (x + size - dx) / m11, (y + size - dy) / m22
+    # one pixel margin against antialiasing bleed from neighbours
+    offset = 1.0 / abs(m11)
+    return [min(x0, x1) - offset, min(y0, y1) - offset,
+            max(x0, x1) + offset, max(y0, y1) + offset]
+
+
+def render_tile(renderer, trafo, i, j, size, bbox, layers=None):
+    """
+    Renders page and document objects (or provided layers snapshot)
+    overlapping bbox into tile surface.
+    """
+    m11, m12, m21, m22, dx, dy = trafo
+    fx = dx - math.floor(dx)
+    fy = dy - math.floor(dy)
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, size, size)
+    ctx = cairo.Context(surface)
+    ctx.set_source_rgb(*renderer.doc_methods.get_desktop_bg())
+    ctx.paint()
+    ctx.set_matrix(cairo.Matrix(m11, m12, m21, m22,
+                                fx - i * size, fy - j * size))
+    main_ctx = renderer.ctx
+    renderer.ctx = ctx
+    try:
+        renderer.paint_page()
+        renderer.render_doc(bbox, layers)
+    finally:
+        renderer.ctx = main_ctx
+    return surface
+
+
+class TileCache:
+    """
+    Backing store for document rendering. Page content is cached
+    as fixed size tiles aligned to the zoomed document space, so
+    scrolling reuses already rendered tiles and document modification
+    invalidates only tiles touched by changed objects.
+
+    Tiles are keyed by (page, zoom, origin phase, tile index).
+    """
+    canvas = None
+    tiles = None
+    signatures = None
+    page_signature = None
+    page_id = None
+    modified = True
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.tiles = OrderedDict()
+        self.signatures = {}
+
+    def destroy(self):
+        self.clear()
+        items = self.__dict__.keys()
+        for item in items:
+            self.__dict__[item] = None
+
+    def clear(self):
+        self.tiles = OrderedDict()
+        self.signatures = {}
+        self.page_signature = None
+        self.page_id = None
+
+    def set_modified(self, *args):
+        self.modified = True
+
+    # ----- Invalidation
+
+    def _get_page_signature(self, presenter):
+        methods = presenter.methods
+        page = presenter.active_page
+        layers = [(id(layer), repr(layer.properties), repr(layer.style))
+                  for layer in page.childs]
+        # origin and units define checkerboard phase and step
+        return repr((page.page_format, methods.get_page_fill(),
+                     methods.get_page_border(), methods.get_desktop_bg(),
+                     methods.get_doc_origin(), methods.get_doc_units(),
+                     layers, self.canvas.stroke_view, self.canvas.draft_view))
+
+    def _collect_signatures(self, objs, result, parent=None):
+        """
+        Signature keeps references to compared objects, so ids
+        of replaced (and collected) objects cannot be reused.
+        """
+        prev = None
+        for obj in objs:
+            result[id(obj)] = (tuple(get_paint_bbox(obj)), obj, obj.style,
+                               obj.cache_cpath,
+                               getattr(obj, 'bitmap', None), prev, parent)
+            if obj.childs:
+                self._collect_signatures(obj.childs, result, obj)
+            prev = obj
+
+    @staticmethod
+    def _is_same(signature, old_signature):
+        if old_signature is None or \
+                not signature[0] == old_signature[0]:
+            return False
+        for item, old_item in zip(signature[1:], old_signature[1:]):
+            if item is not old_item:
+                return False
+        return True
+
+    def _get_signatures(self, page):
+        result = {}
+        for layer in page.childs:
+            if layer.properties[0]:
+                self._collect_signatures(layer.childs, result, layer)
+        return result
+
+    def invalidate_bbox(self, bbox):
+        """
+        Drops cached tiles which overlap provided document bbox.
+        """
+        self.invalidate_bboxes([bbox, ])
+
+    def invalidate_bboxes(self, bboxes):
+        bboxes = [bbox for bbox in bboxes if bbox]
+        if not bboxes:
+            return
+        if len(bboxes) > config.canvas_tile_cache_size:
+            bboxes = [reduce(libgeom.sum_bbox, bboxes)]
+        for key in list(self.tiles.keys()):
+            tile_bbox = self.tiles[key][1]
+            for bbox in bboxes:
+                if libgeom.is_bbox_overlap(tile_bbox, bbox):
+                    del self.tiles[key]
+                    break
+
+    def sync(self, presenter):
+        """
+        Compares document state with the state tiles were rendered
+        from and invalidates outdated tiles.
+        """
+        page = presenter.active_page
+        page_signature = self._get_page_signature(presenter)
+        if not id(page) == self.page_id or \
+                not page_signature == self.page_signature:
+            self.clear()
+            self.page_id = id(page)
+            self.page_signature = page_signature
+            self.signatures = self._get_signatures(page)
+            self.modified = False
+            return
+        if not self.modified:
+            return
+        self.modified = False
+        signatures = self._get_signatures(page)
+        old_signatures = self.signatures
+        dirty = []
+        for obj_id, signature in signatures.items():
+            old_signature = old_signatures.get(obj_id)
+            if self._is_same(signature, old_signature):
+                continue
+            dirty.append(list(signature[0]))
+            if old_signature is not None:
+                dirty.append(list(old_signature[0]))
+        for obj_id, signature in old_signatures.items():
+            if obj_id not in signatures:
+                dirty.append(list(signature[0]))
+        self.invalidate_bboxes(dirty)
+        self.signatures = signatures
+
+    def collect(self, worker):
+        """
+        Stores tiles rendered by background worker.
+        """
+        for job, surface in worker.get_results():
+            if job.signature == self.page_signature and \
+                    job.key[0] == self.page_id:
+                self.tiles[job.key] = (surface, job.bbox)
+
+    def paint(self, renderer, ctx, width, height, budget=None, worker=None):
+        """
+        Composes visible area from cached tiles rendering
+        missing ones only. If time budget (in seconds) is provided,
+        missing tiles are rendered from viewport center until budget
+        is exhausted, at least one per call. If render worker
+        is provided, missing tiles are queued to it. Returns False
+        if some tiles are left unrendered.
+        """
+        deadline = time.time() + budget if budget is not None else None
+        presenter = renderer.presenter
+        self.sync(presenter)
+        if worker is not None:
+            self.collect(worker)
+        size = config.canvas_tile_size
+        trafo = self.canvas.trafo
+        m11, m12, m21, m22, dx, dy = trafo
+        ox = math.floor(dx)
+        oy = math.floor(dy)
+        phase = (round(dx - ox, 3), round(dy - oy, 3))
+        zoom = (m11, m22)
+
+        ctx.save()
+        ctx.set_matrix(cairo.Matrix(1.0, 0.0, 0.0, 1.0, 0.0, 0.0))
+        i0 = int(math.floor(-ox / size))
+        i1 = int(math.floor((width - ox) / size))
+        j0 = int(math.floor(-oy / size))
+        j1 = int(math.floor((height - oy) / size))
+        missing = []
+        for j in range(j0, j1 + 1):
+            for i in range(i0, i1 + 1):
+                key = (self.page_id, zoom, phase, i, j)
+                x = ox + i * size
+                y = oy + j * size
+                if key in self.tiles:
+                    tile = self.tiles.pop(key)
+                    self.tiles[key] = tile
+                    self.canvas.profiler.count('tiles_cached')
+                    ctx.set_source_surface(tile[0], x, y)
+                    ctx.paint()
+                else:
+                    missing.append((key, i, j, x, y))
+
+        if deadline is not None or worker is not None:
+            cx = width / 2.0 - size / 2.0
+            cy = height / 2.0 - size / 2.0
+            missing.sort(key=lambda item: (item[3] - cx) ** 2 +
+                         (item[4] - cy) ** 2)
+        complete = True
+        if worker is not None and missing:
+            tiles = [(key, (i, j), get_tile_bbox(trafo, x, y, size))
+                     for key, i, j, x, y in missing]
+            count, failed = worker.submit_tiles(self.page_signature,
+                                                tiles, size)
+            complete = not count
+            # tiles failed in worker are rendered here
+            failed = set(item[0] for item in failed)
+            missing = [item for item in missing if item[0] in failed]
+        for index, (key, i, j, x, y) in enumerate(missing):
+            if index and deadline is not None and time.time() > deadline:
+                complete = False
+                break
+            self.canvas.profiler.count('tiles_rendered')
+            bbox = get_tile_bbox(trafo, x, y, size)
+            surface = render_tile(renderer, trafo, i, j, size, bbox)
+            self.tiles[key] = (surface, bbox)
+            ctx.set_source_surface(surface, x, y)
+            ctx.paint()
+        ctx.restore()
+
+        while len(self.tiles) > config.canvas_tile_cache_size:
+            self.tiles.popitem(last=False)
+        return complete
@@ -16,6 +16,10 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import logging
+import time
+import types
+from collections import OrderedDict
+from contextlib import contextmanager
 
 LOG = logging.getLogger(__name__)
 
@@ -23,6 +27,11 @@ LOG = logging.getLogger(__name__)
 Module provides Qt-like signal-slot functionality
 for internal events processing.
 
+Signals emitted inside batch() scope are deferred till the end of
+the outermost scope. Repeated signals on the same channel collapse
+into one delivery with the latest arguments (for CONFIG_MODIFIED and
+UPDATE_CHANNEL only identical signals collapse).
+
 Signal arguments:
 CONFIG_MODIFIED   attr, value - modified config field
 APP_STATUS		  msg - statusbar message
@@ -69,8 +78,18 @@ ALL_CHANNELS = [CONFIG_MODIFIED, APP_STATUS, MOUSE_STATUS, CMS_CHANGED,
                 DOC_CLOSED, MODE_CHANGED, SELECTION_CHANGED, CLIPBOARD,
                 PAGE_CHANGED, SNAP_CHANGED]
 
+NON_COALESCING = [CONFIG_MODIFIED, UPDATE_CHANNEL]
+
 ET_ID = 'EDIT_TEXT_MODE'
 
+# Deferred dispatching state
+BATCH_DEPTH = [0]
+QUEUE = OrderedDict()
+
+# Dispatch statistics: channel name -> [count, time, {receiver: [count, time]}]
+STATS = {}
+STATS_ENABLED = [False]
+
 
 def connect(channel, receiver):
     """
@@ -102,14 +121,125 @@ def emit(channel, *args):
     """
     Sends signal to all receivers in channel.
     """
-    for receiver in channel[1:]:
+    if BATCH_DEPTH[0]:
+        key = ('events', channel[0])
+        if channel in NON_COALESCING:
+            key += args
+        enqueue(key, _dispatch, channel, args)
+    else:
+        _dispatch(channel, args)
+
+
+def _dispatch(channel, args):
+    call_receivers(channel[0], channel[1:], args)
+
+
+def call_receivers(name, receivers, args):
+    """
+    Calls receivers collecting dispatch statistics if enabled.
+    """
+    if not STATS_ENABLED[0]:
+        for receiver in receivers:
+            try:
+                if callable(receiver):
+                    receiver(*args)
+            except Exception:
+                msg = 'Error calling <%s> receiver with %s %s'
+                LOG.exception(msg, receiver, args)
+        return
+    stats = STATS.setdefault(name, [0, 0.0, {}])
+    start = time.time()
+    for receiver in receivers:
         try:
             if callable(receiver):
+                receiver_start = time.time()
                 receiver(*args)
+                key = get_receiver_name(receiver)
+                receiver_stats = stats[2].setdefault(key, [0, 0.0])
+                receiver_stats[0] += 1
+                receiver_stats[1] += time.time() - receiver_start
         except Exception:
             msg = 'Error calling <%s> receiver with %s %s'
             LOG.exception(msg, receiver, args)
             continue
+    stats[0] += 1
+    stats[1] += time.time() - start
+
+
+def enqueue(key, dispatcher, channel, args):
+    """
+    Defers signal dispatching till the end of batch.
+    Signal with the same key replaces queued one keeping its position.
+    """
+    QUEUE[key] = (dispatcher, channel, args)
+
+
+def is_batching():
+    return bool(BATCH_DEPTH[0])
+
+
+@contextmanager
+def batch():
+    """
+    Transaction scope for coalescing signals:
+
+    with events.batch():
+        ...bulk operation...
+    """
+    BATCH_DEPTH[0] += 1
+    try:
+        yield
+    finally:
+        BATCH_DEPTH[0] -= 1
+        if not BATCH_DEPTH[0]:
+            flush()
+
+
+def flush():
+    """
+    Delivers deferred signals.
+    """
+    while QUEUE:
+        dispatcher, channel, args = QUEUE.popitem(last=False)[1]
+        dispatcher(channel, args)
+
+
+def get_receiver_name(receiver):
+    """
+    Returns qualified receiver name, so receivers of different
+    instances of the same class are counted together.
+    """
+    owner = getattr(receiver, 'im_self', None)
+    func = getattr(receiver, 'im_func', receiver)
+    name = getattr(func, '__name__', type(receiver).__name__)
+    if owner is not None:
+        cls = owner if isinstance(owner, (type, types.ClassType)) \
+            else owner.__class__
+        return '%s.%s.%s' % (cls.__module__, cls.__name__, name)
+    return '%s.%s' % (getattr(func, '__module__', ''), name)
+
+
+def enable_stats(value=True):
+    STATS_ENABLED[0] = value
+
+
+def get_stats():
+    """
+    Returns dispatch statistics sorted by total time:
+    [(channel name, count, time, [(receiver, count, time),...]),...]
+    """
+    result = []
+    for name, (count, total, receivers) in STATS.items():
+        items = [(receiver, val[0], val[1])
+                 for receiver, val in receivers.items()]
+        items.sort(key=lambda item: item[2], reverse=True)
+        result.append((name, count, total, items))
+    result.sort(key=lambda item: item[2], reverse=True)
+    return result
+
+
+def reset_stats():
+    STATS.clear()
 
 
 def clean_channel(channel):
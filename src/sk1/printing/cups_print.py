@@ -19,6 +19,7 @@ import cups
 import logging
 import os
 import wal
+from cStringIO import StringIO
 
 from generic import AbstractPrinter, AbstractPS, COLOR_MODE
 from pdf_printer import PDF_Printer
@@ -27,6 +28,7 @@ from propsdlg import CUPS_PrnPropsDialog
 from sk1 import _, config
 from sk1.dialogs import ProgressDialog, error_dialog
 from sk1.printing import prn_events
+from sk1.printing.printjob import PrintJob, StreamWriter, render_pages
 from uc2 import uc2const
 from uc2.formats import get_loader
 from uc2.formats.pdf import pdfconst, pdfgen
@@ -232,11 +234,8 @@ class CUPS_Printer(AbstractPrinter):
             options['collate'] = 'True'
         return options
 
-    def printing(self, printout, media=''):
+    def _make_renderer(self, fileptr, printout):
         appdata = printout.app.appdata
-        path = os.path.join(appdata.app_temp_dir, 'printout.pdf')
-        fileptr = fsutils.get_fileptr(path, True)
-        pages = printout.get_print_pages()
         renderer = pdfgen.PDFGenerator(fileptr, printout.get_cms(),
                                        pdfconst.PDF_VERSION_DEFAULT)
 
@@ -244,31 +243,87 @@ class CUPS_Printer(AbstractPrinter):
         producer = '%s %s' % ('UniConvertor', appdata.version)
         renderer.set_creator(creator)
         renderer.set_producer(producer)
-        title = '%s - [%s]' % (creator, printout.doc.doc_name)
 
         renderer.set_compression(True)
         renderer.set_colorspace(self.colorspace)
         renderer.set_spot_usage(False)
-
         renderer.set_progress_message(_('Printing in progress...'))
-        renderer.set_num_pages(len(pages))
+        return renderer
 
-        w, h = self.get_page_size()
-        for page in pages:
-            renderer.start_page(w, h, self.shifts[0], self.shifts[1])
-            for group in page.childs:
-                renderer.render(group.childs, True)
-            renderer.end_page()
-        renderer.save()
+    def is_streaming_supported(self):
+        # Each chunk is sent as separate document of the same job,
+        # so copies and collation would be applied per chunk.
+        return config.print_cups_streaming and self.copies == 1 and \
+            hasattr(self.connection, 'createJob')
 
-        fileptr.close()
+    def printing(self, printout, media='', job=None):
+        appdata = printout.app.appdata
+        pages = printout.get_print_pages()
+        creator = '%s %s' % (appdata.app_name, appdata.version)
+        title = '%s - [%s]' % (creator, printout.doc.doc_name)
+        job = job or PrintJob(title, len(pages))
 
         options = self.get_printing_options()
         if media:
             options['media'] = media
 
+        if self.is_streaming_supported() and \
+                len(pages) > config.print_stream_chunk:
+            self.stream_printing(printout, pages, title, options, job)
+            return
+
+        path = os.path.join(appdata.app_temp_dir, 'printout.pdf')
+        fileptr = fsutils.get_fileptr(path, True)
+        try:
+            renderer = self._make_renderer(fileptr, printout)
+            renderer.set_num_pages(len(pages))
+            render_pages(renderer, pages, self.get_page_size(),
+                         job, self.shifts)
+            renderer.save()
+        finally:
+            fileptr.close()
+
+        job.check()
         self.connection.printFile(self.cups_name, path, title, options)
 
+    def stream_printing(self, printout, pages, title, options, job):
+        """
+        Renders pages by chunks into separate PDF documents of
+        single CUPS job. Printer starts receiving data after first
+        chunk while the rest of pages is still rendered.
+        """
+        size = config.print_stream_chunk
+        chunks = [pages[i:i + size] for i in range(0, len(pages), size)]
+        job_id = self.connection.createJob(self.cups_name, title, options)
+
+        def send_document(data, index, last):
+            doc_name = '%s (%d)' % (title, index + 1)
+            self.connection.startDocument(self.cups_name, job_id, doc_name,
+                                          'application/pdf', int(last))
+            self.connection.writeRequestData(data, len(data))
+            self.connection.finishDocument(self.cups_name)
+
+        writer = StreamWriter(send_document)
+        writer.start()
+        try:
+            for index, chunk in enumerate(chunks):
+                fileptr = StringIO()
+                renderer = self._make_renderer(fileptr, printout)
+                renderer.set_num_pages(len(chunk))
+                render_pages(renderer, chunk, self.get_page_size(),
+                             job, self.shifts)
+                renderer.save()
+                writer.put(fileptr.getvalue(), index,
+                           index == len(chunks) - 1)
+            writer.finish()
+        except Exception:
+            writer.abort()
+            try:
+                self.connection.cancelJob(job_id)
+            except Exception:
+                LOG.exception('Cannot cancel CUPS job %s', job_id)
+            raise
+
     def print_calibration(self, app, win, path, media=''):
         pd = ProgressDialog(_('Loading calibration page...'), win)
         try:
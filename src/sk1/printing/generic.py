@@ -21,6 +21,7 @@ from uc2 import uc2const
 
 from sk1 import _, config
 from sk1.dialogs import ProgressDialog, error_dialog
+from sk1.printing.printjob import PrintJob, PrintCancelled
 
 
 class AbstractPS(object):
@@ -69,6 +70,7 @@ class AbstractPrinter(object):
     page_orientation = uc2const.PORTRAIT
     margins = STD_MARGINS
     shifts = STD_SHIFTS
+    job = None
 
     def __init__(self):
         if self.get_ps_name() in config.printer_config:
@@ -119,9 +121,13 @@ class AbstractPrinter(object):
     def get_prn_info(self):
         return ('---', '---'), ('---', '---')
 
-    def printing(self, printout):
+    def printing(self, printout, job=None):
         pass
 
+    def cancel_printing(self):
+        if self.job:
+            self.job.cancel()
+
     def set_copies(self, val):
         self.copies = val
 
@@ -143,14 +149,18 @@ class AbstractPrinter(object):
         return max(*self.page_format[1]), min(*self.page_format[1])
 
     def run_printdlg(self, win, printout):
-        pd = ProgressDialog(_('Printing...'), win)
+        pd = ProgressDialog(_('Printing...'), win, self.cancel_printing)
+        self.job = PrintJob(num_pages=printout.get_num_print_pages())
         try:
-            pd.run(self.printing, [printout, ])
+            pd.run(self.printing, [printout, self.job])
             pd.listener(_('Done'), 1.0)
+        except PrintCancelled:
+            return False
         except Exception:
             msg = _('Error while printing!')
             error_dialog(win, win.app.appdata.app_name, msg)
             return False
         finally:
+            self.job = None
             pd.destroy()
         return True
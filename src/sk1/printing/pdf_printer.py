@@ -22,6 +22,7 @@ from uc2.formats.pdf import pdfconst, pdfgen
 
 from sk1 import _, config
 from sk1.printing import prn_events
+from sk1.printing.printjob import PrintJob, render_pages
 from sk1.dialogs import get_save_file_name
 
 from generic import AbstractPrinter, COLOR_MODE
@@ -88,8 +89,9 @@ class PDF_Printer(AbstractPrinter):
     def is_custom_supported(self):
         return True
 
-    def printing(self, printout):
+    def printing(self, printout, job=None):
         pages = printout.get_print_pages()
+        job = job or PrintJob(num_pages=len(pages))
         renderer = pdfgen.PDFGenerator(self.filepath, printout.get_cms(),
                                        self.pdf_version)
 
@@ -101,12 +103,8 @@ class PDF_Printer(AbstractPrinter):
         renderer.set_progress_message(_('Printing in progress...'))
         renderer.set_num_pages(len(pages))
 
-        w, h = self.get_page_size()
-        for page in pages:
-            renderer.start_page(w, h)
-            for group in page.childs:
-                renderer.render(group.childs, True)
-            renderer.end_page()
+        render_pages(renderer, pages, self.get_page_size(), job)
+        job.check()
         renderer.save()
 
     def set_meta(self, renderer, app):
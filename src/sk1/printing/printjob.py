@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import logging
+import sys
+import threading
+from Queue import Queue
+
+from sk1 import _
+from uc2 import events
+
+LOG = logging.getLogger(__name__)
+
+
+class PrintCancelled(Exception):
+    pass
+
+
+class PrintJob:
+    """
+    Progress and cancellation state of page-by-page printing.
+    Listeners are called as listener(msg, fraction); progress is
+    also reported via FILTER_INFO so ProgressDialog tracks the job.
+    Job can be cancelled from listener or from another thread,
+    printing is stopped before next page.
+    """
+    title = ''
+    num_pages = 0
+    done = 0
+    cancelled = False
+    listeners = None
+
+    def __init__(self, title='', num_pages=0):
+        self.title = title
+        self.num_pages = num_pages
+        self.listeners = []
+
+    def connect(self, listener):
+        self.listeners.append(listener)
+
+    def disconnect(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self):
+        if self.cancelled:
+            raise PrintCancelled()
+
+    def get_progress(self):
+        if not self.num_pages:
+            return 0.0
+        return min(float(self.done) / self.num_pages, 1.0)
+
+    def report(self, msg=None):
+        msg = msg or _('Printing in progress...')
+        value = self.get_progress()
+        for listener in [] + self.listeners:
+            listener(msg, value)
+        events.emit(events.FILTER_INFO, msg, value)
+
+    def page_done(self):
+        self.done += 1
+        self.report(_('Printed page %d of %d') % (self.done, self.num_pages))
+
+
+def render_pages(renderer, pages, size, job, shifts=None):
+    """
+    Renders printout pages into PDFGenerator checking job
+    cancellation between pages.
+    """
+    w, h = size
+    for page in pages:
+        job.check()
+        if shifts:
+            renderer.start_page(w, h, shifts[0], shifts[1])
+        else:
+            renderer.start_page(w, h)
+        for group in page.childs:
+            renderer.render(group.childs, True)
+        renderer.end_page()
+        job.page_done()
+
+
+class StreamWriter(threading.Thread):
+    """
+    Background consumer of rendered data. Keeps printing backend
+    busy with already rendered chunk while next one is prepared.
+    Writer errors are re-raised on finish().
+    """
+    writer = None
+    queue = None
+    error = None
+
+    def __init__(self, writer, depth=2):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.writer = writer
+        self.queue = Queue(depth)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self.writer(*item)
+            except Exception:
+                self.error = sys.exc_info()
+                LOG.exception('Error writing print data')
+
+    def put(self, *args):
+        if self.error is not None:
+            raise self.error[0], self.error[1], self.error[2]
+        self.queue.put(args)
+
+    def abort(self):
+        """
+        Drops pending data and stops writer thread.
+        """
+        if self.error is None:
+            self.error = (PrintCancelled, PrintCancelled(), None)
+        if self.is_alive():
+            self.queue.put(None)
+
+    def finish(self):
+        self.queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error[0], self.error[1], self.error[2]
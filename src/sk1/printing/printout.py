@@ -168,6 +168,7 @@ class Printout(wal.Printout):
 
         for group in page_obj.childs:
             self.renderer.render(ctx, group.childs)
+        self.renderer.log_color_stats()
 
         win_surface = cairo.Win32PrintingSurface(dc.GetHDC())
         win_ctx = cairo.Context(win_surface)
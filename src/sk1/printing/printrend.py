@@ -15,21 +15,95 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import logging
+from collections import OrderedDict
+
+from sk1 import config, events
 from uc2 import uc2const, libimg
 from uc2.formats.sk2.crenderer import CairoRenderer
 
+LOG = logging.getLogger(__name__)
+
+# CMS generation is incremented on every color management change,
+# so color caches drop stale conversions lazily on next lookup.
+CMS_GENERATION = [0]
+
+
+def cms_changed(*args):
+    CMS_GENERATION[0] += 1
+
+
+events.connect(events.CMS_CHANGED, cms_changed)
+
+
+class ColorCache:
+    """
+    Bounded LRU cache of color conversion results
+    keyed by (colorspace, color).
+    """
+    items = None
+    generation = 0
+    hits = 0
+    misses = 0
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.items = OrderedDict()
+        self.generation = CMS_GENERATION[0]
+
+    def get_key(self, colorspace, color):
+        return colorspace, color[0], repr(color[1])
+
+    def get(self, key):
+        if not self.generation == CMS_GENERATION[0]:
+            self.clear()
+        value = self.items.pop(key, None)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.items[key] = value
+        return value
+
+    def put(self, key, value):
+        self.items[key] = value
+        while len(self.items) > config.print_color_cache_size:
+            self.items.popitem(last=False)
+
+    def get_stats(self):
+        """
+        Returns (hits, misses, cached items number).
+        """
+        return self.hits, self.misses, len(self.items)
+
+    def reset_stats(self):
+        self.hits = self.misses = 0
+
 
 class PrintRenderer(CairoRenderer):
     colorspace = uc2const.COLOR_RGB
+    color_cache = None
 
     def __init__(self, cms):
         CairoRenderer.__init__(self, cms)
+        self.color_cache = ColorCache()
 
     def set_colorspace(self, cs=uc2const.COLOR_RGB):
         if not cs == self.colorspace:
             self.colorspace = cs
 
     def get_color(self, color):
+        key = self.color_cache.get_key(self.colorspace, color)
+        rgb = self.color_cache.get(key)
+        if rgb is None:
+            rgb = self._convert_color(color)
+            self.color_cache.put(key, rgb)
+        r, g, b = rgb
+        return r, g, b, color[2]
+
+    def _convert_color(self, color):
         if self.colorspace == uc2const.COLOR_RGB:
             r, g, b = self.cms.get_display_color(color)
         elif self.colorspace == uc2const.COLOR_CMYK:
@@ -38,7 +112,12 @@ class PrintRenderer(CairoRenderer):
         else:
             gc = self.cms.get_grayscale_color(color)
             r, g, b = self.cms.get_display_color(gc)
-        return r, g, b, color[2]
+        return r, g, b
+
+    def log_color_stats(self):
+        hits, misses, size = self.color_cache.get_stats()
+        LOG.debug('Color cache: %d hits, %d misses, %d colors',
+                  hits, misses, size)
 
     def get_surface(self, obj):
         if self.colorspace == uc2const.COLOR_RGB:
@@ -19,13 +19,14 @@ from actions import AppAction, ActionButton, ActionToggle
 from colorctrls import SbStrokeSwatch, SbFillSwatch, StyleMonitor
 from ctxmenu import ContextMenu
 from fillctrls import SolidFill, GradientFill, PatternFill
-from fontctrl import FontChoice, font_cache_update
+from fontctrl import FontChoice, font_cache_update, font_cache_prebuild
 from minipalette import CBMiniPalette
 from palette import Palette
 from palette_viewer import PaletteViewer
 from strokectrls import DashChoice, CapChoice, JoinChoice, ArrowChoice
 from surfaces import Painter, RulerSurface, HRulerSurface, VRulerSurface, \
     CanvasSurface
+from thumbviewer import ThumbnailViewer
 from unitctrls import RatioToggle, BitmapToggle, ActionImageSwitch
 from unitctrls import StaticUnitLabel, StaticUnitSpin
 from unitctrls import UnitLabel, UnitSpin, AngleSpin
@@ -14,9 +14,12 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
-
-import logging
+import cPickle
 import cairo
+import hashlib
+import logging
+import os
+import zlib
 
 import wal
 from sk1 import _, config, events
@@ -27,53 +30,293 @@ FONTNAME_CACHE = []
 FONTSAMPLE_CACHE = []
 MAXSIZE = []
 
+FONT_CACHE_VERSION = 2
+FONTNAME_FAMILY = 'Sans'
+FONTNAME_SIZE = 9
+NAMES_PER_TICK = 100
+SAMPLES_PER_TICK = 25
+TICK_DELAY = 50  # in ms
+
 LOG = logging.getLogger(__name__)
 
 
-def generate_fontname_cache(fonts):
-    maxwidth = 0
-    height = 0
-    for item in fonts:
+def render_text(text, font, fontsize, width=0):
+    """
+    Renders white on black text line. Returns (width, height, data)
+    where data is compressed single channel of RGB24 surface.
+    Zero width means text width.
+    """
+    w, h = libpango.get_sample_size(text, font, fontsize)
+    w = width or max(w, 1)
+    if not h:
+        h = 10
+        LOG.warn('Incorrect font <%s>: zero font height', font)
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, w, h)
+    ctx = cairo.Context(surface)
+    ctx.set_source_rgb(0.0, 0.0, 0.0)
+    ctx.paint()
+    matrix = cairo.Matrix(1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+    ctx.set_matrix(matrix)
+    ctx.set_source_rgb(1.0, 1.0, 1.0)
+    ctx.set_antialias(cairo.ANTIALIAS_DEFAULT)
+    libpango.render_sample(ctx, text, font, fontsize)
+    ctx.fill()
+    surface.flush()
+    # text is grayscale, so one channel is enough
+    data = str(surface.get_data())[::4]
+    return w, h, zlib.compress(data)
+
+
+def render_fontname(font):
+    if not isinstance(font, unicode):
+        font = font.decode('utf-8')
+    return render_text(font, FONTNAME_FAMILY, FONTNAME_SIZE)
+
+
+def get_fontname_size(fonts):
+    """
+    Estimates font name bitmap size by longest names only,
+    so font controls can be created before names are rendered.
+    """
+    names = sorted(fonts, key=len, reverse=True)[:10] or ['Sans']
+    sizes = [libpango.get_sample_size(item, FONTNAME_FAMILY, FONTNAME_SIZE)
+             for item in names]
+    return [max(item[0] for item in sizes), sizes[0][1] or 10]
+
+
+def render_fontsample(font):
+    text = config.font_preview_text.decode('utf-8')
+    return render_text(text, font, config.font_preview_size,
+                       config.font_preview_width)
+
+
+def make_sample_surface(sample):
+    w, h, data = sample
+    channel = zlib.decompress(data)
+    fmt = cairo.FORMAT_RGB24
+    stride = cairo.ImageSurface.format_stride_for_width(fmt, w)
+    buf = bytearray(stride * h)
+    buf[0::4] = channel
+    buf[1::4] = channel
+    buf[2::4] = channel
+    return cairo.ImageSurface.create_for_data(buf, fmt, w, h, stride)
+
+
+def sample_to_bitmap(sample, color=None):
+    color = color or cms.val_255(config.font_preview_color)
+    bmp = wal.copy_surface_to_bitmap(make_sample_surface(sample))
+    return wal.invert_text_bitmap(bmp, color)
+
+
+class FontSampleCache:
+    """
+    Font name and sample bitmaps backed by persistent cache file
+    keyed by font list and preview settings. Missing bitmaps are
+    shown as placeholders and generated by small portions on main
+    window timer (names first), so font controls are available
+    immediately after creation.
+    """
+    fonts = None
+    names = None
+    samples = None
+    key = ''
+    color = None
+    stored = None
+    stored_names = None
+    name_index = 0
+    index = 0
+    modified = False
+    timer = None
+    listeners = None
+
+    def __init__(self):
+        self.fonts = []
+        self.names = FONTNAME_CACHE
+        self.samples = FONTSAMPLE_CACHE
+        self.stored = {}
+        self.stored_names = {}
+        self.listeners = []
+
+    def get_key(self, fonts):
+        data = repr((FONT_CACHE_VERSION, fonts, config.font_preview_width,
+                     config.font_preview_size, config.font_preview_text))
+        return hashlib.md5(data).hexdigest()
+
+    def get_filepath(self):
+        cache_dir = os.path.join(config.app.appdata.app_config_dir,
+                                 'font_cache')
+        return os.path.join(cache_dir, 'samples-%s.cache' % self.key)
+
+    def load(self):
+        self.stored = {}
+        filepath = self.get_filepath()
+        if not os.path.isfile(filepath):
+            return
         try:
-            bmp, size = wal.text_to_bitmap(item, wal.UI_COLORS['text'])
+            with open(filepath, 'rb') as fp:
+                data = cPickle.load(fp)
+            samples, names = data['samples'], data['names']
+            maxsize = data['maxsize']
         except Exception as e:
-            LOG.error('Cannot process font <%s> %s', item, e)
-            continue
-        FONTNAME_CACHE.append(bmp)
-        maxwidth = max(size[0], maxwidth)
-        height = size[1]
-    MAXSIZE.append(maxwidth)
-    MAXSIZE.append(height)
-
-
-def generate_fontsample_cache(fonts):
-    w = config.font_preview_width
-    fontsize = config.font_preview_size
-    color = cms.val_255(config.font_preview_color)
-    text = config.font_preview_text.decode('utf-8')
-    for item in fonts:
-        h = libpango.get_sample_size(text, item, fontsize)[1]
-        if not h:
-            h = 10
-            LOG.warn('Incorrect font <%s>: zero font height', item)
-        surface = cairo.ImageSurface(cairo.FORMAT_RGB24, w, h)
-        ctx = cairo.Context(surface)
-        ctx.set_source_rgb(0.0, 0.0, 0.0)
-        ctx.paint()
-        matrix = cairo.Matrix(1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
-        ctx.set_matrix(matrix)
-        ctx.set_source_rgb(1.0, 1.0, 1.0)
-        ctx.set_antialias(cairo.ANTIALIAS_DEFAULT)
-        libpango.render_sample(ctx, text, item, fontsize)
-        ctx.fill()
-        bmp = wal.copy_surface_to_bitmap(surface)
-        FONTSAMPLE_CACHE.append(wal.invert_text_bitmap(bmp, color))
+            LOG.warn('Cannot read font cache %s', e)
+            return
+        self.stored = samples
+        if not self.name_index:
+            self.stored_names = names
+            MAXSIZE[:] = maxsize
+
+    def save(self):
+        filepath = self.get_filepath()
+        data = {'samples': self.stored, 'names': self.stored_names,
+                'maxsize': list(MAXSIZE)}
+        try:
+            cache_dir = os.path.dirname(filepath)
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            # outdated caches of other font sets or preview settings
+            for item in os.listdir(cache_dir):
+                if item.startswith('samples-'):
+                    os.remove(os.path.join(cache_dir, item))
+            with open(filepath, 'wb') as fp:
+                cPickle.dump(data, fp, cPickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            LOG.warn('Cannot write font cache %s', e)
+        self.modified = False
+
+    def get_placeholder(self, w, h, color=None):
+        data = zlib.compress('\x00' * (w * h))
+        return sample_to_bitmap((w, h, data), color)
+
+    def reset(self, fonts):
+        if not fonts == self.fonts:
+            # names don't depend on preview settings
+            self.stored_names = {}
+            self.name_index = 0
+            MAXSIZE[:] = []
+        self.fonts = fonts
+        self.key = self.get_key(fonts)
+        self.load()
+        if not MAXSIZE:
+            MAXSIZE[:] = get_fontname_size(fonts)
+        if not self.name_index:
+            placeholder = self.get_placeholder(MAXSIZE[0], MAXSIZE[1],
+                                               wal.UI_COLORS['text'])
+            self.names[:] = [placeholder] * len(fonts)
+        w = config.font_preview_width
+        h = int(config.font_preview_size * 1.5)
+        self.samples[:] = [self.get_placeholder(w, h)] * len(fonts)
+        self.color = config.font_preview_color
+        self.index = 0
+        self.modified = False
+
+    def update_config(self):
+        """
+        Restarts generation if preview settings are changed.
+        """
+        if not self.get_key(self.fonts) == self.key:
+            self.reset(self.fonts)
+        elif not self.color == config.font_preview_color:
+            # stored samples are colorless, bitmaps are recolored only
+            self.color = config.font_preview_color
+            self.index = 0
+
+    def is_ready(self):
+        return self.index >= len(self.fonts)
+
+    def connect(self, listener):
+        """
+        Listener is called as listener(start, end) with index range
+        of bitmaps generated on timer tick.
+        """
+        self.listeners.append(listener)
+
+    def disconnect(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def start(self):
+        if self.timer is None:
+            self.timer = wal.CanvasTimer(config.app.mw, delay=TICK_DELAY,
+                                         on_timer=self.on_timer)
+        if not self.is_ready() and not self.timer.is_running():
+            self.timer.start()
+
+    def _get_bitmap(self, font, stored, render_func):
+        item = stored.get(font)
+        if item is None:
+            try:
+                item = render_func(font)
+            except Exception as e:
+                LOG.error('Cannot render font <%s> %s', font, e)
+                return None
+            stored[font] = item
+            self.modified = True
+        return item
+
+    def process_names(self, num=None):
+        end = len(self.fonts)
+        if num is not None:
+            end = min(self.name_index + num, end)
+        color = wal.UI_COLORS['text']
+        while self.name_index < end:
+            font = self.fonts[self.name_index]
+            name = self._get_bitmap(font, self.stored_names, render_fontname)
+            if name is not None:
+                self.names[self.name_index] = sample_to_bitmap(name, color)
+                MAXSIZE[0] = max(MAXSIZE[0], name[0])
+            self.name_index += 1
+
+    def process(self, num=None):
+        """
+        Generates missing bitmaps. Returns (start, end) index range
+        of processed fonts.
+        """
+        if self.name_index < len(self.fonts):
+            start = self.name_index
+            self.process_names(None if num is None else NAMES_PER_TICK)
+            if num is not None:
+                return start, self.name_index
+            start = 0
+        else:
+            start = self.index
+        end = len(self.fonts)
+        if num is not None:
+            end = min(self.index + num, end)
+        while self.index < end:
+            font = self.fonts[self.index]
+            sample = self._get_bitmap(font, self.stored, render_fontsample)
+            if sample is not None:
+                self.samples[self.index] = sample_to_bitmap(sample)
+            self.index += 1
+        if self.is_ready() and self.modified:
+            self.save()
+        return start, self.index
+
+    def on_timer(self, *args):
+        start, end = self.process(SAMPLES_PER_TICK)
+        if self.is_ready() and self.timer.is_running():
+            self.timer.stop()
+        if start < end:
+            for listener in [] + self.listeners:
+                listener(start, end)
+
+
+FONT_SAMPLES = FontSampleCache()
 
 
 def font_cache_update():
-    fonts = libpango.get_fonts()[0]
-    generate_fontname_cache(fonts)
-    generate_fontsample_cache(fonts)
+    """
+    Prepares font name and sample caches. Missing bitmaps are
+    filled by placeholders to be generated in background.
+    """
+    if FONTNAME_CACHE:
+        return
+    FONT_SAMPLES.reset(libpango.get_fonts()[0])
+
+
+def font_cache_prebuild():
+    font_cache_update()
+    FONT_SAMPLES.process()
 
 
 class FontChoice(wal.FontBitmapChoice):
@@ -81,9 +324,7 @@ class FontChoice(wal.FontBitmapChoice):
 
     def __init__(self, parent, selected_font='Sans', onchange=None):
         self.fonts = libpango.get_fonts()[0]
-        if not FONTNAME_CACHE:
-            generate_fontname_cache(self.fonts)
-            generate_fontsample_cache(self.fonts)
+        font_cache_update()
         if selected_font not in self.fonts:
             selected_font = 'Sans'
         value = self.fonts.index(selected_font)
@@ -92,15 +333,31 @@ class FontChoice(wal.FontBitmapChoice):
                                       self.fonts, FONTNAME_CACHE,
                                       FONTSAMPLE_CACHE, icon, onchange)
         events.connect(events.CONFIG_MODIFIED, self.check_config)
+        FONT_SAMPLES.connect(self.update_samples)
+        FONT_SAMPLES.start()
+
+    def destroy(self):
+        events.disconnect(events.CONFIG_MODIFIED, self.check_config)
+        FONT_SAMPLES.disconnect(self.update_samples)
+        wal.FontBitmapChoice.destroy(self)
 
     def check_config(self, *args):
         if args[0].startswith('font_preview'):
-            FONTSAMPLE_CACHE[:] = []
-            generate_fontsample_cache(self.fonts)
+            FONT_SAMPLES.update_config()
+            FONT_SAMPLES.start()
             index = self._get_active()
-            self._set_bitmaps(self.bitmaps, FONTSAMPLE_CACHE)
+            self._set_bitmaps(FONTNAME_CACHE, FONTSAMPLE_CACHE)
             self._set_active(index)
 
+    def update_samples(self, start, end):
+        """
+        Bitmap lists are shared with the cache and drawn on demand,
+        so items generated on tick need repaint of visible control
+        only when active item is among them.
+        """
+        if start <= self._get_active() < end:
+            self.refresh()
+
     def get_font_family(self):
         index = self._get_active()
         return self.fonts[index]
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import cairo
+
+import wal
+from sk1 import config
+
+
+def generate_placeholder(size):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, size, size)
+    ctx = cairo.Context(surface)
+    ctx.set_source_rgba(0.5, 0.5, 0.5, 0.5)
+    ctx.set_line_width(1.0)
+    ctx.rectangle(0.5, 0.5, size - 1.0, size - 1.0)
+    ctx.stroke()
+    return wal.copy_surface_to_bitmap(surface)
+
+
+class ThumbnailViewer(wal.VPanel):
+    """
+    Shows cached preview of document file. Missing preview
+    is requested from application thumbnail cache.
+    """
+    app = None
+    path = None
+    placeholder = None
+    bitmap = None
+
+    def __init__(self, parent, app):
+        self.app = app
+        wal.VPanel.__init__(self, parent)
+        self.placeholder = generate_placeholder(config.thumbnail_size)
+        self.bitmap = wal.Bitmap(self, self.placeholder)
+        self.pack(self.bitmap, padding_all=5)
+
+    def set_path(self, path=None):
+        self.path = path
+        bmp = None
+        if path:
+            bmp = self.app.thumbs.get_thumbnail(path, self.on_thumbnail)
+        else:
+            self.app.thumbs.cancel(self.on_thumbnail)
+        self.bitmap.set_bitmap(bmp or self.placeholder)
+
+    def on_thumbnail(self, path, bmp):
+        if path == self.path and bmp is not None:
+            self.bitmap.set_bitmap(bmp)
+
+    def stop(self):
+        """
+        Drops pending requests, must be called before widget
+        is destroyed.
+        """
+        self.path = None
+        self.app.thumbs.cancel(self.on_thumbnail)
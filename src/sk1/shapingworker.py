@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Boolean operations process, started by shaping plugin as
+'python -m sk1.shapingworker'. Module doesn't import wal,
+so picklable operations are defined here.
+"""
+
+from uc2.libgeom import trim_paths
+
+from sk1.app_worker import serve
+
+
+class TrimTarget:
+    """
+    Picklable final operation which trims target by fused operands.
+    """
+    target = None
+
+    def __init__(self, target):
+        self.target = target
+
+    def __call__(self, paths):
+        if not paths:
+            return self.target
+        return trim_paths(self.target, paths)
+
+
+if __name__ == '__main__':
+    serve()
@@ -16,16 +16,23 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import logging
+import multiprocessing
 import os
+from collections import deque
 from copy import deepcopy
 
 import wal
-from sk1 import _, events, modes
+from sk1 import _, config, events, modes
 from sk1.app_plugins import RsPlugin
+from sk1.app_worker import WorkerPool
 from sk1.dialogs import msg_dialog, yesno_dialog, error_dialog
 from sk1.resources import icons, get_icon, get_bmp
-from uc2.libgeom import apply_trafo_to_paths
-from uc2.libgeom import intersect_paths, fuse_paths, trim_paths, excluse_paths
+from sk1.shapingworker import TrimTarget
+from uc2.libgeom import apply_trafo_to_paths, is_bbox_overlap
+from uc2.libgeom import intersect_paths, fuse_paths, excluse_paths
+
+LOG = logging.getLogger(__name__)
 
 PLG_DIR = __path__[0]
 IMG_DIR = os.path.join(PLG_DIR, 'images')
@@ -58,6 +65,206 @@ SHAPING_MODE_NAMES = {
     FUSION_MODE: _('Fusion'),
 }
 
+REDUCTION_DELAY = 20
+
+WORKER_POOL = []
+
+
+def get_workers_count():
+    return config.shaping_workers or multiprocessing.cpu_count()
+
+
+def get_worker_pool():
+    """
+    Returns persistent pool of boolean operation processes.
+    Processes are spawned as fresh interpreters on first use,
+    forking of multithreaded application is avoided.
+    """
+    if not WORKER_POOL:
+        try:
+            WORKER_POOL.append(WorkerPool('sk1.shapingworker',
+                                          get_workers_count()))
+        except Exception as e:
+            LOG.warn('Cannot start boolean operation workers %s', e)
+            return None
+    return WORKER_POOL[0]
+
+
+def drop_worker_pool():
+    """
+    Kills pool processes, i.e. interrupts running operations.
+    """
+    if WORKER_POOL:
+        WORKER_POOL.pop().terminate()
+
+
+def get_paths_bbox(paths):
+    """
+    Returns bbox of all path points including control ones,
+    i.e. superset of actual paths bbox.
+    """
+    xs = []
+    ys = []
+    for path in paths:
+        for point in [path[0], ] + path[1]:
+            points = [point, ] if len(point) == 2 else point[:3]
+            xs += [item[0] for item in points]
+            ys += [item[1] for item in points]
+    if not xs:
+        return None
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def get_overlap_groups(operands):
+    """
+    Splits operands into groups with transitively overlapping
+    bboxes. Operands of different groups are disjoint.
+    """
+    parents = range(len(operands))
+
+    def get_root(index):
+        while not parents[index] == index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    bboxes = [get_paths_bbox(item) for item in operands]
+    order = [i for i in range(len(operands)) if bboxes[i] is not None]
+    order.sort(key=lambda i: bboxes[i][0])
+    active = []
+    for i in order:
+        active = [j for j in active if bboxes[j][2] >= bboxes[i][0]]
+        for j in active:
+            if is_bbox_overlap(bboxes[i], bboxes[j]):
+                parents[get_root(i)] = get_root(j)
+        active.append(i)
+    groups = {}
+    for i in order:
+        groups.setdefault(get_root(i), []).append(operands[i])
+    return groups.values()
+
+
+class BooleanReduction:
+    """
+    Reduces operand groups by associative boolean operation.
+    Operands are combined pairwise in balanced tree, independent
+    merges run in persistent worker pool. Reduction is driven by
+    timer, so UI stays responsive and can be cancelled. Group
+    results are joined and optionally passed through final operation.
+    """
+    operation = None
+    final = None
+    queues = None
+    tasks = None
+    pool = None
+    timer = None
+    callback = None
+    total = 0
+    done = 0
+    result = None
+    error = False
+    cancelled = False
+
+    def __init__(self, parent, operation, groups, final=None, callback=None):
+        self.operation = operation
+        self.final = final
+        self.callback = callback
+        self.queues = [deque(group) for group in groups if group]
+        self.tasks = []
+        self.total = sum([len(item) - 1 for item in self.queues])
+        if final is not None:
+            self.total += 1
+        workers = min(get_workers_count(), self.total // 2 + 1)
+        if workers > 1:
+            self.pool = get_worker_pool()
+        self.timer = wal.CanvasTimer(parent, delay=REDUCTION_DELAY,
+                                     on_timer=self.on_timer)
+
+    def start(self):
+        self.timer.start()
+
+    def cancel(self):
+        if not self.cancelled and self.result is None:
+            self.cancelled = True
+            self.stop()
+
+    def stop(self):
+        self.timer.stop()
+        if self.pool is not None and self.tasks:
+            # running operations can be interrupted by killing only
+            drop_worker_pool()
+        self.pool = None
+        self.tasks = []
+        if self.callback is not None:
+            callback = self.callback
+            self.callback = None
+            callback(self)
+
+    def is_ready(self):
+        return not self.tasks and \
+            all([len(queue) < 2 for queue in self.queues])
+
+    def submit(self, queue, func, *args):
+        if self.pool is not None:
+            task = self.pool.apply_async(func, args)
+        else:
+            task = func(*args)
+        self.tasks.append((queue, task))
+
+    def schedule(self):
+        for queue in self.queues:
+            while len(queue) > 1:
+                self.submit(queue, self.operation, queue.popleft(),
+                            queue.popleft())
+                if self.pool is None:
+                    return
+
+    def collect(self):
+        tasks = []
+        for queue, task in self.tasks:
+            if self.pool is None:
+                queue.append(task)
+            elif task.ready():
+                queue.append(task.get())
+            else:
+                tasks.append((queue, task))
+                continue
+            self.done += 1
+        self.tasks = tasks
+
+    def on_timer(self):
+        try:
+            self.collect()
+            if self.operation is intersect_paths and \
+                    not all([all(queue) for queue in self.queues]):
+                self.queues = [deque([[]])]
+                self.tasks = []
+            self.schedule()
+            if self.is_ready():
+                self.finish()
+            else:
+                msg = _('Processed %d of %d operations') % \
+                    (self.done, self.total)
+                events.emit(events.APP_STATUS, msg)
+        except Exception as e:
+            LOG.error('Error in boolean operation %s', e)
+            self.error = True
+            self.stop()
+
+    def finish(self):
+        result = []
+        for queue in self.queues:
+            if queue:
+                result += queue[0]
+        final, self.final = self.final, None
+        if final is not None:
+            self.queues = [deque()]
+            self.submit(self.queues[0], final, result)
+            return
+        self.result = result
+        self.stop()
+
+
 SHAPING_MODE_PICS = {
     TRIM_MODE: make_artid('shaping-trim'),
     INTERSECTION_MODE: make_artid('shaping-intersection'),
@@ -130,8 +337,14 @@ class AbstractShapingPanel(wal.VPanel):
         return [apply_trafo_to_paths(obj.get_initial_paths(), obj.trafo)
                 for obj in objs]
 
+    def is_busy(self):
+        doc = self.app.current_doc
+        return bool(doc) and doc.canvas.mode == modes.WAIT_MODE
+
     def update(self):
-        if self.get_sel_count() >= self.obj_num:
+        if self.is_busy():
+            self.set_enable(False)
+        elif self.get_sel_count() >= self.obj_num:
             self.set_enable(True)
         else:
             self.set_enable(False)
@@ -154,6 +367,8 @@ class AbstractShapingPanel(wal.VPanel):
                 objs.remove(sel_obj)
             if objs:
                 objs = [sel_obj, ] + objs
+                # pick mode is left before waiting for result
+                self.app.current_doc.canvas.restore_mode()
                 self._action(objs)
                 return False
             else:
@@ -169,18 +384,44 @@ class AbstractShapingPanel(wal.VPanel):
     def _action(self, objs):
         doc = self.app.current_doc
         paths = self.get_paths_list(objs)
-        doc.canvas.set_temp_mode(modes.WAIT_MODE)
-        try:
-            result = self.do_action(paths)
-        except Exception:
-            doc.canvas.restore_mode()
+
+        def callback(reduction):
+            self.finish_action(doc, objs, reduction)
+
+        reduction = self.do_action(paths, callback)
+        doc.canvas.set_temp_mode(modes.WAIT_MODE, reduction.cancel)
+        self.update()
+        reduction.start()
+
+    @staticmethod
+    def is_in_document(doc, obj):
+        while obj.parent is not None:
+            if obj not in obj.parent.childs:
+                return False
+            obj = obj.parent
+        return obj is doc.model
+
+    def finish_action(self, doc, objs, reduction):
+        if doc not in self.app.docs:
+            return
+        doc.canvas.restore_mode()
+        result = reduction.result
+        if reduction.cancelled:
+            events.emit(events.APP_STATUS, _('Operation is cancelled'))
+            return
+        elif not all([self.is_in_document(doc, obj) for obj in objs]):
+            # operands are deleted or undone meanwhile
+            msg = _('Operation is cancelled: objects are changed')
+            events.emit(events.APP_STATUS, msg)
+            return
+        elif reduction.error:
             msg = _('Error occurred during this operation.') + '\n'
             msg += _('Perhaps this was due to the imperfection'
                      ' of the algorithm.')
             error_dialog(self.app.mw, self.app.appdata.app_name, msg)
             return
 
-        doc.canvas.restore_mode()
+        events.emit(events.APP_STATUS, '')
         if result:
             style = deepcopy(objs[0].style)
             doc.api.create_curve(result, style)
@@ -196,50 +437,61 @@ class AbstractShapingPanel(wal.VPanel):
                 objs_list.append([obj, obj.parent, index])
             doc.api.delete_objects(objs_list)
 
-    def do_action(self, *args):
-        return []
+    def make_reduction(self, operation, groups, callback, final=None):
+        parent = self.app.current_doc.canvas.dc
+        return BooleanReduction(parent, operation, groups, final, callback)
+
+    def do_action(self, paths, callback):
+        return self.make_reduction(fuse_paths, [], callback)
 
 
 class TrimPanel(AbstractShapingPanel):
     pid = TRIM_MODE
     obj_num = 1
 
-    def do_action(self, paths):
+    def do_action(self, paths, callback):
         target = paths[0]
-        for item in paths[1:]:
-            target = trim_paths(target, item)
-        return target
+        bbox = get_paths_bbox(target)
+        items = [item for item in paths[1:] if bbox is not None and
+                 get_paths_bbox(item) is not None and
+                 is_bbox_overlap(bbox, get_paths_bbox(item))]
+        groups = get_overlap_groups(items)
+        return self.make_reduction(fuse_paths, groups, callback,
+                                   TrimTarget(target))
 
 
 class IntersectionPanel(AbstractShapingPanel):
     pid = INTERSECTION_MODE
 
-    def do_action(self, paths):
-        result = paths[0]
-        for item in paths[1:]:
-            if result:
-                result = intersect_paths(result, item)
-        return result
+    def do_action(self, paths, callback):
+        groups = [paths, ]
+        bboxes = [get_paths_bbox(item) for item in paths]
+        if None in bboxes:
+            groups = []
+        else:
+            bbox = [max([item[0] for item in bboxes]),
+                    max([item[1] for item in bboxes]),
+                    min([item[2] for item in bboxes]),
+                    min([item[3] for item in bboxes])]
+            if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                groups = []
+        return self.make_reduction(intersect_paths, groups, callback)
 
 
 class ExclusionPanel(AbstractShapingPanel):
     pid = EXCLUSION_MODE
 
-    def do_action(self, paths):
-        result = paths[0]
-        for item in paths[1:]:
-            result = excluse_paths(result, item)
-        return result
+    def do_action(self, paths, callback):
+        groups = get_overlap_groups(paths)
+        return self.make_reduction(excluse_paths, groups, callback)
 
 
 class FusionPanel(AbstractShapingPanel):
     pid = FUSION_MODE
 
-    def do_action(self, paths):
-        result = paths[0]
-        for item in paths[1:]:
-            result = fuse_paths(result, item)
-        return result
+    def do_action(self, paths, callback):
+        groups = get_overlap_groups(paths)
+        return self.make_reduction(fuse_paths, groups, callback)
 
 
 SHAPING_CLASSES = {
@@ -282,6 +534,7 @@ class ShapingPlugin(RsPlugin):
         events.connect(events.DOC_CHANGED, self.update)
         events.connect(events.SELECTION_CHANGED, self.update)
         events.connect(events.DOC_MODIFIED, self.update)
+        events.connect(events.MODE_CHANGED, self.update)
         self.update()
 
     def update(self, *_args):
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Ihor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Thumbnail rendering process, started by ThumbnailManager as
+'python -m sk1.thumbworker <app path> <config dir>'.
+"""
+
+import cairo
+import os
+import sys
+
+import sk1
+from sk1.app_worker import serve
+
+WORKER_APPDATA = []
+
+
+def render_thumbnail(path, filepath, size):
+    """
+    Loads document by uc2 loader and renders its first page into
+    PNG file of size x size px. Returns size of created file.
+    """
+    from uc2.formats import get_loader
+    from uc2.formats.sk2.crenderer import CairoRenderer
+
+    loader = get_loader(path)
+    if not loader:
+        raise IOError('Loader is not found for <%s>' % path)
+    doc = loader(WORKER_APPDATA[0], path)
+    try:
+        methods = doc.methods
+        page = methods.get_pages()[0]
+        w, h = page.page_format[1]
+        scale = float(size) / max(w, h, 1.0)
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, size, size)
+        ctx = cairo.Context(surface)
+        ctx.set_matrix(cairo.Matrix(scale, 0.0, 0.0, -scale,
+                                    size / 2.0, size / 2.0))
+        ctx.rectangle(-w / 2.0, -h / 2.0, w, h)
+        ctx.set_source_rgb(1.0, 1.0, 1.0)
+        ctx.fill()
+        rend = CairoRenderer(doc.cms)
+        for layer in methods.get_visible_layers(page):
+            rend.antialias_flag = layer.properties[3] == 1
+            rend.render(ctx, layer.childs)
+    finally:
+        doc.close()
+    temp_path = filepath + '.tmp'
+    surface.write_to_png(temp_path)
+    if os.path.exists(filepath):
+        os.remove(filepath)
+    os.rename(temp_path, filepath)
+    return os.path.getsize(filepath)
+
+
+def main():
+    path, cfgdir = sys.argv[1:3]
+    sk1.init_config(cfgdir)
+    from sk1.app_conf import AppData
+    from uc2.application import UCApplication
+
+    app = UCApplication(path, cfgdir, False)
+    app.appdata = AppData(app, cfgdir)
+    # requests refer to sk1.thumbworker module, not to __main__
+    from sk1 import thumbworker
+    thumbworker.WORKER_APPDATA.append(app.appdata)
+    serve()
+
+
+if __name__ == '__main__':
+    main()